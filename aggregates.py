@@ -0,0 +1,128 @@
+"""
+Agregados aditivos das solicitações
+Dashboard de Análise de Peças
+
+Todos os agregados guardam apenas somas e contagens, então os agregados de
+dois lotes de dados podem ser combinados somando as tabelas. Isso permite
+atualizar a base incrementalmente, sem reprocessar o histórico inteiro.
+"""
+
+import hashlib
+
+import pandas as pd
+
+from columns import (COL_DATA, COL_MES, COL_SOLICITANTE, COL_MAQUINA, COL_PECA,
+                     COL_QTD, COL_TOTAL, COL_ENTREGUE, COL_UNIDADE, NUMERIC_COLUMNS)
+from criticality import decayed_part_counts, decayed_state
+from resampling import daily_table, with_daily
+from sketches import quantile_sketch
+
+# Tabelas de versões anteriores, descartadas ao combinar (ex: registros
+# HyperLogLog de distintos, hoje contados pelo tamanho das tabelas)
+OBSOLETE_TABLES = {'distintos'}
+
+
+def coerce_numeric_columns(df):
+    """Converte colunas numéricas (valores inválidos viram 0)"""
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    return df
+
+
+def compute_aggregates(df):
+    """Calcula os agregados aditivos de um DataFrame de solicitações"""
+    # Cópia rasa: as colunas convertidas não alteram o DataFrame original
+    df = coerce_numeric_columns(df.copy(deep=False))
+    aggregates = {}
+
+    # Série mensal
+    mensal = df.groupby(COL_MES).agg(
+        Quantidade=(COL_MES, 'size'),
+        Total=(COL_TOTAL, 'sum'),
+        Qtd_Pecas=(COL_QTD, 'sum')
+    )
+    aggregates['mensal'] = mensal
+
+    # Série diária (coluna de data opcional): base das resoluções diária e semanal
+    if COL_DATA in df.columns:
+        aggregates['diario'] = daily_table(df)
+
+    # Máquinas
+    aggregates['maquina'] = df.groupby(COL_MAQUINA).agg(
+        Solicitacoes=(COL_MAQUINA, 'size'),
+        Custo_Total=(COL_TOTAL, 'sum')
+    )
+
+    # Critérios de criticidade com decaimento (somados como os demais agregados)
+    aggregates['criticidade'] = decayed_state(df)
+    aggregates['maquina_peca'] = decayed_part_counts(df)
+
+    # Peças
+    aggregates['peca'] = df.groupby(COL_PECA).agg(
+        Qtd_Total=(COL_QTD, 'sum'),
+        Freq_Solicitacao=(COL_PECA, 'size')
+    )
+
+    # Quantidade e custo de cada peça por mês (simulação do orçamento)
+    aggregates['peca_mensal'] = df.groupby([COL_PECA, COL_MES]).agg(
+        Qtd=(COL_QTD, 'sum'),
+        Total=(COL_TOTAL, 'sum')
+    )
+
+    # Solicitantes
+    aggregates['solicitante'] = df.groupby(COL_SOLICITANTE).agg(
+        Quantidade=(COL_SOLICITANTE, 'size'),
+        Custo_Total=(COL_TOTAL, 'sum')
+    )
+
+    # Status de entrega (coluna opcional)
+    if COL_ENTREGUE in df.columns:
+        aggregates['entrega'] = df[COL_ENTREGUE].value_counts().to_frame('Quantidade')
+
+    # Unidades (coluna presente ao consolidar arquivos de várias plantas)
+    if COL_UNIDADE in df.columns:
+        aggregates['unidade'] = df.groupby(COL_UNIDADE).agg(
+            Solicitacoes=(COL_UNIDADE, 'size'),
+            Custo_Total=(COL_TOTAL, 'sum'),
+            Qtd_Pecas=(COL_QTD, 'sum')
+        )
+
+    # Distribuição do custo por solicitação (quantis aproximados por grupo)
+    aggregates['quantis_solicitante'] = quantile_sketch(
+        df[COL_SOLICITANTE], df[COL_TOTAL]).rename_axis([COL_SOLICITANTE, 'balde'])
+    aggregates['quantis_maquina'] = quantile_sketch(
+        df[COL_MAQUINA], df[COL_TOTAL]).rename_axis([COL_MAQUINA, 'balde'])
+    return aggregates
+
+
+def merge_aggregates(base, delta):
+    """Combina dois conjuntos de agregados somando as tabelas"""
+    if not base:
+        return {name: table.copy() for name, table in delta.items()}
+    if ('diario' in base) != ('diario' in delta):
+        # Lote sem a coluna de data: seus meses entram na série diária pelo 1º dia
+        base, delta = with_daily(base), with_daily(delta)
+
+    merged = {}
+    for name in (set(base) | set(delta)) - OBSOLETE_TABLES:
+        if name not in delta:
+            merged[name] = base[name].copy()
+        elif name not in base:
+            merged[name] = delta[name].copy()
+        else:
+            table = base[name].add(delta[name], fill_value=0)
+            # Contagens voltam a ser inteiras após o alinhamento dos índices
+            for col, dtype in base[name].dtypes.items():
+                if pd.api.types.is_integer_dtype(dtype):
+                    table[col] = table[col].astype('int64')
+            merged[name] = table
+    return merged
+
+
+def frame_fingerprint(frame):
+    """Impressão digital estável do conteúdo de uma tabela"""
+    # Arredonda para ignorar diferenças de ponto flutuante entre somas parciais
+    frame = frame.sort_index().sort_index(axis=1).astype('float64').round(6)
+    hashed = pd.util.hash_pandas_object(frame, index=True)
+    return hashlib.sha1(hashed.values.tobytes()).hexdigest()[:16]
@@ -0,0 +1,373 @@
+"""
+API HTTP local com previsões em cache
+Dashboard de Análise de Peças
+
+Expõe previsões, criticidade, anomalias, demanda de peças e a simulação do
+orçamento em JSON para outros sistemas (ex: compras), sem depender de
+serviços externos. As respostas vêm de um cache compartilhado indexado pela
+versão do conjunto de dados; pedidos simultâneos para a mesma chave disparam
+um único cálculo.
+
+As exportações (`/api/exportar/...`) são gravadas direto na resposta, bloco
+a bloco, em CSV, Excel ou Parquet: as linhas brutas são lidas dos arquivos em
+streaming e as tabelas de análise reaproveitam o cache das respostas JSON.
+
+Exemplo:
+    python api_server.py --source dados/ --port 8600
+    curl "http://127.0.0.1:8600/api/pecas/demanda?limite=20"
+    curl "http://127.0.0.1:8600/api/orcamento/simulacao?meses=3&orcamento=1500000"
+    curl -OJ "http://127.0.0.1:8600/api/exportar/dados?formato=parquet&inicio=01-2024"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from batch_report import (
+    demand_forecast_table,
+    cost_forecast_table,
+    anomaly_table,
+    table_records
+)
+from budget_simulation import (DEFAULT_HORIZON, DEFAULT_SCENARIOS, part_history, recent_spend,
+                               simulate_spend)
+from data_store import DataStore
+from export import EXPORT_FORMATS, RowFilter, check_format, forecast_table, iter_frame, write_chunks
+from ingestion import aggregate_files, iter_data_chunks, list_data_files, site_name, tag_site
+from ml_predictions import MLPredictor
+from result_cache import ResultCache
+
+
+class ForecastService:
+    """Calcula e guarda em cache as respostas da API para a versão atual dos dados"""
+
+    def __init__(self, source=None, store_path=None, workers=None, cache=None):
+        if (source is None) == (store_path is None):
+            raise ValueError("Informe exatamente uma fonte: source ou store_path")
+        self.source = source
+        self.store_path = store_path
+        self.workers = workers
+        self.cache = cache or ResultCache()
+        self.endpoints = {
+            '/api/versao': self.version_info,
+            '/api/previsoes/solicitacoes': self.demand_forecast,
+            '/api/previsoes/custos': self.cost_forecast,
+            '/api/pecas/demanda': self.part_demand,
+            '/api/criticidade': self.criticality,
+            '/api/anomalias': self.anomalies,
+            '/api/orcamento/simulacao': self.budget_simulation,
+            '/api/cache': lambda version, params: self.cache.stats(),
+        }
+        self.uncached = {'/api/cache'}
+        self.exports = {
+            '/api/exportar/dados': self.export_rows,
+            '/api/exportar/previsoes': self.export_forecast,
+            '/api/exportar/criticidade': self.export_criticality,
+            '/api/exportar/demanda_pecas': self.export_part_demand,
+        }
+
+    def dataset_version(self):
+        """Versão barata dos dados: tamanho e data de modificação dos arquivos"""
+        if self.store_path is not None:
+            paths = [os.path.join(self.store_path, 'state.pkl')]
+        else:
+            paths = list_data_files(self.source)
+        digest = hashlib.sha1()
+        for path in paths:
+            if os.path.exists(path):
+                stat = os.stat(path)
+                digest.update(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return digest.hexdigest()[:16]
+
+    def _load_aggregates(self):
+        if self.store_path is not None:
+            store = DataStore(self.store_path)
+            return store.aggregates, store.n_rows
+        return aggregate_files(list_data_files(self.source), workers=self.workers)
+
+    def dataset(self, version):
+        """Agregados e número de linhas da versão (carregados uma vez)"""
+        return self.cache.get_or_compute(('dados', version), self._load_aggregates)
+
+    def predictor(self, version):
+        aggregates, _ = self.dataset(version)
+        return MLPredictor.from_aggregates(aggregates)
+
+    @staticmethod
+    def _int_param(params, name, default, low, high):
+        try:
+            value = int(params.get(name, [default])[0])
+        except ValueError:
+            raise ValueError(f"Parâmetro '{name}' deve ser inteiro")
+        if not low <= value <= high:
+            raise ValueError(f"Parâmetro '{name}' deve estar entre {low} e {high}")
+        return value
+
+    def version_info(self, version, params):
+        aggregates, n_rows = self.dataset(version)
+        return {'versao': version, 'linhas': int(n_rows),
+                'meses': int(len(aggregates['mensal']))}
+
+    def demand_forecast(self, version, params):
+        months = self._int_param(params, 'meses', 6, 1, 24)
+        df_month, predictions, future_dates, scores = self.cache.get_or_compute(
+            ('previsao_solicitacoes', version, months),
+            lambda: self.predictor(version).predict_next_months(months=months)
+        )
+        return {
+            'scores': {name: float(score) for name, score in scores.items()},
+            'previsoes': table_records(
+                demand_forecast_table(df_month, predictions, future_dates, scores)
+            ),
+        }
+
+    def cost_forecast(self, version, params):
+        months = self._int_param(params, 'meses', 6, 1, 24)
+        result = self.cache.get_or_compute(
+            ('previsao_custos', version, months),
+            lambda: self.predictor(version).predict_costs(months=months)
+        )
+        return {'score': float(result[3]), 'previsoes': table_records(cost_forecast_table(*result))}
+
+    def part_demand(self, version, params):
+        limit = self._int_param(params, 'limite', 100, 1, 1_000_000)
+        df_parts = self.cache.get_or_compute(
+            ('demanda_pecas', version),
+            lambda: self.predictor(version).predict_part_demand()
+        )
+        return {'total': len(df_parts),
+                'pecas': table_records(df_parts.head(limit).rename_axis('Peça').reset_index())}
+
+    def criticality(self, version, params):
+        df_machine = self.cache.get_or_compute(
+            ('criticidade', version),
+            lambda: self.predictor(version).predict_maintenance_demand()
+        )
+        return {'maquinas': table_records(df_machine.rename_axis('Máquina').reset_index())}
+
+    def anomalies(self, version, params):
+        result = self.cache.get_or_compute(
+            ('anomalias', version),
+            lambda: self.predictor(version).identify_anomalies()
+        )
+        return {'anomalias': table_records(anomaly_table(*result))}
+
+    def budget_simulation(self, version, params):
+        months = self._int_param(params, 'meses', DEFAULT_HORIZON, 1, 24)
+        n_scenarios = self._int_param(params, 'cenarios', DEFAULT_SCENARIOS, 100, 200_000)
+        aggregates, _ = self.dataset(version)
+        try:
+            budget = float(params.get('orcamento', [recent_spend(aggregates, months)])[0])
+        except ValueError:
+            raise ValueError("Parâmetro 'orcamento' deve ser numérico")
+        # Os cenários não dependem do orçamento: outro valor reaproveita a simulação
+        result = self.cache.get_or_compute(
+            ('simulacao_orcamento', version, months, n_scenarios),
+            lambda: simulate_spend(part_history(aggregates), months, n_scenarios)
+        )
+        return {
+            'meses': months,
+            'cenarios': result.n_scenarios,
+            'orcamento': budget,
+            'prob_estouro': float(result.exceedance([budget])[0]),
+            'gasto_medio': result.mean,
+            'percentis': result.percentiles(),
+        }
+
+    def _row_chunks(self):
+        """Linhas brutas em blocos, direto dos arquivos ou da base local"""
+        if self.store_path is not None:
+            yield from DataStore(self.store_path).iter_dataset()
+            return
+        paths = list_data_files(self.source)
+        for path in paths:
+            site = site_name(path) if len(paths) > 1 else None
+            for chunk in iter_data_chunks(path):
+                yield tag_site(chunk, site)
+
+    def export_rows(self, version, params):
+        row_filter = RowFilter(
+            start=params.get('inicio', [None])[0],
+            end=params.get('fim', [None])[0],
+            machines=tuple(params.get('maquina', [])),
+            part=params.get('peca', [''])[0]
+        )
+        return 'dados', lambda: row_filter.filter_chunks(self._row_chunks())
+
+    def export_forecast(self, version, params):
+        months = self._int_param(params, 'meses', 6, 1, 24)
+
+        def chunks():
+            df_month, predictions, future_dates, scores = self.cache.get_or_compute(
+                ('previsao_solicitacoes', version, months),
+                lambda: self.predictor(version).predict_next_months(months=months)
+            )
+            pred_costs = self.cache.get_or_compute(
+                ('previsao_custos', version, months),
+                lambda: self.predictor(version).predict_costs(months=months)
+            )[1]
+            return iter_frame(forecast_table(future_dates, predictions, pred_costs))
+
+        return f'previsoes_{months}', chunks
+
+    def export_criticality(self, version, params):
+        def chunks():
+            df_machine = self.cache.get_or_compute(
+                ('criticidade', version),
+                lambda: self.predictor(version).predict_maintenance_demand()
+            )
+            return iter_frame(df_machine.rename_axis('Máquina').reset_index())
+
+        return 'criticidade', chunks
+
+    def export_part_demand(self, version, params):
+        def chunks():
+            df_parts = self.cache.get_or_compute(
+                ('demanda_pecas', version),
+                lambda: self.predictor(version).predict_part_demand()
+            )
+            return iter_frame(df_parts.rename_axis('Peça').reset_index())
+
+        return 'demanda_pecas', chunks
+
+    def export(self, path, query):
+        """(nome do arquivo, formato, função que gera os blocos) de uma exportação
+
+        Os parâmetros são validados aqui (ValueError), antes de a resposta
+        começar; os blocos só são lidos enquanto a resposta é gravada.
+        """
+        params = parse_qs(query)
+        fmt = check_format(params.get('formato', ['csv'])[0])
+        name, chunks = self.exports[path](self.dataset_version(), params)
+        return f'{name}.{fmt}', fmt, chunks
+
+    def handle(self, path, query):
+        """Resposta (status, corpo JSON em bytes) para um pedido GET"""
+        path = path.rstrip('/') or '/'
+        if path in ('/', '/api', '/health'):
+            return 200, self._encode({'status': 'ok',
+                                      'endpoints': sorted(self.endpoints) + sorted(self.exports)})
+        endpoint = self.endpoints.get(path)
+        if endpoint is None:
+            return 404, self._encode({'erro': f'Endpoint não encontrado: {path}'})
+
+        params = parse_qs(query)
+        version = self.dataset_version()
+        try:
+            if path in self.uncached:
+                return 200, self._encode(endpoint(version, params))
+            # A resposta já serializada também fica em cache
+            key = ('resposta', version, path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+            return 200, self.cache.get_or_compute(
+                key, lambda: self._encode(endpoint(version, params))
+            )
+        except ValueError as e:
+            return 400, self._encode({'erro': str(e)})
+        except Exception as e:
+            return 500, self._encode({'erro': f'Erro ao processar: {e}'})
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+class PooledHTTPServer(HTTPServer):
+    """Servidor HTTP que atende cada conexão em um pool fixo de threads"""
+
+    def __init__(self, address, handler, workers=8):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        # Uma requisição por conexão: conexões ociosas não prendem threads do pool
+        timeout = 30
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = url.path.rstrip('/')
+            if path in service.exports:
+                return self.send_export(path, url.query)
+            status, body = service.handle(url.path, url.query)
+            self.send_json(status, body)
+
+        def send_json(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_export(self, path, query):
+            try:
+                filename, fmt, chunks = service.export(path, query)
+            except ValueError as e:
+                return self.send_json(400, service._encode({'erro': str(e)}))
+            # Tamanho desconhecido de antemão: o fim do arquivo é o fim da conexão
+            self.send_response(200)
+            self.send_header('Content-Type', EXPORT_FORMATS[fmt][1])
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+            self.end_headers()
+            try:
+                write_chunks(chunks(), fmt, self.wfile, sheet_name=filename.split('.')[0][:31])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            except Exception as e:
+                # Cabeçalhos já enviados: o cliente recebe um arquivo truncado
+                sys.stderr.write(f"[api] erro na exportação {path}: {e}\n")
+
+        def log_message(self, format, *args):
+            sys.stderr.write(f"[api] {self.address_string()} {format % args}\n")
+
+    return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local de previsões do almoxarifado")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--source', help="Arquivo Excel/CSV ou diretório com os dados")
+    source.add_argument('--store', help="Diretório da base local incremental (ex: data/store)")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço (padrão: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8600, help="Porta (padrão: 8600)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Threads atendendo pedidos (padrão: 8)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = ForecastService(source=args.source, store_path=args.store)
+    server = PooledHTTPServer((args.host, args.port), make_handler(service), workers=args.workers)
+    print(f"API disponível em http://{args.host}:{args.port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
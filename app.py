@@ -1,13 +1,47 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
 import io
+import os
+
+from budget_simulation import (DEFAULT_HORIZON, DEFAULT_SCENARIOS, part_history,
+                               recent_spend, simulate_spend)
+from charts import (
+    create_monthly_requests_chart,
+    create_monthly_cost_chart,
+    create_requesters_chart,
+    create_part_demand_chart,
+    create_delivery_chart,
+    create_financial_chart,
+    create_machine_cost_chart,
+    create_spend_simulation_chart
+)
+from columns import COL_MAQUINA, COL_PECA, REQUIRED_COLUMNS
+from criticality import HALF_LIFE, SHORT_HALF_LIFE
+from data_quality import validate_data
+from data_store import DataStore
+from downsampling import payload_size
+from export import (EXPORT_FORMATS, RowFilter, export_bytes, forecast_table, iter_frame,
+                    month_key, write_chunks)
+from ingestion import MissingColumnsError, consolidate_files, read_data_file
+from instrumentation import Profiler, set_current_profiler, stage
+from resampling import DEFAULT_GRANULARITY, GRANULARITIES, horizon_periods, period_labels
+from result_cache import chart_key, content_hash, result_key
+from result_cache import shared_cache as process_cache
+from sketches import overall_sketch, sketch_quantiles
+from text_ops import STATUS_ENTREGUE, STATUS_PARCIAL, delivery_summary
+from tuning import tune_predictor
+from warm_boot import get_warm_dataset
+from model_registry import default_model_names, registered_models
+from grid import PAGE_SIZE, PagedTable
 
 # Importa módulo de ML
+from name_normalization import normalize_names, shared_normalizers
 from ml_predictions import (
     MLPredictor, 
+    cost_model_name,
+    forecast_name,
+    split_joint_forecast,
     create_prediction_charts, 
     create_cost_prediction_chart,
     create_anomaly_chart,
@@ -117,18 +151,96 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+MODE_PRELOADED = "Base pré-carregada"
+MODE_SINGLE_FILE = "Arquivo único"
+MODE_LOCAL_STORE = "Base local incremental"
+
+# Tempo máximo da busca de hiperparâmetros (segundos)
+TUNING_BUDGET = float(os.environ.get('DASHBOARD_TUNING_SECONDS', '60'))
+# Períodos anômalos listados na aba Anomalias
+MAX_LISTED_ANOMALIES = 20
+# Opções da simulação do orçamento e orçamentos comparados (fração do informado)
+SIMULATION_HORIZONS = [1, 3, 6, 12]
+SIMULATION_SCENARIOS = [5_000, 20_000, 50_000, 100_000]
+BUDGET_STEPS = [0.8, 0.9, 1.0, 1.1, 1.2, 1.5]
+
+
+@st.cache_resource
+def get_data_store():
+    """Base local compartilhada pelas sessões"""
+    return DataStore()
+
+
+@st.cache_resource
+def get_shared_cache():
+    """Dados, preditores e previsões compartilhados por todas as sessões do processo"""
+    return process_cache()
+
+
+@st.cache_resource
+def get_name_normalizers():
+    """Mapeamentos de nomes de peças e máquinas (salvos em data/nomes/)"""
+    return shared_normalizers()
+
+
+@st.cache_resource(max_entries=2)
+def load_store_dataset(version):
+    """Carrega as linhas da base local (uma vez por versão)"""
+    return get_data_store().load_dataset()
+
+
+uploaded_files = []
+data_store = None
+add_delta = reset_store = False
+
+# Conjunto de dados configurado em DASHBOARD_DATASET (pré-carregado em segundo plano)
+warm_dataset = get_warm_dataset()
+if warm_dataset is not None:
+    warm_dataset.start()
+
 # Sidebar
 with st.sidebar:
     st.markdown("### 📁 Upload de Dados")
     
-    uploaded_file = st.file_uploader(
-        "Carregar arquivo Excel ou CSV",
-        type=['xlsx', 'xls', 'csv'],
-        help="Faça upload do arquivo de solicitações"
+    data_mode = st.radio(
+        "Modo de dados",
+        ([MODE_PRELOADED] if warm_dataset is not None else []) + [MODE_SINGLE_FILE, MODE_LOCAL_STORE],
+        help="Na base local incremental, cada exportação mensal é adicionada ao histórico já salvo"
     )
     
-    if uploaded_file:
-        st.success(f"✓ {uploaded_file.name}")
+    if data_mode == MODE_PRELOADED:
+        data_store = warm_dataset.store
+        if not warm_dataset.ready.is_set():
+            with st.spinner("Carregando o conjunto de dados configurado..."):
+                warm_dataset.ready.wait()
+        st.caption(f"Pré-carregado: `{warm_dataset.source}` · {data_store.n_rows:,} solicitações "
+                   f"(versão {data_store.version}), verificado às {warm_dataset.last_sync:%H:%M:%S}")
+        if warm_dataset.last_error is not None:
+            st.warning(f"Falha na última atualização: {warm_dataset.last_error}")
+    elif data_mode == MODE_SINGLE_FILE:
+        uploaded_files = st.file_uploader(
+            "Carregar arquivos Excel ou CSV",
+            type=['xlsx', 'xls', 'csv'],
+            accept_multiple_files=True,
+            help="Faça upload do arquivo de solicitações. Com um arquivo por unidade, "
+                 "os dados são consolidados e cada linha recebe a unidade (nome do arquivo)"
+        )
+        
+        if len(uploaded_files) == 1:
+            st.success(f"✓ {uploaded_files[0].name}")
+        elif uploaded_files:
+            st.success(f"✓ {len(uploaded_files)} arquivos consolidados")
+    else:
+        data_store = get_data_store()
+        st.caption(f"Base local: {data_store.n_rows:,} solicitações (versão {data_store.version})")
+        
+        delta_file = st.file_uploader(
+            "Arquivo delta (novo mês)",
+            type=['xlsx', 'xls', 'csv'],
+            help="Exportação contendo apenas o período novo; requisições repetidas são ignoradas"
+        )
+        add_delta = st.button("➕ Adicionar arquivo delta", disabled=delta_file is None)
+        reset_store = st.button("🗑️ Limpar base local")
     
     st.markdown("---")
     
@@ -144,6 +256,36 @@ with st.sidebar:
     
     show_confidence = st.checkbox("Mostrar intervalos de confiança", value=True)
     
+    forecast_models = st.multiselect(
+        "Modelos de previsão",
+        [model.name for model in registered_models()],
+        default=default_model_names(),
+        help="Modelos caros são reduzidos ou ignorados em séries longas e interrompidos "
+             "ao estourar o orçamento de tempo"
+    ) or default_model_names()
+    
+    normalize_names_enabled = st.checkbox(
+        "🔤 Unificar variações de nomes",
+        value=True,
+        help="Junta descrições de peças e nomes de máquinas escritos de formas diferentes "
+             "(ex: 'Rolamento 6205' e 'ROLAMENTO SKF 6205')"
+    )
+    
+    tuning_enabled = st.checkbox(
+        "🎛️ Ajuste automático dos modelos",
+        value=False,
+        help=f"Busca os hiperparâmetros do Random Forest e do Gradient Boosting para a série "
+             f"(até {TUNING_BUDGET:.0f} s, uma única vez por conjunto de dados)"
+    )
+    
+    st.markdown("---")
+    profiling_enabled = st.checkbox(
+        "⏱️ Instrumentação de desempenho",
+        value=os.environ.get('DASHBOARD_PROFILE') == '1',
+        help="Mede tempo e memória de cada etapa (leitura, modelos, gráficos e envio ao navegador)"
+    )
+    profile_panel = st.empty()
+    
     st.markdown("---")
     st.markdown("### 📌 Sobre o Projeto")
     st.info("""
@@ -163,61 +305,269 @@ with st.sidebar:
     st.markdown("• Plotly")
 
 
+# Instrumentação desta execução do script (desligada por padrão)
+profiler = Profiler(enabled=profiling_enabled)
+set_current_profiler(profiler)
+
 # Funções auxiliares
 def format_currency(value):
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 def validate_dataframe(df):
     """Valida se o DataFrame tem as colunas necessárias"""
-    required_columns = ['Mês/Ano', 'Total', 'Solicitante', '2- Máquina de destino:', 
-                       '6- Descrição da peça: ', '7- Quantidade de peças.']
-    
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
     
     if missing_columns:
         return False, missing_columns
     
     return True, []
 
-# Processamento de dados
-if uploaded_file is not None:
-    try:
-        # Lê o arquivo baseado na extensão
-        file_extension = uploaded_file.name.split('.')[-1].lower()
+def show_quality_report(report):
+    """Resumo da validação dos dados (problemas em uma tabela recolhível)"""
+    if not report.problemas:
+        return
+    problems = report.to_frame()
+    has_errors = (problems['severidade'] == 'erro').any()
+    title = (f"🧪 Qualidade dos dados: {report.linhas_validas:,} de {report.linhas_recebidas:,} "
+             f"linhas válidas, {len(problems)} tipo(s) de problema")
+    with st.expander(title, expanded=has_errors):
+        st.dataframe(problems, use_container_width=True, hide_index=True)
+        st.caption("Valores não numéricos e vazios viram 0; linhas com mês mal formado ou "
+                   "id repetido são descartadas.")
+
+def show_missing_columns_error(missing_cols, columns, source=None):
+    st.error(f"""
+        ❌ **Erro: Colunas obrigatórias não encontradas{f' em `{source}`' if source else ''}!**
         
-        if file_extension == 'csv':
-            # Tenta diferentes encodings para CSV
-            try:
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
-            except:
-                uploaded_file.seek(0)  # Volta ao início do arquivo
-                try:
-                    df = pd.read_csv(uploaded_file, encoding='latin-1')
-                except:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding='iso-8859-1')
-        else:
-            df = pd.read_excel(uploaded_file)
+        **Colunas faltando:**
+        {', '.join([f'`{col}`' for col in missing_cols])}
         
-        # Valida as colunas
-        is_valid, missing_cols = validate_dataframe(df)
+        **Colunas encontradas no arquivo:**
+        {', '.join([f'`{col}`' for col in columns])}
+        
+        **Dica:** Verifique se o arquivo está no formato correto ou renomeie as colunas.
+    """)
+
+def with_cost_quantiles(table, sketch_name):
+    """Acrescenta à tabela a mediana, o P90 e o P99 do custo por solicitação de cada linha"""
+    if sketch_name not in predictor.aggregates:
+        return table
+    quantiles = shared_result(sketch_name, lambda: sketch_quantiles(predictor.aggregates[sketch_name]))
+    quantiles = quantiles.add_prefix('Custo ').round(2)
+    return table.join(quantiles, how='left')
+
+def show_paged_table(key, grid, default_sort=None):
+    """Tabela com busca, ordenação e paginação no servidor (só a página vai ao navegador)"""
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        query = st.text_input("🔍 Buscar", key=f'{key}_busca',
+                              placeholder=f"Trecho de {grid.label.lower()}")
+    with col2:
+        columns = grid.columns
+        sort_by = st.selectbox("Ordenar por", columns, key=f'{key}_ordem',
+                               index=columns.index(default_sort) if default_sort in columns else 0)
+    with col3:
+        ascending = st.selectbox("Sentido", ["↓ Maior", "↑ Menor"], key=f'{key}_sentido') == "↑ Menor"
+    
+    n_matches = len(grid) if not query else len(grid.search(query))
+    n_pages = max(-(-n_matches // PAGE_SIZE), 1)
+    # A busca pode reduzir o número de páginas abaixo da página escolhida
+    if st.session_state.get(f'{key}_pagina', 1) > n_pages:
+        st.session_state[f'{key}_pagina'] = 1
+    with col4:
+        page = st.number_input("Página", min_value=1, max_value=n_pages, step=1,
+                               key=f'{key}_pagina')
+    
+    rows, n_matches, n_pages = grid.page(query, sort_by, ascending, page - 1)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    st.caption(f"{n_matches:,} linha(s) · página {page} de {n_pages}")
+
+def render_chart(name, build, options=()):
+    """Monta o gráfico (ou o reaproveita do cache) e o envia ao navegador
+
+    O gráfico pronto fica no cache compartilhado indexado pelos dados e pelas
+    opções; uma nova execução com as mesmas entradas não reconstrói nem revalida
+    a figura do Plotly.
+    """
+    with stage(f'grafico.{name}'):
+        fig = shared_cache.get_or_compute(chart_key(dataset_key, name, options), build)
+    with stage(f'envio.{name}') as info:
+        if info is not None:
+            info['payload_kb'] = payload_size(fig) / 1024
+        st.plotly_chart(fig, use_container_width=True)
+
+def export_controls(key, name, build_table, options=()):
+    """Download da tabela no formato escolhido (gerado uma vez por conjunto de dados)"""
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox("Formato", list(EXPORT_FORMATS), key=f'{key}_formato',
+                           format_func=lambda f: EXPORT_FORMATS[f][0],
+                           label_visibility='collapsed')
+    with stage(f'exportacao.{key}'):
+        data = shared_cache.get_or_compute(
+            ('exportacao', dataset_key, key, options, fmt),
+            lambda: export_bytes(build_table(), fmt, sheet_name=name[:31])
+        )
+    with col2:
+        st.download_button(f"📥 Exportar ({EXPORT_FORMATS[fmt][0]})", data,
+                           file_name=f'{name}.{fmt}', mime=EXPORT_FORMATS[fmt][1],
+                           key=f'{key}_baixar', on_click='ignore')
+
+def build_predictor(df, aggregates, forecaster, tune=False):
+    """Preditor com os agregados já calculados (compartilhado entre sessões)"""
+    predictor = MLPredictor(df, aggregates=aggregates, forecaster=forecaster)
+    predictor.aggregates
+    if tune:
+        with stage('ajuste_modelos'):
+            tune_predictor(predictor, budget=TUNING_BUDGET)
+    return predictor
+
+def build_temporal_predictor(predictor, granularity, tune=False):
+    """Preditor na resolução escolhida, com a busca de hiperparâmetros da própria série"""
+    temporal = predictor.with_granularity(granularity)
+    if tune and temporal is not predictor:
+        with stage('ajuste_modelos'):
+            tune_predictor(temporal, budget=TUNING_BUDGET)
+    return temporal
+
+def shared_result(name, compute):
+    """Resultado calculado uma única vez por conjunto de dados, mesmo com várias sessões"""
+    return shared_cache.get_or_compute(result_key(dataset_key, name), compute)
+
+def temporal_name(name):
+    """Nome no cache de um resultado temporal (a resolução padrão mantém o nome)"""
+    return name if granularity == DEFAULT_GRANULARITY else f'{name}_{granularity}'
+
+def run_forecast(key, compute):
+    """Na base local, reaproveita previsões enquanto a série mensal não mudar"""
+    if data_store is None:
+        return shared_result(key, compute)
+    store_key = f'{key}_ajustado' if tuning_enabled else key
+    return shared_result(key, lambda: data_store.cached_forecast(store_key, compute))
+
+# Base local incremental
+if data_store is not None:
+    if reset_store:
+        data_store.reset()
+        load_store_dataset.clear()
+        # As versões recomeçam do zero: descarta o que foi calculado para a base antiga
+        get_shared_cache().invalidate(lambda key: key[1][0] == 'base')
+        st.sidebar.info("Base local apagada.")
+    
+    if add_delta:
+        df_delta = read_data_file(delta_file, delta_file.name)
+        is_valid, missing_cols = validate_dataframe(df_delta)
         
         if not is_valid:
-            st.error(f"""
-                ❌ **Erro: Colunas obrigatórias não encontradas!**
-                
-                **Colunas faltando:**
-                {', '.join([f'`{col}`' for col in missing_cols])}
-                
-                **Colunas encontradas no arquivo:**
-                {', '.join([f'`{col}`' for col in df.columns.tolist()])}
-                
-                **Dica:** Verifique se o arquivo está no formato correto ou renomeie as colunas.
-            """)
+            show_missing_columns_error(missing_cols, df_delta.columns.tolist(), delta_file.name)
             st.stop()
         
-        # Inicializa preditor ML
-        predictor = MLPredictor(df)
+        df_delta, delta_report = validate_data(df_delta)
+        result = data_store.append(df_delta)
+        if delta_report.linhas_removidas:
+            st.sidebar.warning(
+                f"{delta_report.linhas_removidas:,} linhas descartadas na validação "
+                "(mês mal formado ou id repetido)"
+            )
+        st.sidebar.success(
+            f"✓ {result.linhas_novas:,} novas solicitações "
+            f"({result.linhas_duplicadas:,} repetidas ignoradas)"
+        )
+        if result.meses_afetados:
+            st.sidebar.caption(f"Meses atualizados: {', '.join(result.meses_afetados)}")
+        if not result.series_alteradas:
+            st.sidebar.caption("Séries mensais inalteradas: previsões reaproveitadas.")
+
+# Processamento de dados
+if data_mode == MODE_PRELOADED:
+    has_data = warm_dataset.snapshot() is not None and not warm_dataset.snapshot()[1].empty
+else:
+    has_data = bool(uploaded_files) or (data_store is not None and data_store.has_data())
+
+if has_data:
+    try:
+        shared_cache = get_shared_cache()
+        if data_mode == MODE_PRELOADED:
+            # Linhas e agregados da mesma versão, mesmo se a thread atualizar a base agora
+            version, df, aggregates, quality_report = warm_dataset.snapshot()
+            dataset_key = warm_dataset.dataset_key(version)
+        elif data_store is not None:
+            dataset_key = ('base', data_store.version)
+            with stage('leitura'):
+                df = load_store_dataset(data_store.version)
+            aggregates = data_store.aggregates
+        if data_store is not None:
+            forecaster = data_store.forecaster
+            
+            # Valida as colunas
+            with stage('validacao'):
+                is_valid, missing_cols = validate_dataframe(df)
+            
+            if not is_valid:
+                show_missing_columns_error(missing_cols, df.columns.tolist())
+                st.stop()
+            
+            # Limpeza tipada e relatório de qualidade (uma passada por coluna); a
+            # base pré-carregada já foi validada pela thread ao adicionar os arquivos
+            if data_mode != MODE_PRELOADED:
+                with stage('qualidade'):
+                    df, quality_report = shared_cache.get_or_compute(
+                        ('qualidade', dataset_key), lambda: validate_data(df)
+                    )
+        else:
+            # Sessões que enviam os mesmos arquivos compartilham a leitura e os modelos
+            dataset_key = (content_hash(''.join(
+                f"{f.name}:{content_hash(f.getvalue())};"
+                for f in sorted(uploaded_files, key=lambda f: f.name)
+            ).encode()),)
+            # Cada arquivo é lido, validado e agregado em paralelo (map-reduce)
+            with stage('leitura'):
+                try:
+                    df, aggregates, quality_report = shared_cache.get_or_compute(
+                        ('dados', dataset_key), lambda: consolidate_files(uploaded_files)
+                    )
+                except MissingColumnsError as e:
+                    show_missing_columns_error(e.missing, e.columns, e.source)
+                    st.stop()
+            forecaster = None
+        show_quality_report(quality_report)
+        
+        # Unifica variações de nomes de peças e máquinas
+        if normalize_names_enabled:
+            name_normalizers = get_name_normalizers()
+            names_revision = tuple(n.revision for n in name_normalizers.values())
+            with stage('normalizacao_nomes'):
+                df, aggregates = shared_cache.get_or_compute(
+                    ('nomes', dataset_key, names_revision),
+                    lambda: normalize_names(df, name_normalizers, aggregates)
+                )
+            dataset_key = dataset_key + ('nomes', names_revision)
+        
+        # Inicializa preditor ML (com ajuste, os resultados ficam em chaves separadas)
+        if tuning_enabled:
+            dataset_key = dataset_key + ('ajuste',)
+        with stage('preditor'):
+            predictor = shared_cache.get_or_compute(
+                ('preditor', dataset_key),
+                lambda: build_predictor(df, aggregates, forecaster, tune=tuning_enabled)
+            )
+        
+        # Resolução das séries temporais (diária e semanal exigem a coluna de data)
+        granularity = DEFAULT_GRANULARITY
+        if len(predictor.granularities) > 1:
+            granularity = st.sidebar.selectbox(
+                "📅 Resolução das séries", predictor.granularities,
+                index=predictor.granularities.index(DEFAULT_GRANULARITY),
+                format_func=GRANULARITIES.get, key='resolucao',
+                help="Séries diárias e semanais mostram picos que somem na soma mensal; "
+                     "o horizonte de previsão continua em meses"
+            )
+        # Preditor na resolução escolhida: mesmos agregados e índice de tempo
+        temporal = shared_cache.get_or_compute(
+            ('preditor', dataset_key, granularity),
+            lambda: build_temporal_predictor(predictor, granularity, tune=tuning_enabled)
+        )
+        horizon = horizon_periods(prediction_months, granularity)
         
         # Tabs principais
         tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
@@ -232,7 +582,7 @@ if uploaded_file is not None:
         ])
         
         # TAB 1: ANÁLISE TEMPORAL
-        with tab1:
+        with tab1, stage('aba.temporal'):
             col1, col2, col3 = st.columns(3)
             
             with col1:
@@ -254,7 +604,8 @@ if uploaded_file is not None:
             
             with col3:
                 # Calcula tendência
-                trend, interpretation, slope = predictor.calculate_trend()
+                trend, interpretation, slope = shared_result(temporal_name('tendencia'),
+                                                             temporal.calculate_trend)
                 trend_emoji = "📈" if slope > 0 else "📉" if slope < 0 else "➡️"
                 st.markdown(f"""
                     <div class='metric-card'>
@@ -270,44 +621,61 @@ if uploaded_file is not None:
                 </div>
             """, unsafe_allow_html=True)
             
-            # Análise mensal
-            df_month = df.groupby('Mês/Ano').agg({
-                'Mês/Ano': 'count',
-                'Total': 'sum'
-            }).rename(columns={'Mês/Ano': 'Quantidade'})
+            # Série da resolução escolhida, montada a partir dos agregados (sem reagrupar as linhas)
+            df_month = temporal.time_index.series(granularity)
             
-            # Ordena cronologicamente
-            df_month['Data_Sort'] = pd.to_datetime(df_month.index, format='%m-%Y')
-            df_month = df_month.sort_values('Data_Sort')
-            
-            fig = px.line(df_month, y='Quantidade', 
-                         title='Evolução Mensal de Solicitações',
-                         markers=True)
-            fig.update_traces(line_color='#667eea', line_width=3)
-            st.plotly_chart(fig, use_container_width=True)
-            
-            fig2 = px.bar(df_month, y='Total',
-                         title='Custo Total por Mês',
-                         color_discrete_sequence=['#764ba2'])
-            st.plotly_chart(fig2, use_container_width=True)
+            render_chart('evolucao_mensal', lambda: create_monthly_requests_chart(df_month, granularity),
+                         options=(granularity,))
+            
+            render_chart('custo_mensal', lambda: create_monthly_cost_chart(df_month, granularity),
+                         options=(granularity,))
         
         # TAB 2: PREVISÕES COM IA
-        with tab2:
+        with tab2, stage('aba.previsoes'):
             st.markdown("## 🔮 Previsões Inteligentes")
             
+            joint_forecast = st.toggle(
+                "Previsão conjunta (solicitações, custo e peças)",
+                value=True,
+                help="Um único ajuste por modelo prevê as três séries mensais, "
+                     "mantendo as previsões coerentes entre si"
+            )
+            
+            # Faz previsões (o horizonte em meses vira períodos da resolução escolhida)
+            pred_parts = None
+            models_key = '_'.join(forecast_models)
+            # A resolução padrão mantém as chaves dos gráficos pré-calculados
+            chart_options = (prediction_months, joint_forecast, models_key)
+            if granularity != DEFAULT_GRANULARITY:
+                chart_options += (granularity,)
+            if joint_forecast:
+                # Custo e peças do mesmo modelo usado antes na previsão de custos
+                # (ou do melhor modelo, se o Gradient Boosting não estiver entre os escolhidos)
+                df_month, predictions, future_dates, scores, pred_costs, pred_parts = \
+                    split_joint_forecast(run_forecast(
+                        forecast_name('conjunta', prediction_months, forecast_models, granularity),
+                        lambda: temporal.predict_joint(months=horizon, models=forecast_models)
+                    ))
+                df_month_cost, future_dates_cost = df_month, future_dates
+            else:
+                df_month, predictions, future_dates, scores = run_forecast(
+                    forecast_name('demanda', prediction_months, forecast_models, granularity),
+                    lambda: temporal.predict_next_months(months=horizon, models=forecast_models)
+                )
+                df_month_cost, pred_costs, future_dates_cost, cost_score = run_forecast(
+                    forecast_name('custos', prediction_months, granularity=granularity),
+                    lambda: temporal.predict_costs(months=horizon)
+                )
+            
             col1, col2 = st.columns([2, 1])
             
             with col1:
                 st.markdown("### Previsão de Solicitações")
                 
-                # Faz previsões
-                df_month, predictions, future_dates, scores = predictor.predict_next_months(
-                    months=prediction_months
-                )
-                
                 # Cria gráfico
-                fig = create_prediction_charts(df_month, predictions, future_dates, scores)
-                st.plotly_chart(fig, use_container_width=True)
+                render_chart('previsao_solicitacoes', lambda: create_prediction_charts(
+                    df_month, predictions, future_dates, scores, granularity
+                ), options=chart_options)
             
             with col2:
                 st.markdown("### 📊 Modelos Utilizados")
@@ -328,21 +696,42 @@ if uploaded_file is not None:
                         Acurácia: {scores[best_model]:.2%}
                     </div>
                 """, unsafe_allow_html=True)
+                
+                # Modelos executados, reduzidos, ignorados ou interrompidos
+                model_runs = temporal.model_runs.get('Conjunta' if joint_forecast else 'Quantidade')
+                if model_runs:
+                    with st.expander("⏱️ Execução dos modelos"):
+                        st.dataframe(pd.DataFrame(model_runs), use_container_width=True,
+                                     hide_index=True)
+                
+                # Resultado da busca de hiperparâmetros
+                if temporal.tuning is not None:
+                    for name, result in temporal.tuning['Quantidade'].items():
+                        if result['parametros'] and result['erro_padrao']:
+                            gain = 1 - result['erro'] / result['erro_padrao']
+                            st.caption(f"🎛️ {name}: erro {gain:.0%} menor que o padrão "
+                                       f"({result['avaliacoes']} avaliações)")
+                        else:
+                            st.caption(f"🎛️ {name}: configuração padrão mantida")
+                
+                # Como cada modelo foi atualizado na base local (warm start)
+                if forecaster is not None and forecaster.last_updates:
+                    st.caption("Atualização dos modelos: " + ", ".join(
+                        f"{name} ({serie}): {status}"
+                        for (serie, name), status in forecaster.last_updates.items()
+                    ))
             
             st.markdown("---")
             
             # Previsão de custos
             st.markdown("### 💰 Previsão de Custos")
             
-            df_month_cost, pred_costs, future_dates_cost, cost_score = predictor.predict_costs(
-                months=prediction_months
-            )
-            
-            fig_cost = create_cost_prediction_chart(df_month_cost, pred_costs, future_dates_cost)
-            st.plotly_chart(fig_cost, use_container_width=True)
+            render_chart('previsao_custos', lambda: create_cost_prediction_chart(
+                df_month_cost, pred_costs, future_dates_cost, granularity
+            ), options=chart_options)
             
             # Resumo financeiro
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             
             with col1:
                 total_predicted = sum(pred_costs)
@@ -359,30 +748,114 @@ if uploaded_file is not None:
                 )
             
             with col3:
+                # Média por período da resolução escolhida, prevista e histórica
                 current_avg = df_month_cost['Total'].mean()
-                diff = ((avg_predicted - current_avg) / current_avg) * 100
+                diff = ((total_predicted / len(pred_costs) - current_avg) / current_avg) * 100
                 st.metric(
                     "Variação Esperada",
                     f"{diff:+.1f}%",
                     delta=f"{diff:+.1f}%"
                 )
             
+            with col4:
+                if pred_parts is not None:
+                    st.metric(
+                        f"Peças Previstas ({prediction_months} meses)",
+                        f"{sum(pred_parts):,.0f}"
+                    )
+            
             # Tabela de previsões
             st.markdown("### 📋 Tabela de Previsões Detalhadas")
             
+            table_model = cost_model_name(predictions, scores)
             pred_df = pd.DataFrame({
-                'Mês': [d.strftime('%m-%Y') for d in future_dates],
-                'Solicitações Previstas (Gradient Boosting)': predictions['Gradient Boosting'].astype(int),
+                'Mês' if granularity == DEFAULT_GRANULARITY else 'Período':
+                    period_labels(future_dates, granularity),
+                f'Solicitações Previstas ({table_model})': predictions[table_model].astype(int),
                 'Custo Previsto': [format_currency(c) for c in pred_costs]
             })
+            if pred_parts is not None:
+                pred_df['Peças Previstas'] = pred_parts.round().astype(int)
             
             st.dataframe(pred_df, use_container_width=True)
-        
+            # Valores numéricos de todos os modelos (a tabela acima é formatada)
+            export_controls('previsoes', f'previsoes_{prediction_months}_meses',
+                            lambda: forecast_table(future_dates, predictions, pred_costs,
+                                                   pred_parts, granularity),
+                            options=chart_options)
+
+            st.markdown("---")
+
+            # Simulação do orçamento (cenários sorteados do histórico por peça)
+            st.markdown("### 🎲 Simulação do Orçamento")
+            st.caption("Cada cenário sorteia meses inteiros do histórico (demanda de todas as peças) "
+                       "e um custo unitário já praticado para cada peça.")
+
+            try:
+                part_hist = shared_result('historico_pecas',
+                                          lambda: part_history(predictor.aggregates))
+            except ValueError as e:
+                part_hist = None
+                st.info(f"Simulação indisponível: {e}")
+
+            if part_hist is not None:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    sim_months = st.selectbox("Horizonte (meses)", SIMULATION_HORIZONS,
+                                              index=SIMULATION_HORIZONS.index(DEFAULT_HORIZON),
+                                              key='simulacao_meses')
+                with col2:
+                    n_scenarios = st.selectbox("Cenários", SIMULATION_SCENARIOS,
+                                               index=SIMULATION_SCENARIOS.index(DEFAULT_SCENARIOS),
+                                               format_func=lambda n: f"{n:,}".replace(",", "."),
+                                               key='simulacao_cenarios')
+                with col3:
+                    # Referência: gasto dos últimos meses do histórico, no mesmo horizonte
+                    budget = st.number_input(
+                        "Orçamento (R$)", min_value=0.0, step=1000.0, format="%.2f",
+                        value=round(recent_spend(predictor.aggregates, sim_months), 2),
+                        key=f'simulacao_orcamento_{sim_months}'
+                    )
+
+                # Os cenários não dependem do orçamento: mudar o valor não refaz a simulação
+                with stage('simulacao_orcamento'):
+                    simulation = shared_result(
+                        f'simulacao_{sim_months}_{n_scenarios}',
+                        lambda: simulate_spend(part_hist, sim_months, n_scenarios)
+                    )
+                percentiles = simulation.percentiles()
+
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Prob. de Estourar o Orçamento",
+                              f"{simulation.exceedance([budget])[0]:.1%}")
+                with col2:
+                    st.metric("Gasto Mediano (P50)", format_currency(percentiles['P50']))
+                with col3:
+                    st.metric("Gasto P95", format_currency(percentiles['P95']))
+                with col4:
+                    st.metric("Gasto Médio", format_currency(simulation.mean))
+
+                render_chart('simulacao_orcamento',
+                             lambda: create_spend_simulation_chart(simulation, budget),
+                             options=(sim_months, n_scenarios, budget))
+
+                # Probabilidade de estouro em torno do orçamento informado
+                budgets = [budget * step for step in BUDGET_STEPS]
+                exceed_df = simulation.exceedance_table(budgets)
+                exceed_df['Orçamento'] = [format_currency(b) for b in budgets]
+                exceed_df['Prob. Estouro'] = [f"{p:.1%}" for p in exceed_df['Prob. Estouro']]
+                st.dataframe(exceed_df, use_container_width=True, hide_index=True)
+                st.caption(f"{simulation.n_scenarios:,} cenários · {simulation.n_parts:,} peças · "
+                           f"histórico de {simulation.history_months[0]} a "
+                           f"{simulation.history_months[-1]}")
+
         # TAB 3: DETECÇÃO DE ANOMALIAS
-        with tab3:
+        with tab3, stage('aba.anomalias'):
             st.markdown("## ⚠️ Detecção Inteligente de Anomalias")
             
-            df_month_anom, anomalies = predictor.identify_anomalies()
+            df_month_anom, anomalies = shared_result(temporal_name('anomalias'),
+                                                     temporal.identify_anomalies)
             
             col1, col2, col3 = st.columns(3)
             
@@ -401,14 +874,22 @@ if uploaded_file is not None:
                 st.metric("Média Normal", f"{normal_mean:.0f}")
             
             # Gráfico de anomalias
-            fig_anom = create_anomaly_chart(df_month_anom, anomalies)
-            st.plotly_chart(fig_anom, use_container_width=True)
+            render_chart(temporal_name('anomalias'),
+                         lambda: create_anomaly_chart(df_month_anom, anomalies))
             
             # Lista de anomalias
             if len(anomalies) > 0:
                 st.markdown("### 📊 Períodos com Comportamento Anômalo")
                 
-                for idx, row in anomalies.iterrows():
+                # Nas séries diárias podem ser muitas: lista só as mais extremas
+                listed = anomalies
+                if len(anomalies) > MAX_LISTED_ANOMALIES:
+                    st.caption(f"{MAX_LISTED_ANOMALIES} de {len(anomalies)} períodos anômalos "
+                               "(os de maior desvio)")
+                    extreme = anomalies['Z_Score'].abs().nlargest(MAX_LISTED_ANOMALIES).index
+                    listed = anomalies.loc[extreme].sort_values('Data')
+                
+                for idx, row in listed.iterrows():
                     st.markdown(f"""
                         <div class='warning-box'>
                             <strong>📅 {idx}</strong><br>
@@ -421,13 +902,15 @@ if uploaded_file is not None:
                 st.success("✅ Nenhuma anomalia significativa detectada!")
         
         # TAB 4: SOLICITANTES
-        with tab4:
-            df_sol = df.groupby('Solicitante').agg({
-                'Solicitante': 'count',
-                'Total': ['sum', 'mean']
-            }).round(2)
-            df_sol.columns = ['Quantidade', 'Custo Total', 'Custo Médio']
-            df_sol = df_sol.sort_values('Quantidade', ascending=False)
+        with tab4, stage('aba.solicitantes'):
+            # Tabela completa a partir dos agregados (calculada uma vez por conjunto de dados)
+            def requester_table():
+                table = predictor.aggregates['solicitante'].rename(
+                    columns={'Custo_Total': 'Custo Total'})
+                table['Custo Médio'] = table['Custo Total'] / table['Quantidade']
+                return table.round(2).sort_values('Quantidade', ascending=False)
+            
+            df_sol = shared_result('solicitantes', requester_table)
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -438,20 +921,21 @@ if uploaded_file is not None:
                 top_custo = df_sol.sort_values('Custo Total', ascending=False).index[0]
                 st.metric("Maior Custo", top_custo)
             
-            fig = px.bar(df_sol.head(15), x='Quantidade', 
-                        orientation='h',
-                        title='Top 15 Solicitantes por Quantidade',
-                        color='Quantidade',
-                        color_continuous_scale='Purples')
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart('solicitantes', lambda: create_requesters_chart(df_sol))
             
-            st.dataframe(df_sol.head(50), use_container_width=True)
+            requester_grid = shared_result('grade_solicitantes', lambda: PagedTable(
+                with_cost_quantiles(df_sol, 'quantis_solicitante'), label='Solicitante'))
+            show_paged_table('solicitantes', requester_grid, default_sort='Quantidade')
         
         # TAB 5: MÁQUINAS COM CRITICIDADE
-        with tab5:
+        with tab5, stage('aba.maquinas'):
             st.markdown("## 🔧 Análise de Criticidade de Máquinas")
             
-            df_machine_crit = predictor.predict_maintenance_demand()
+            df_machine_crit = shared_result('criticidade', predictor.predict_maintenance_demand)
+            if 'Pontuacao' in df_machine_crit:
+                st.caption(f"Pontuação de 0 a 100 por frequência (40%), custo (30%), tendência (15%) "
+                           f"e diversidade de peças (15%); cada mês pesa a metade a cada "
+                           f"{HALF_LIFE} meses (tendência: últimos {SHORT_HALF_LIFE} meses).")
             
             # Métricas
             col1, col2, col3 = st.columns(3)
@@ -471,8 +955,7 @@ if uploaded_file is not None:
                          delta="Estáveis", delta_color="normal")
             
             # Gráfico de dispersão
-            fig_crit = create_criticality_chart(df_machine_crit)
-            st.plotly_chart(fig_crit, use_container_width=True)
+            render_chart('criticidade', lambda: create_criticality_chart(df_machine_crit))
             
             # Lista de máquinas críticas
             st.markdown("### ⚠️ Máquinas que Requerem Atenção Especial")
@@ -480,22 +963,31 @@ if uploaded_file is not None:
             high_machines = df_machine_crit[df_machine_crit['Criticidade'] == 'Alta'].head(10)
             
             for machine, row in high_machines.iterrows():
+                # Pontuação com decaimento (ausente em bases gravadas antes dela)
+                decayed = (f"<br>Pontuação: {row['Pontuacao']:.0f} | "
+                           f"Solicitações/mês: {row['Freq_Mensal']:.1f} | "
+                           f"Tendência: {row['Tendencia']:+.0%} | "
+                           f"Peças diferentes: {row['Diversidade_Pecas']:.0f}"
+                           if 'Pontuacao' in row else "")
                 st.markdown(f"""
                     <div class='warning-box'>
                         <strong>🔧 {machine}</strong><br>
-                        Solicitações: {row['Solicitacoes']:.0f} | 
-                        Custo Total: {format_currency(row['Custo_Total'])} | 
-                        Custo Médio: {format_currency(row['Custo_Medio'])}
+                        Solicitações: {row['Solicitacoes']:.0f} |
+                        Custo Total: {format_currency(row['Custo_Total'])} |
+                        Custo Médio: {format_currency(row['Custo_Medio'])}{decayed}
                     </div>
                 """, unsafe_allow_html=True)
             
-            st.dataframe(df_machine_crit, use_container_width=True)
+            st.dataframe(with_cost_quantiles(df_machine_crit, 'quantis_maquina'),
+                         use_container_width=True)
+            export_controls('criticidade', 'criticidade_maquinas', lambda: with_cost_quantiles(
+                df_machine_crit, 'quantis_maquina').rename_axis('Máquina').reset_index())
         
         # TAB 6: PEÇAS COM PREVISÃO DE DEMANDA
-        with tab6:
+        with tab6, stage('aba.pecas'):
             st.markdown("## 📦 Análise de Peças com Previsão de Demanda")
             
-            df_parts_pred = predictor.predict_part_demand()
+            df_parts_pred = shared_result('demanda_pecas', predictor.predict_part_demand)
             
             # Métricas
             col1, col2, col3 = st.columns(3)
@@ -514,43 +1006,42 @@ if uploaded_file is not None:
             # Top peças com previsão
             st.markdown("### 📊 Top 20 Peças - Previsão de Demanda")
             
-            top_parts = df_parts_pred.head(20).reset_index()
-            
-            fig_parts = go.Figure()
-            
-            fig_parts.add_trace(go.Bar(
-                y=top_parts['6- Descrição da peça: '].str[:40],
-                x=top_parts['Taxa_Mensal'],
-                name='Taxa Mensal Atual',
-                orientation='h',
-                marker_color='#667eea'
-            ))
-            
-            fig_parts.add_trace(go.Bar(
-                y=top_parts['6- Descrição da peça: '].str[:40],
-                x=top_parts['Previsao_3_Meses'],
-                name='Previsão 3 Meses',
-                orientation='h',
-                marker_color='#4ecdc4',
-                opacity=0.7
-            ))
-            
-            fig_parts.update_layout(
-                title='Comparação: Consumo Atual vs Previsão',
-                barmode='group',
-                height=600
-            )
-            
-            st.plotly_chart(fig_parts, use_container_width=True)
+            render_chart('demanda_pecas', lambda: create_part_demand_chart(df_parts_pred))
             
             # Tabela detalhada
             st.markdown("### 📋 Tabela de Previsões por Peça")
             
-            display_df = df_parts_pred.head(50).reset_index()
-            display_df.columns = ['Peça', 'Qtd Total', 'Freq. Solicitação', 
-                                  'Taxa Mensal', 'Prev. 3 Meses', 'Prev. 6 Meses']
-            
-            st.dataframe(display_df, use_container_width=True)
+            def part_grid():
+                display_df = df_parts_pred.copy()
+                display_df.columns = ['Qtd Total', 'Freq. Solicitação',
+                                      'Taxa Mensal', 'Prev. 3 Meses', 'Prev. 6 Meses']
+                return PagedTable(display_df, label='Peça')
+            
+            show_paged_table('pecas', shared_result('grade_pecas', part_grid),
+                             default_sort='Qtd Total')
+            export_controls('demanda_pecas', 'demanda_pecas',
+                            lambda: df_parts_pred.rename_axis('Peça').reset_index())
+            
+            if normalize_names_enabled:
+                with st.expander("🔤 Variações de nomes unificadas"):
+                    for column, label in [(COL_PECA, "Peças"), (COL_MAQUINA, "Máquinas")]:
+                        variants = name_normalizers[column].variants()
+                        st.markdown(f"**{label}:** {len(variants)} nomes com variações")
+                        if not variants.empty:
+                            st.dataframe(variants, use_container_width=True, hide_index=True)
+                    
+                    # Ajuste manual: tem prioridade sobre o mapeamento aprendido
+                    with st.form("ajuste_nomes"):
+                        st.markdown("**Ajuste manual**")
+                        adjust_column = st.selectbox("Campo", [COL_PECA, COL_MAQUINA],
+                                                     format_func=lambda c: "Peça" if c == COL_PECA else "Máquina")
+                        adjust_original = st.text_input("Nome original (como aparece no arquivo)")
+                        adjust_canonical = st.text_input("Nome canônico (vazio remove o ajuste)")
+                        if st.form_submit_button("Salvar ajuste") and adjust_original:
+                            normalizer = name_normalizers[adjust_column]
+                            normalizer.set_override(adjust_original, adjust_canonical.strip())
+                            normalizer.save()
+                            st.rerun()
             
             # Recomendações de estoque
             st.markdown("### 💡 Recomendações Inteligentes de Estoque")
@@ -569,25 +1060,28 @@ if uploaded_file is not None:
                 """, unsafe_allow_html=True)
         
         # TAB 7: ENTREGAS
-        with tab7:
-            df_entrega = df['Entregue?'].value_counts().reset_index()
-            df_entrega.columns = ['Status', 'Quantidade']
+        with tab7, stage('aba.entregas'):
+            # Classifica cada status distinto uma vez (agregado 'entrega'), não cada linha
+            delivery = delivery_summary(
+                predictor.aggregates.get('entrega', pd.DataFrame({'Quantidade': []})), len(df)
+            )
+            df_entrega = delivery[delivery > 0].rename_axis('Status').reset_index(name='Quantidade')
             
-            fig = px.pie(df_entrega, values='Quantidade', names='Status',
-                        title='Distribuição de Entregas por Status',
-                        color_discrete_sequence=px.colors.sequential.Purp)
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart('entregas', lambda: create_delivery_chart(df_entrega))
             
-            entregues = df[df['Entregue?'].str.contains('Sim', na=False)].shape[0]
+            entregues = int(delivery[STATUS_ENTREGUE])
             taxa = (entregues / len(df) * 100)
             
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Taxa de Entrega", f"{taxa:.1f}%")
             with col2:
                 st.metric("Entregues", entregues)
             with col3:
-                st.metric("Pendentes", len(df) - entregues)
+                st.metric("Parciais", int(delivery[STATUS_PARCIAL]))
+            with col4:
+                st.metric("Pendentes", len(df) - entregues - int(delivery[STATUS_PARCIAL]),
+                         help="Pendente, aguardando, em separação, não entregue ou sem informação")
             
             # Análise de performance
             if taxa >= 90:
@@ -613,7 +1107,7 @@ if uploaded_file is not None:
                 """, unsafe_allow_html=True)
         
         # TAB 8: FINANCEIRO
-        with tab8:
+        with tab8, stage('aba.financeiro'):
             custo_total = df['Total'].sum()
             custo_medio = df['Total'].mean()
             
@@ -632,25 +1126,81 @@ if uploaded_file is not None:
             df_financeiro['Data_Sort'] = pd.to_datetime(df_financeiro['Mês/Ano'], format='%m-%Y')
             df_financeiro = df_financeiro.sort_values('Data_Sort')
             
-            fig = px.line(df_financeiro, x='Mês/Ano', y='Total',
-                         title='Evolução dos Custos Mensais',
-                         markers=True)
-            fig.update_traces(line_color='#667eea', line_width=3)
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart('financeiro', lambda: create_financial_chart(df_financeiro))
             
             # Análise de distribuição de custos
             st.markdown("### 💰 Distribuição de Custos por Máquina")
             
             df_machine_cost = df.groupby('2- Máquina de destino:')['Total'].sum().sort_values(ascending=False).head(10)
             
-            fig_dist = px.pie(
-                values=df_machine_cost.values,
-                names=df_machine_cost.index,
-                title='Top 10 Máquinas - Distribuição de Custos'
-            )
-            st.plotly_chart(fig_dist, use_container_width=True)
+            render_chart('custo_maquinas', lambda: create_machine_cost_chart(df_machine_cost))
             
             st.dataframe(df_financeiro, use_container_width=True)
+            
+            # Consolidação de várias unidades
+            if 'unidade' in predictor.aggregates and len(predictor.aggregates['unidade']) > 1:
+                st.markdown("### 🏭 Custos por Unidade")
+                df_sites = predictor.aggregates['unidade'].sort_values('Custo_Total', ascending=False)
+                df_sites['Custo_Medio'] = df_sites['Custo_Total'] / df_sites['Solicitacoes']
+                st.dataframe(df_sites, use_container_width=True)
+            
+            # Distribuição do custo por solicitação (resumo aproximado) e cardinalidades
+            if 'quantis_maquina' in predictor.aggregates:
+                st.markdown("### 📐 Distribuição do Custo por Solicitação")
+                overall = sketch_quantiles(overall_sketch(predictor.aggregates['quantis_maquina']))
+                col1, col2, col3 = st.columns(3)
+                for col, name in zip((col1, col2, col3), overall.columns):
+                    with col:
+                        st.metric(f"Custo {name}", format_currency(overall.loc['Total', name]))
+            
+            # Cardinalidades exatas: uma linha por valor nas tabelas agregadas
+            col1, col2, col3 = st.columns(3)
+            for col, (label, table) in zip((col1, col2, col3), [
+                ("Máquinas distintas", 'maquina'), ("Peças distintas", 'peca'),
+                ("Solicitantes distintos", 'solicitante')
+            ]):
+                with col:
+                    st.metric(label, f"{len(predictor.aggregates[table]):,}")
+        
+        # Exportação das solicitações filtradas
+        with st.expander("📤 Exportar Solicitações Filtradas"):
+            months = sorted((m for m in predictor.aggregates['mensal'].index.astype(str)
+                             if month_key(m) is not None), key=month_key)
+            col1, col2 = st.columns(2)
+            with col1:
+                start_month, end_month = st.select_slider(
+                    "Período", options=months, value=(months[0], months[-1]), key='exportar_periodo'
+                ) if len(months) > 1 else (None, None)
+                export_part = st.text_input("Trecho da descrição da peça", key='exportar_peca')
+            with col2:
+                export_machines = st.multiselect(
+                    "Máquinas (vazio = todas)", sorted(predictor.aggregates['maquina'].index.astype(str)),
+                    key='exportar_maquinas'
+                )
+                export_format = st.selectbox("Formato", list(EXPORT_FORMATS), key='exportar_formato',
+                                             format_func=lambda f: EXPORT_FORMATS[f][0])
+            row_filter = RowFilter(start_month, end_month, tuple(export_machines), export_part.strip())
+            export_key = ('exportacao', dataset_key, 'dados', row_filter, export_format)
+            
+            if st.button("Preparar arquivo", key='exportar_preparar'):
+                st.session_state['exportar_chave'] = export_key
+            if st.session_state.get('exportar_chave') == export_key:
+                def filtered_rows():
+                    # Bloco a bloco: filtro e conversão só seguram um bloco por vez
+                    buffer = io.BytesIO()
+                    rows = write_chunks(row_filter.filter_chunks(iter_frame(df)), export_format,
+                                        buffer, sheet_name='Solicitações')
+                    return rows, buffer.getvalue()
+                
+                with st.spinner("Gerando arquivo..."), stage('exportacao.dados'):
+                    n_export, data = shared_cache.get_or_compute(export_key, filtered_rows)
+                st.download_button(
+                    f"📥 Baixar {n_export:,} solicitações ({EXPORT_FORMATS[export_format][0]})",
+                    data, file_name=f'solicitacoes.{export_format}',
+                    mime=EXPORT_FORMATS[export_format][1], key='exportar_baixar', on_click='ignore'
+                )
+            st.caption("Para exportações muito grandes, use a API local "
+                       "(`/api/exportar/dados`), que grava o arquivo direto na resposta.")
         
         # Rodapé com insights gerais
         st.markdown("---")
@@ -777,6 +1327,27 @@ else:
         - Se tiver problemas com acentos, tente encoding Latin-1
     """)
 
+# Painel de instrumentação (preenchido no fim da execução)
+if profiler.enabled:
+    profiler.write_log(origem='dashboard')
+    profiler.close()
+    with profile_panel.container():
+        with st.expander("⏱️ Tempo por etapa", expanded=False):
+            timings = profiler.to_frame()
+            if timings.empty:
+                st.caption("Nenhuma etapa medida nesta execução.")
+            else:
+                top_level = sum(r['tempo_s'] for r in profiler.records if r['nivel'] == 0)
+                st.caption(f"Etapas principais: {top_level:.2f} s")
+                if has_data:
+                    cache_stats = get_shared_cache().stats()
+                    st.caption(
+                        f"Cache compartilhado: {cache_stats['entradas']} entradas, "
+                        f"{cache_stats['memoria_mb']:.0f} MB, {cache_stats['acertos']} acertos, "
+                        f"{cache_stats['agrupados']} cálculos agrupados"
+                    )
+                st.dataframe(timings.round(3), use_container_width=True, hide_index=True)
+
 # Rodapé
 st.markdown("---")
 st.markdown("""
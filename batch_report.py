@@ -0,0 +1,250 @@
+"""
+Relatório em lote (sem navegador) para execução agendada
+Dashboard de Análise de Peças
+
+Executa a leitura dos dados, as previsões do MLPredictor, a detecção de
+anomalias, a criticidade das máquinas e a projeção de demanda de peças sobre
+um arquivo ou diretório e grava os resultados em JSON, Parquet e/ou HTML.
+
+Exemplo (cron):
+    python batch_report.py dados/ --output relatorios/2025-10 --months 6
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from instrumentation import Profiler
+from ingestion import DEFAULT_CHUNKSIZE, aggregate_files, list_data_files
+from tuning import tune_predictor
+from ml_predictions import (
+    MLPredictor,
+    create_prediction_charts,
+    create_cost_prediction_chart,
+    create_anomaly_chart,
+    create_criticality_chart
+)
+
+OUTPUT_FORMATS = ('json', 'parquet', 'html')
+
+
+def run_analyses(predictor, months=6, workers=None, timer=None):
+    """Executa as análises do MLPredictor em paralelo (uma thread por análise)"""
+    timer = timer or Profiler(track_memory=False)
+    tasks = {
+        'previsao_solicitacoes': lambda: predictor.predict_next_months(months=months),
+        'previsao_custos': lambda: predictor.predict_costs(months=months),
+        'anomalias': predictor.identify_anomalies,
+        'criticidade': predictor.predict_maintenance_demand,
+        'demanda_pecas': predictor.predict_part_demand,
+        'tendencia': predictor.calculate_trend,
+    }
+    with ThreadPoolExecutor(max_workers=workers or len(tasks)) as executor:
+        # Cada tarefa roda com uma cópia do contexto, para os métodos do
+        # MLPredictor registrarem suas etapas no mesmo profiler
+        futures = {name: executor.submit(contextvars.copy_context().run, timer.timed(name, func))
+                   for name, func in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def demand_forecast_table(df_month, predictions, future_dates, scores):
+    """Previsão de solicitações por modelo e mês"""
+    table = pd.DataFrame({'Mês': [d.strftime('%m-%Y') for d in future_dates]})
+    for name, pred in predictions.items():
+        table[name] = pred
+    return table
+
+
+def cost_forecast_table(df_month, pred_costs, future_dates, score):
+    """Previsão de custos por mês"""
+    return pd.DataFrame({
+        'Mês': [d.strftime('%m-%Y') for d in future_dates],
+        'Custo_Previsto': pred_costs
+    })
+
+
+def anomaly_table(df_month, anomalies):
+    """Meses anômalos com seus z-scores"""
+    return anomalies[['Quantidade', 'Total', 'Z_Score']].rename_axis('Mês').reset_index()
+
+
+def build_tables(results):
+    """Converte os resultados das análises em tabelas"""
+    trend, interpretation, slope = results['tendencia']
+    df_month, _ = results['anomalias']
+    return {
+        'serie_mensal': df_month[['Quantidade', 'Total', 'Z_Score', 'Is_Anomaly']]
+        .rename_axis('Mês').reset_index(),
+        'previsao_solicitacoes': demand_forecast_table(*results['previsao_solicitacoes']),
+        'previsao_custos': cost_forecast_table(*results['previsao_custos']),
+        'anomalias': anomaly_table(*results['anomalias']),
+        'criticidade': results['criticidade'].rename_axis('Máquina').reset_index(),
+        'demanda_pecas': results['demanda_pecas'].rename_axis('Peça').reset_index(),
+        'tendencia': pd.DataFrame([{'Tendencia': trend, 'Interpretacao': interpretation,
+                                    'Inclinacao': slope}]),
+    }
+
+
+def build_figures(results):
+    """Gráficos do relatório HTML"""
+    return {
+        'Previsão de Solicitações': create_prediction_charts(*results['previsao_solicitacoes']),
+        'Previsão de Custos': create_cost_prediction_chart(*results['previsao_custos'][:3]),
+        'Anomalias': create_anomaly_chart(*results['anomalias']),
+        'Criticidade': create_criticality_chart(results['criticidade']),
+    }
+
+
+def table_records(table):
+    """Registros JSON de uma tabela (datas em ISO, tipos NumPy convertidos)"""
+    return json.loads(table.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def write_json(tables, meta, output_dir):
+    report = dict(meta)
+    report.update({name: table_records(table) for name, table in tables.items()})
+    path = os.path.join(output_dir, 'relatorio.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return [path]
+
+
+def write_parquet(tables, output_dir):
+    paths = []
+    for name, table in tables.items():
+        path = os.path.join(output_dir, f'{name}.parquet')
+        table.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def write_html(tables, figures, meta, output_dir):
+    parts = [
+        "<html><head><meta charset='utf-8'><title>Relatório de Almoxarifado</title></head><body>",
+        f"<h1>Relatório de Almoxarifado</h1><p>Gerado em {meta['gerado_em']} "
+        f"a partir de {meta['linhas']:,} solicitações ({meta['meses']} meses).</p>",
+    ]
+    for i, (title, fig) in enumerate(figures.items()):
+        # O plotly.js é embutido apenas uma vez para o arquivo funcionar offline
+        parts.append(f"<h2>{title}</h2>")
+        parts.append(fig.to_html(full_html=False, include_plotlyjs=(i == 0)))
+    for name in ('previsao_solicitacoes', 'previsao_custos', 'anomalias', 'criticidade'):
+        parts.append(f"<h2>{name.replace('_', ' ').title()}</h2>")
+        parts.append(tables[name].to_html(index=False, float_format=lambda v: f'{v:,.2f}'))
+    parts.append("<h2>Demanda Pecas (top 100)</h2>")
+    parts.append(tables['demanda_pecas'].head(100).to_html(index=False,
+                                                          float_format=lambda v: f'{v:,.2f}'))
+    parts.append("</body></html>")
+
+    path = os.path.join(output_dir, 'relatorio.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return [path]
+
+
+def generate_report(source, output_dir, months=6, formats=OUTPUT_FORMATS,
+                    workers=None, chunksize=DEFAULT_CHUNKSIZE, timer=None, tune=None):
+    """Gera o relatório completo para um arquivo ou diretório
+
+    Com `tune` (segundos), os ensembles usam os hiperparâmetros da busca
+    (salvos por série; a busca só roda na primeira vez).
+    """
+    timer = timer or Profiler(track_memory=False)
+    paths = list_data_files(source)
+    if not paths:
+        raise FileNotFoundError(f"Nenhum arquivo de dados encontrado em {source}")
+
+    with timer.stage('leitura_e_agregacao'):
+        aggregates, n_rows = aggregate_files(paths, workers=workers, chunksize=chunksize)
+
+    predictor = MLPredictor.from_aggregates(aggregates)
+    if tune:
+        with timer.stage('ajuste_modelos'):
+            tune_predictor(predictor, budget=tune, workers=workers)
+    with timer.stage('analises (paralelo)'):
+        results = run_analyses(predictor, months=months, workers=workers, timer=timer)
+
+    with timer.stage('tabelas'):
+        tables = build_tables(results)
+        if 'unidade' in aggregates:
+            tables['unidades'] = aggregates['unidade'].rename_axis('Unidade').reset_index()
+
+    meta = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'fonte': [os.path.abspath(p) for p in paths],
+        'linhas': int(n_rows),
+        'meses': int(len(aggregates['mensal'])),
+        'meses_previstos': months,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    if 'json' in formats:
+        with timer.stage('saida_json'):
+            written += write_json(tables, meta, output_dir)
+    if 'parquet' in formats:
+        with timer.stage('saida_parquet'):
+            written += write_parquet(tables, output_dir)
+    if 'html' in formats:
+        with timer.stage('graficos'):
+            figures = build_figures(results)
+        with timer.stage('saida_html'):
+            written += write_html(tables, figures, meta, output_dir)
+
+    return written, timer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera o relatório de previsões e criticidade sem abrir o dashboard"
+    )
+    parser.add_argument('source', help="Arquivo Excel/CSV ou diretório com vários arquivos")
+    parser.add_argument('-o', '--output', default='relatorio',
+                        help="Diretório de saída (padrão: relatorio)")
+    parser.add_argument('-m', '--months', type=int, default=6,
+                        help="Meses para previsão (padrão: 6)")
+    parser.add_argument('-f', '--formats', default=','.join(OUTPUT_FORMATS),
+                        help="Formatos de saída separados por vírgula: json,parquet,html")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Processos/threads em paralelo (padrão: número de núcleos)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Linhas por bloco na leitura em streaming de CSV")
+    parser.add_argument('--tune', type=float, default=None, metavar='SEGUNDOS',
+                        help="Ajusta os hiperparâmetros dos ensembles com este orçamento de tempo")
+    parser.add_argument('--log', default=None,
+                        help="Acrescenta os tempos de cada etapa a um log JSON Lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+    invalid = [f for f in formats if f not in OUTPUT_FORMATS]
+    if invalid:
+        print(f"Formato(s) inválido(s): {', '.join(invalid)}", file=sys.stderr)
+        return 2
+
+    timer = Profiler(track_memory=False)
+    with timer.activate():
+        written, _ = generate_report(args.source, args.output, months=args.months,
+                                     formats=formats, workers=args.workers,
+                                     chunksize=args.chunksize, timer=timer, tune=args.tune)
+    if args.log:
+        timer.write_log(args.log, origem='batch_report')
+
+    print("Arquivos gerados:")
+    for path in written:
+        print(f"  {path}")
+    print()
+    print(timer.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
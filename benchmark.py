@@ -0,0 +1,299 @@
+"""
+Benchmark do dashboard em vários tamanhos de dados
+Dashboard de Análise de Peças
+
+Gera dados sintéticos com as distribuições do fake.py (10k, 100k, 1M e 10M
+linhas por padrão) e mede tempo de parede, tempo de CPU e pico de memória de
+cada etapa: leitura, validação, cada método do MLPredictor e cada gráfico.
+Os resultados vão para um arquivo JSON que pode ser comparado com um
+resultado de referência para apontar regressões.
+
+Exemplos:
+    python benchmark.py --sizes 10k,100k --output bench/atual.json
+    python benchmark.py --sizes 10k,100k --baseline bench/referencia.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly
+import sklearn
+
+import fake
+from charts import (
+    create_monthly_requests_chart,
+    create_monthly_cost_chart,
+    create_requesters_chart,
+    create_part_demand_chart,
+    create_delivery_chart,
+    create_financial_chart,
+    create_machine_cost_chart
+)
+from columns import COL_MES, COL_MAQUINA, COL_SOLICITANTE, COL_TOTAL, COL_ENTREGUE
+from data_quality import validate_data
+from downsampling import payload_size
+from ingestion import check_columns, read_data_file
+from ml_predictions import (
+    MLPredictor,
+    create_prediction_charts,
+    create_cost_prediction_chart,
+    create_anomaly_chart,
+    create_criticality_chart
+)
+
+DEFAULT_SIZES = '10k,100k,1m,10m'
+DEFAULT_DATA_DIR = 'bench_data'
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_SEED = 42
+# Diferenças absolutas menores que isso são consideradas ruído
+MIN_TIME_DELTA_S = 0.005
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if text[-1:] in 'km' else text
+    return int(float(number) * multiplier)
+
+
+def dataset_path(data_dir, n_rows, seed=DEFAULT_SEED):
+    """Gera (uma única vez) o CSV sintético com n_rows linhas"""
+    path = os.path.join(data_dir, f'requisicoes_fake_{n_rows}_seed{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Gerando {n_rows:,} linhas em {path}...")
+        fake.escrever_requisicoes(path, n_rows, seed=seed)
+    return path
+
+
+def measure(func, repeat=3, setup=None):
+    """Executa a função medindo tempo (melhor de `repeat`) e pico de memória
+
+    O tempo é medido sem tracemalloc (que deixa o código mais lento); o pico de
+    memória vem de uma execução extra com tracemalloc ativo. Com `setup`, cada
+    execução chama `func(setup())` com um objeto novo criado fora da medição
+    (ex: um preditor sem caches), para as repetições não medirem acertos de cache.
+    """
+    def prepare():
+        if setup is None:
+            return func
+        obj = setup()
+        return lambda: func(obj)
+
+    walls, cpus = [], []
+    result = None
+    for _ in range(repeat):
+        call = prepare()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = call()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    call = prepare()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        'tempo_s': min(walls),
+        'tempo_mediana_s': statistics.median(walls),
+        'cpu_s': min(cpus),
+        'pico_memoria_mb': peak / (1024 * 1024),
+    }
+
+
+def benchmark_stages(path, months=6, repeat=3, include_prophet=False):
+    """Mede todas as etapas para um arquivo de dados"""
+    records = []
+    state = {}
+
+    def run(stage, func, stage_repeat=repeat, setup=None):
+        try:
+            result, metrics = measure(func, stage_repeat, setup)
+            state[stage] = result
+            records.append({'etapa': stage, **metrics})
+            print(f"  {stage:<40}{metrics['tempo_s']:>10.3f}s"
+                  f"{metrics['pico_memoria_mb']:>10.1f} MB")
+        except Exception as e:
+            records.append({'etapa': stage, 'erro': f'{type(e).__name__}: {e}'})
+            print(f"  {stage:<40} erro: {e}")
+        return state.get(stage)
+
+    # Leitura e validação
+    df = run('ingestao', lambda: read_data_file(path), stage_repeat=1)
+    if df is None:
+        return records
+
+    def validate():
+        check_columns(df, path)
+        return validate_data(df)[0]
+
+    # As etapas seguintes usam as linhas limpas, como o dashboard
+    df = run('validacao', validate)
+    if df is None:
+        return records
+
+    # MLPredictor: construção, agregados e cada método
+    run('MLPredictor.__init__', lambda: MLPredictor(df))
+    aggregates = run('MLPredictor.agregados', lambda: MLPredictor(df).aggregates)
+    if aggregates is None:
+        return records
+
+    def fresh_predictor():
+        # Agregados já medidos acima; índice de tempo e modelos calculados do zero
+        return MLPredictor(df, aggregates=aggregates)
+
+    methods = {
+        'prepare_temporal_data': lambda p: p.prepare_temporal_data(),
+        'predict_next_months': lambda p: p.predict_next_months(months=months),
+        'predict_costs': lambda p: p.predict_costs(months=months),
+        'identify_anomalies': lambda p: p.identify_anomalies(),
+        'predict_maintenance_demand': lambda p: p.predict_maintenance_demand(),
+        'predict_part_demand': lambda p: p.predict_part_demand(),
+        'calculate_trend': lambda p: p.calculate_trend(),
+    }
+    if include_prophet:
+        methods['prophet_forecast'] = lambda p: p.prophet_forecast(periods=months)
+    for name, method in methods.items():
+        run(f'MLPredictor.{name}', method, setup=fresh_predictor)
+
+    # Tabelas usadas pelos gráficos descritivos
+    df_month = df.groupby(COL_MES).agg(Quantidade=(COL_MES, 'size'), Total=(COL_TOTAL, 'sum'))
+    df_sol = df.groupby(COL_SOLICITANTE).agg(Quantidade=(COL_SOLICITANTE, 'size'))
+    df_sol = df_sol.sort_values('Quantidade', ascending=False)
+    df_entrega = df[COL_ENTREGUE].value_counts().reset_index()
+    df_entrega.columns = ['Status', 'Quantidade']
+    df_financeiro = df.groupby(COL_MES)[COL_TOTAL].sum().reset_index()
+    df_machine_cost = df.groupby(COL_MAQUINA)[COL_TOTAL].sum().nlargest(10)
+
+    charts = {
+        'create_prediction_charts': lambda: create_prediction_charts(
+            *state['MLPredictor.predict_next_months']),
+        'create_cost_prediction_chart': lambda: create_cost_prediction_chart(
+            *state['MLPredictor.predict_costs'][:3]),
+        'create_anomaly_chart': lambda: create_anomaly_chart(
+            *state['MLPredictor.identify_anomalies']),
+        'create_criticality_chart': lambda: create_criticality_chart(
+            state['MLPredictor.predict_maintenance_demand']),
+        'create_monthly_requests_chart': lambda: create_monthly_requests_chart(df_month),
+        'create_monthly_cost_chart': lambda: create_monthly_cost_chart(df_month),
+        'create_requesters_chart': lambda: create_requesters_chart(df_sol),
+        'create_part_demand_chart': lambda: create_part_demand_chart(
+            state['MLPredictor.predict_part_demand']),
+        'create_delivery_chart': lambda: create_delivery_chart(df_entrega),
+        'create_financial_chart': lambda: create_financial_chart(df_financeiro),
+        'create_machine_cost_chart': lambda: create_machine_cost_chart(df_machine_cost),
+    }
+    for name, builder in charts.items():
+        fig = run(f'grafico.{name}', builder)
+        if fig is not None:
+            # Tamanho do JSON que iria para o navegador
+            records[-1]['payload_kb'] = payload_size(fig) / 1024
+
+    return records
+
+
+def environment_info():
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'nucleos': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'scikit-learn': sklearn.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Lista as etapas mais lentas ou que usam mais memória que a referência"""
+    reference = {(r['linhas'], r['etapa']): r for r in baseline['resultados']}
+    regressions = []
+    for record in results:
+        base = reference.get((record['linhas'], record['etapa']))
+        if base is None or 'erro' in record or 'erro' in base:
+            continue
+        checks = [('tempo_s', MIN_TIME_DELTA_S), ('pico_memoria_mb', MIN_MEMORY_DELTA_MB)]
+        for metric, min_delta in checks:
+            old, new = base[metric], record[metric]
+            if new - old > min_delta and new > old * (1 + tolerance):
+                regressions.append({
+                    'linhas': record['linhas'],
+                    'etapa': record['etapa'],
+                    'metrica': metric,
+                    'referencia': old,
+                    'atual': new,
+                    'variacao': (new - old) / old if old else float('inf'),
+                })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do dashboard")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"Tamanhos dos dados (padrão: {DEFAULT_SIZES})")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="Diretório dos dados sintéticos gerados")
+    parser.add_argument('--output', default='benchmark_resultados.json',
+                        help="Arquivo JSON de saída")
+    parser.add_argument('--baseline', help="Resultado de referência para comparação")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Piora relativa tolerada antes de apontar regressão (padrão: 0.25)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Repetições por etapa (vale o melhor tempo)")
+    parser.add_argument('--months', type=int, default=6, help="Meses de previsão")
+    parser.add_argument('--prophet', action='store_true', help="Inclui o Prophet")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help="Semente dos dados sintéticos (mesmos dados entre execuções)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for n_rows in [parse_size(size) for size in args.sizes.split(',') if size.strip()]:
+        path = dataset_path(args.data_dir, n_rows, args.seed)
+        print(f"\n{n_rows:,} linhas")
+        for record in benchmark_stages(path, args.months, args.repeat, args.prophet):
+            results.append({'linhas': n_rows, **record})
+
+    report = {'ambiente': environment_info(), 'resultados': results}
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} regressão(ões) acima de {args.tolerance:.0%}:")
+            for r in regressions:
+                print(f"  {r['linhas']:>10,}  {r['etapa']:<40}{r['metrica']:<16}"
+                      f"{r['referencia']:>10.3f} -> {r['atual']:.3f} ({r['variacao']:+.0%})")
+            return 1
+        print("\n✓ Nenhuma regressão em relação à referência.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
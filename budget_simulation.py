@@ -0,0 +1,181 @@
+"""
+Simulação de Monte Carlo do gasto com peças
+Dashboard de Análise de Peças
+
+Cada cenário sorteia o futuro a partir do histórico por peça (agregado
+aditivo 'peca_mensal', com a quantidade e o custo de cada peça em cada mês):
+
+- Demanda: para cada mês do horizonte sorteia um mês inteiro do histórico
+  (bootstrap por blocos), então as peças pedidas juntas continuam juntas e os
+  meses sem pedido de uma peça entram com zero.
+- Custo unitário: para cada peça sorteia o custo médio de um dos meses em que
+  ela foi pedida.
+
+Os cenários são calculados em lotes de matrizes (cenário x peça) com NumPy,
+com tamanho limitado por `MAX_BATCH_CELLS`. Peças com um único custo unitário
+no histórico não precisam de sorteio: o gasto delas entra como um valor por
+mês, somado no mesmo índice dos meses sorteados.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from data_quality import parse_months
+
+DEFAULT_SCENARIOS = 20_000
+DEFAULT_HORIZON = 3
+# Meses mais recentes usados como histórico
+DEFAULT_LOOKBACK = 24
+DEFAULT_SEED = 42
+# Células (cenário x peça) por lote: ~16 MB por matriz float32
+MAX_BATCH_CELLS = 4_000_000
+SPEND_QUANTILES = (0.05, 0.5, 0.95, 0.99)
+
+
+@dataclass
+class PartHistory:
+    """Demanda mensal por peça e custos unitários observados, prontos para sorteio"""
+    months: list
+    # Quantidade de cada peça sorteada (linha = mês, coluna = peça)
+    demand: np.ndarray
+    # Custos unitários das peças sorteadas, em sequência por peça
+    unit_costs: np.ndarray
+    starts: np.ndarray
+    counts: np.ndarray
+    # Gasto de cada mês com as peças de custo unitário único
+    fixed_spend: np.ndarray
+    # Peças com custo no histórico (sorteadas ou de gasto fixo)
+    n_parts: int = 0
+
+
+@dataclass
+class SimulationResult:
+    """Gasto simulado no horizonte (ordenado) e resumo da distribuição"""
+    spend: np.ndarray
+    horizon: int
+    history_months: list
+    n_parts: int
+
+    @property
+    def n_scenarios(self):
+        return len(self.spend)
+
+    @property
+    def mean(self):
+        return float(self.spend.mean())
+
+    def percentiles(self, quantiles=SPEND_QUANTILES):
+        """Gasto em cada percentil ({'P5': ..., 'P50': ...})"""
+        values = np.quantile(self.spend, quantiles)
+        return {f'P{int(round(q * 100))}': float(v) for q, v in zip(quantiles, values)}
+
+    def exceedance(self, budgets):
+        """Probabilidade de o gasto passar de cada orçamento"""
+        budgets = np.asarray(budgets, dtype='float64')
+        return 1 - np.searchsorted(self.spend, budgets, side='right') / len(self.spend)
+
+    def exceedance_table(self, budgets):
+        budgets = np.asarray(budgets, dtype='float64')
+        return pd.DataFrame({'Orçamento': budgets,
+                             'Prob. Estouro': self.exceedance(budgets)})
+
+
+def part_history(aggregates, lookback=DEFAULT_LOOKBACK):
+    """Histórico por peça dos últimos `lookback` meses (meses sem pedido entram com zero)"""
+    if 'peca_mensal' not in aggregates:
+        raise ValueError("Agregados sem o histórico mensal por peça (reprocesse os dados)")
+    # Índice (peça, mês)
+    table = aggregates['peca_mensal']
+    dates = parse_months(table.index.get_level_values(1))
+    valid = ~dates.isna()
+    if not valid.any():
+        raise ValueError("Histórico sem meses válidos para simular")
+    # Meses desde 01-1970 (a unidade do datetime64[M])
+    month_codes = ((dates.year - 1970) * 12 + dates.month - 1)[valid].to_numpy()
+    last = month_codes.max()
+    first = max(month_codes.min(), last - lookback + 1)
+    keep = month_codes >= first
+    month_codes = month_codes[keep] - first
+    table = table[valid][keep]
+
+    part_codes, parts = pd.factorize(table.index.get_level_values(0))
+    n_months = last - first + 1
+    qty = table['Qtd'].to_numpy(dtype='float64')
+    demand = np.zeros((n_months, len(parts)))
+    np.add.at(demand, (month_codes, part_codes), qty)
+
+    # Custo unitário médio de cada (peça, mês) com quantidade pedida
+    observed = qty > 0
+    costs = table['Total'].to_numpy(dtype='float64')[observed] / qty[observed]
+    cost_parts = part_codes[observed]
+    order = np.argsort(cost_parts, kind='stable')
+    costs, cost_parts = costs[order], cost_parts[order]
+    counts = np.bincount(cost_parts, minlength=len(parts))
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+    # Peças com um único custo (ou todos iguais) somam um gasto fixo por mês
+    spread = np.zeros(len(parts))
+    if len(costs):
+        spread[counts > 0] = (np.maximum.reduceat(costs, starts[counts > 0])
+                              - np.minimum.reduceat(costs, starts[counts > 0]))
+    fixed = (counts > 0) & (spread == 0)
+    random = (counts > 0) & ~fixed
+    fixed_cost = np.zeros(len(parts))
+    fixed_cost[fixed] = costs[starts[fixed]]
+    fixed_spend = demand[:, fixed] @ fixed_cost[fixed]
+
+    # Custos só das peças sorteadas, em sequência
+    picked = np.isin(cost_parts, np.flatnonzero(random))
+    months = pd.DatetimeIndex(np.arange(first, last + 1).astype('datetime64[M]'))
+    return PartHistory(
+        months=list(months.strftime('%m-%Y')),
+        demand=np.ascontiguousarray(demand[:, random], dtype=np.float32),
+        unit_costs=costs[picked].astype(np.float32),
+        starts=np.r_[0, np.cumsum(counts[random])[:-1]].astype(np.int32),
+        # Logo abaixo da contagem: o sorteio em float32 nunca arredonda para ela
+        counts=np.nextafter(counts[random].astype(np.float32), np.float32(0)),
+        fixed_spend=fixed_spend,
+        n_parts=int((counts > 0).sum())
+    )
+
+
+def simulate_spend(history, horizon=DEFAULT_HORIZON, n_scenarios=DEFAULT_SCENARIOS,
+                   seed=DEFAULT_SEED, max_batch_cells=MAX_BATCH_CELLS):
+    """Gasto total de `n_scenarios` cenários dos próximos `horizon` meses"""
+    if horizon < 1 or n_scenarios < 1:
+        raise ValueError("Horizonte e número de cenários devem ser positivos")
+    rng = np.random.default_rng(seed)
+    n_months, n_parts = history.demand.shape
+    batch = max(max_batch_cells // max(n_parts, 1), 1)
+
+    spend = np.empty(n_scenarios)
+    for start in range(0, n_scenarios, batch):
+        size = min(batch, n_scenarios - start)
+        drawn = rng.integers(0, n_months, size=(size, horizon))
+        total = history.fixed_spend[drawn].sum(axis=1)
+        if n_parts:
+            demand = np.take(history.demand, drawn[:, 0], axis=0)
+            for h in range(1, horizon):
+                demand += np.take(history.demand, drawn[:, h], axis=0)
+            # Um custo observado por peça e cenário: início da peça + posição sorteada
+            picks = rng.random((size, n_parts), dtype=np.float32)
+            picks *= history.counts
+            positions = picks.astype(np.int32)
+            positions += history.starts
+            unit_costs = np.take(history.unit_costs, positions)
+            total += np.einsum('ij,ij->i', demand, unit_costs)
+        spend[start:start + size] = total
+    spend.sort()
+    return SimulationResult(spend=spend, horizon=horizon, history_months=history.months,
+                            n_parts=history.n_parts)
+
+
+def recent_spend(aggregates, months=DEFAULT_HORIZON):
+    """Gasto dos últimos `months` meses do histórico (referência para o orçamento)"""
+    mensal = aggregates['mensal']
+    dates = parse_months(mensal.index)
+    valid = ~dates.isna()
+    totals = pd.Series(mensal['Total'].to_numpy()[valid], index=dates[valid]).sort_index()
+    return float(totals.tail(months).sum())
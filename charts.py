@@ -0,0 +1,131 @@
+"""
+Gráficos descritivos do dashboard
+Dashboard de Análise de Peças
+"""
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from columns import COL_PECA
+from downsampling import aggregate_buckets, downsample_frame, render_mode
+from resampling import DEFAULT_GRANULARITY, GRANULARITIES, PERIOD_NAMES
+from text_ops import truncate_labels
+
+
+def create_monthly_requests_chart(df_month, granularity=DEFAULT_GRANULARITY):
+    """Evolução de solicitações por período (tab Temporal)"""
+    df_month = downsample_frame(df_month, 'Quantidade')
+    fig = px.line(df_month, y='Quantidade',
+                 title=f'Evolução {GRANULARITIES[granularity]} de Solicitações',
+                 markers=len(df_month) <= 100,
+                 render_mode=render_mode(len(df_month)))
+    fig.update_traces(line_color='#667eea', line_width=3)
+    return fig
+
+
+def create_monthly_cost_chart(df_month, granularity=DEFAULT_GRANULARITY):
+    """Custo total por período (tab Temporal)"""
+    return px.bar(aggregate_buckets(df_month[['Total']]), y='Total',
+                 title=f'Custo Total por {PERIOD_NAMES[granularity][0].title()}',
+                 color_discrete_sequence=['#764ba2'])
+
+
+def create_requesters_chart(df_sol):
+    """Top 15 solicitantes por quantidade (tab Solicitantes)"""
+    return px.bar(df_sol.head(15), x='Quantidade',
+                orientation='h',
+                title='Top 15 Solicitantes por Quantidade',
+                color='Quantidade',
+                color_continuous_scale='Purples')
+
+
+def create_part_demand_chart(df_parts_pred):
+    """Consumo atual vs previsão das 20 peças mais usadas (tab Peças)"""
+    top_parts = df_parts_pred.head(20).reset_index()
+    labels = truncate_labels(top_parts[COL_PECA], 40).astype(object)
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        y=labels,
+        x=top_parts['Taxa_Mensal'],
+        name='Taxa Mensal Atual',
+        orientation='h',
+        marker_color='#667eea'
+    ))
+
+    fig.add_trace(go.Bar(
+        y=labels,
+        x=top_parts['Previsao_3_Meses'],
+        name='Previsão 3 Meses',
+        orientation='h',
+        marker_color='#4ecdc4',
+        opacity=0.7
+    ))
+
+    fig.update_layout(
+        title='Comparação: Consumo Atual vs Previsão',
+        barmode='group',
+        height=600
+    )
+
+    return fig
+
+
+def create_delivery_chart(df_entrega):
+    """Distribuição de entregas por status (tab Entregas)"""
+    return px.pie(df_entrega, values='Quantidade', names='Status',
+                title='Distribuição de Entregas por Status',
+                color_discrete_sequence=px.colors.sequential.Purp)
+
+
+def create_financial_chart(df_financeiro):
+    """Evolução dos custos mensais (tab Financeiro)"""
+    df_financeiro = downsample_frame(df_financeiro, 'Total', x='Mês/Ano')
+    fig = px.line(df_financeiro, x='Mês/Ano', y='Total',
+                 title='Evolução dos Custos Mensais',
+                 markers=len(df_financeiro) <= 100,
+                 render_mode=render_mode(len(df_financeiro)))
+    fig.update_traces(line_color='#667eea', line_width=3)
+    return fig
+
+
+def create_machine_cost_chart(df_machine_cost):
+    """Top 10 máquinas por custo (tab Financeiro)"""
+    return px.pie(
+        values=df_machine_cost.values,
+        names=df_machine_cost.index,
+        title='Top 10 Máquinas - Distribuição de Custos'
+    )
+
+
+def create_spend_simulation_chart(result, budget, bins=60):
+    """Distribuição do gasto simulado com o orçamento e os percentis (tab Previsões)"""
+    # Só as contagens por faixa vão ao navegador, não os cenários
+    counts, edges = np.histogram(result.spend, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    exceeds = centers > budget
+
+    fig = go.Figure(go.Bar(
+        x=centers,
+        y=counts / result.n_scenarios,
+        width=np.diff(edges),
+        marker_color=np.where(exceeds, '#ef4444', '#667eea'),
+        hovertemplate='Gasto: R$ %{x:,.0f}<br>Cenários: %{y:.1%}<extra></extra>'
+    ))
+    fig.add_vline(x=budget, line_dash='dash', line_color='#111827',
+                  annotation_text='Orçamento')
+    for name, value in result.percentiles().items():
+        if name in ('P50', 'P95'):
+            fig.add_vline(x=value, line_dash='dot', line_color='#4ecdc4',
+                          annotation_text=name, annotation_position='bottom right')
+    fig.update_layout(
+        title=f'Gasto Simulado nos Próximos {result.horizon} Meses '
+              f'({result.n_scenarios:,} cenários)',
+        xaxis_title='Gasto (R$)',
+        yaxis_title='Cenários',
+        yaxis_tickformat='.0%',
+        bargap=0
+    )
+    return fig
@@ -0,0 +1,80 @@
+"""
+Nomes de colunas do arquivo de solicitações
+Dashboard de Análise de Peças
+"""
+
+import re
+
+from text_ops import normalize_text
+
+COL_MES = 'Mês/Ano'
+COL_SOLICITANTE = 'Solicitante'
+COL_MAQUINA = '2- Máquina de destino:'
+COL_PECA = '6- Descrição da peça: '
+COL_QTD = '7- Quantidade de peças.'
+COL_TOTAL = 'Total'
+COL_ENTREGUE = 'Entregue?'
+# Unidade (planta) de origem da solicitação, ao consolidar vários arquivos
+COL_UNIDADE = 'Unidade'
+# Data da requisição (opcional): permite séries diárias e semanais
+COL_DATA = 'Data'
+
+REQUIRED_COLUMNS = [COL_MES, COL_TOTAL, COL_SOLICITANTE, COL_MAQUINA,
+                    COL_PECA, COL_QTD]
+
+NUMERIC_COLUMNS = [COL_TOTAL, COL_QTD]
+
+# Possíveis nomes da coluna de identificação da requisição.
+# 'Unnamed: 0' é o nome que o pandas dá à coluna sem cabeçalho gerada pelo fake.py
+ID_COLUMN_CANDIDATES = ['ID', 'Id', 'id', 'Requisição', 'Requisicao',
+                        'Nº Requisição', 'Unnamed: 0', '']
+
+# Variações de cabeçalho usadas pelas exportações de cada unidade, já
+# normalizadas (sem acentos, numeração inicial e pontuação final)
+COLUMN_ALIASES = {
+    COL_MES: ['mes/ano', 'mes ano', 'mes_ano', 'mes-ano', 'mes', 'competencia', 'periodo'],
+    COL_SOLICITANTE: ['solicitante', 'nome do solicitante', 'requisitante'],
+    COL_MAQUINA: ['maquina de destino', 'maquina destino', 'maquina', 'equipamento'],
+    COL_PECA: ['descricao da peca', 'descricao peca', 'descricao', 'peca', 'item'],
+    COL_QTD: ['quantidade de pecas', 'quantidade', 'qtd', 'qtde'],
+    COL_TOTAL: ['total', 'valor total', 'custo total'],
+    COL_ENTREGUE: ['entregue', 'status da entrega', 'status de entrega', 'entrega'],
+    COL_UNIDADE: ['unidade', 'planta', 'filial', 'site'],
+    COL_DATA: ['data', 'data da solicitacao', 'data de solicitacao', 'data da requisicao',
+               'data requisicao', 'data do pedido', 'dt solicitacao'],
+}
+
+_ALIAS_TO_COLUMN = {alias: column for column, aliases in COLUMN_ALIASES.items()
+                    for alias in aliases}
+# '2- Máquina de destino:' -> 'maquina de destino'
+_HEADER_PREFIX = re.compile(r'^\d+\s*[-.)]\s*')
+_HEADER_SUFFIX = re.compile(r'[\s:.?]+$')
+
+
+def _header_key(name):
+    return _HEADER_SUFFIX.sub('', _HEADER_PREFIX.sub('', normalize_text(name)))
+
+
+def unify_columns(df):
+    """Renomeia variações de cabeçalho para os nomes padrão das colunas
+
+    Colunas já com o nome padrão são mantidas; se duas variações apontarem
+    para a mesma coluna, vale a primeira.
+    """
+    present = set(df.columns)
+    renames = {}
+    for col in df.columns:
+        target = _ALIAS_TO_COLUMN.get(_header_key(col))
+        if target is None or col == target or target in present:
+            continue
+        renames[col] = target
+        present.add(target)
+    return df.rename(columns=renames) if renames else df
+
+
+def find_id_column(df):
+    """Retorna o nome da coluna de id da requisição (ou None)"""
+    for col in ID_COLUMN_CANDIDATES:
+        if col in df.columns:
+            return col
+    return None
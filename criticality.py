@@ -0,0 +1,116 @@
+"""
+Criticidade das máquinas com decaimento no tempo
+Dashboard de Análise de Peças
+
+Cada máquina recebe uma pontuação de 0 a 100 combinando quatro critérios,
+todos com peso exponencialmente menor para os meses antigos:
+
+- Frequência: solicitações por mês (meia-vida `HALF_LIFE` meses)
+- Custo: custo por mês (mesma meia-vida)
+- Tendência: frequência recente (meia-vida `SHORT_HALF_LIFE`) contra a de
+  longo prazo; positiva quando os pedidos estão aumentando
+- Diversidade: número efetivo de peças diferentes pedidas (inverso do índice
+  de Simpson sobre as contagens com decaimento)
+
+O estado guardado usa decaimento progressivo ("forward decay"): cada mês `m`
+entra com peso 2^((m - referência) / meia-vida), fixo desde que o mês chega.
+Assim o estado é uma soma como os demais agregados (tabelas 'criticidade' e
+'maquina_peca'): um mês novo só acrescenta suas linhas, sem revisitar nem
+reescalar o histórico. Na consulta, dividir por 2^((último mês - referência)
+/ meia-vida) dá o decaimento exponencial usual a partir do último mês.
+"""
+
+import numpy as np
+import pandas as pd
+
+from columns import COL_MAQUINA, COL_MES, COL_PECA, COL_TOTAL
+from data_quality import parse_months
+
+# Meia-vida (em meses) dos critérios e da frequência recente da tendência
+HALF_LIFE = 12
+SHORT_HALF_LIFE = 3
+# Mês de referência dos pesos (01-2000): pesos > 1 depois dele
+REFERENCE_MONTH = (2000 - 1970) * 12
+CRITERIA_WEIGHTS = {'Freq_Mensal': 0.4, 'Custo_Mensal': 0.3,
+                    'Tendencia': 0.15, 'Diversidade_Pecas': 0.15}
+STATE_COLUMNS = {'Freq_Longa': HALF_LIFE, 'Custo_Longo': HALF_LIFE, 'Freq_Curta': SHORT_HALF_LIFE}
+
+
+def month_codes(labels):
+    """Meses desde 01-1970 dos rótulos 'Mês/Ano' (NaN para meses inválidos)"""
+    dates = parse_months(labels)
+    return ((dates.year - 1970) * 12 + dates.month - 1).to_numpy(dtype='float64')
+
+
+def forward_weights(codes, half_life):
+    """Peso fixo de cada mês no estado (0 para meses inválidos)"""
+    weights = np.exp2((np.asarray(codes, dtype='float64') - REFERENCE_MONTH) / half_life)
+    return np.nan_to_num(weights, nan=0.0)
+
+
+def decayed_state(df):
+    """Frequência e custo com decaimento por máquina (agregado aditivo 'criticidade')"""
+    monthly = df.groupby([COL_MAQUINA, COL_MES], observed=True).agg(
+        Solicitacoes=(COL_MAQUINA, 'size'),
+        Custo=(COL_TOTAL, 'sum')
+    )
+    # Matrizes máquina x mês
+    requests = monthly['Solicitacoes'].unstack(fill_value=0)
+    costs = monthly['Custo'].unstack(fill_value=0)
+    codes = month_codes(requests.columns)
+    long_weights = forward_weights(codes, HALF_LIFE)
+    return pd.DataFrame({
+        'Freq_Longa': requests.to_numpy(dtype='float64') @ long_weights,
+        'Custo_Longo': costs.to_numpy(dtype='float64') @ long_weights,
+        'Freq_Curta': requests.to_numpy(dtype='float64') @ forward_weights(codes, SHORT_HALF_LIFE),
+    }, index=requests.index)
+
+
+def decayed_part_counts(df):
+    """Solicitações com decaimento por (máquina, peça) (agregado aditivo 'maquina_peca')"""
+    counts = df.groupby([COL_MAQUINA, COL_PECA, COL_MES], observed=True).size()
+    weights = forward_weights(month_codes(counts.index.get_level_values(COL_MES)), HALF_LIFE)
+    decayed = pd.Series(counts.to_numpy() * weights, index=counts.index)
+    return decayed.groupby(level=[0, 1]).sum().to_frame('Freq_Longa')
+
+
+def _decay_scales(aggregates):
+    """(escala, soma dos pesos mensais) por meia-vida, a partir do último mês"""
+    codes = month_codes(aggregates['mensal'].index)
+    codes = codes[~np.isnan(codes)]
+    first, last = codes.min(), codes.max()
+    months = np.arange(last - first + 1)
+    return {half_life: (np.exp2((last - REFERENCE_MONTH) / half_life),
+                        np.exp2(-months / half_life).sum())
+            for half_life in set(STATE_COLUMNS.values())}
+
+
+def criticality_scores(aggregates):
+    """Critérios com decaimento e pontuação (0-100) de cada máquina"""
+    scales = _decay_scales(aggregates)
+    state = aggregates['criticidade']
+    # Médias mensais com decaimento exponencial a partir do último mês
+    rates = {column: state[column] / scales[half_life][0] / scales[half_life][1]
+             for column, half_life in STATE_COLUMNS.items()}
+    scores = pd.DataFrame({
+        'Freq_Mensal': rates['Freq_Longa'],
+        'Custo_Mensal': rates['Custo_Longo'],
+        # Arredondada: séries constantes dão 0 exato, sem resíduo de ponto flutuante
+        'Tendencia': (rates['Freq_Curta'] / rates['Freq_Longa'].where(rates['Freq_Longa'] > 0) - 1)
+                     .fillna(0).round(4),
+    })
+
+    if 'maquina_peca' in aggregates:
+        counts = aggregates['maquina_peca']['Freq_Longa']
+        totals = counts.groupby(level=0).sum()
+        squares = (counts ** 2).groupby(level=0).sum()
+        scores['Diversidade_Pecas'] = (totals ** 2 / squares.where(squares > 0)).fillna(0)
+    else:
+        scores['Diversidade_Pecas'] = 0.0
+    scores = scores.fillna(0)
+
+    # Cada critério vira a posição percentual entre as máquinas
+    ranks = sum(weight * scores[column].rank(pct=True)
+                for column, weight in CRITERIA_WEIGHTS.items())
+    scores['Pontuacao'] = (100 * ranks / sum(CRITERIA_WEIGHTS.values())).round(1)
+    return scores
@@ -0,0 +1,222 @@
+"""
+Validação de qualidade dos dados e limpeza tipada
+Dashboard de Análise de Peças
+
+Percorre cada coluna uma única vez com operações vetorizadas e devolve o
+DataFrame limpo junto com um relatório dos problemas encontrados:
+
+- valores não numéricos em Total e Quantidade (viram 0, como antes)
+- totais negativos ou zerados e quantidades não positivas
+- Mês/Ano mal formado (linhas removidas; os formatos são testados uma vez por
+  valor distinto, não por linha)
+- data da requisição mal formada, quando a coluna existe
+- total incoerente com quantidade × preço unitário
+- ids de requisição repetidos (linhas removidas)
+- campos de texto obrigatórios vazios
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from columns import (COL_DATA, COL_MES, COL_SOLICITANTE, COL_MAQUINA, COL_PECA, COL_QTD,
+                     COL_TOTAL, REQUIRED_COLUMNS, find_id_column)
+from text_ops import map_categories
+
+# Formatos aceitos para 'Mês/Ano', testados em ordem
+MONTH_FORMATS = ['%m-%Y', '%m/%Y', '%Y-%m', '%Y/%m', '%m-%y', '%m/%y']
+# Formatos aceitos para a coluna de data (opcional), testados em ordem
+DATE_FORMATS = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y', '%Y-%m-%d %H:%M:%S',
+                '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M']
+
+# Possíveis nomes de uma coluna de preço unitário
+UNIT_PRICE_CANDIDATES = ['Valor Unitário', 'Preço Unitário', 'Valor Unit.', 'Preço Unit.']
+# Diferença relativa tolerada entre Total e quantidade × preço unitário
+PRICE_TOLERANCE = 0.01
+# Sem coluna de preço: preço implícito (Total / Quantidade) fora desta razão
+# em relação à mediana da peça é apontado
+IMPLIED_PRICE_RATIO = 10.0
+
+SEVERITY_ERROR = 'erro'
+SEVERITY_WARNING = 'aviso'
+
+# Exemplos de linhas guardados por problema
+MAX_EXAMPLES = 5
+
+
+@dataclass
+class QualityReport:
+    """Resumo da validação de um arquivo"""
+    linhas_recebidas: int
+    linhas_validas: int = 0
+    problemas: list = field(default_factory=list)
+
+    def add(self, coluna, problema, mask, severidade=SEVERITY_WARNING, valores=None):
+        """Registra um problema a partir da máscara booleana das linhas afetadas"""
+        count = int(np.count_nonzero(mask))
+        if count == 0:
+            return
+        rows = np.flatnonzero(np.asarray(mask))[:MAX_EXAMPLES]
+        examples = [] if valores is None else [str(v) for v in np.asarray(valores)[rows]]
+        self.problemas.append({
+            'coluna': coluna,
+            'problema': problema,
+            'severidade': severidade,
+            'linhas': count,
+            'exemplos': ', '.join(examples),
+        })
+
+    @property
+    def linhas_removidas(self):
+        return self.linhas_recebidas - self.linhas_validas
+
+    def to_frame(self):
+        return pd.DataFrame(self.problemas,
+                            columns=['coluna', 'problema', 'severidade', 'linhas', 'exemplos'])
+
+
+def merge_reports(reports):
+    """Relatório único de vários arquivos (problemas iguais têm as linhas somadas)"""
+    merged = QualityReport(linhas_recebidas=sum(r.linhas_recebidas for r in reports),
+                           linhas_validas=sum(r.linhas_validas for r in reports))
+    problems = {}
+    for report in reports:
+        for problem in report.problemas:
+            key = (problem['coluna'], problem['problema'], problem['severidade'])
+            if key not in problems:
+                problems[key] = dict(problem)
+                continue
+            existing = problems[key]
+            existing['linhas'] += problem['linhas']
+            examples = [e for e in (existing['exemplos'], problem['exemplos']) if e]
+            existing['exemplos'] = ', '.join(', '.join(examples).split(', ')[:MAX_EXAMPLES])
+    merged.problemas = list(problems.values())
+    return merged
+
+
+def _parse_distinct(values, formats):
+    """Converte cada valor distinto testando os formatos em ordem (NaT se nenhum serve)"""
+    distinct = pd.Index(values.dropna().unique())
+    text = distinct.astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=distinct, dtype='datetime64[ns]')
+    for fmt in formats:
+        missing = parsed.isna().to_numpy()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+    return pd.DatetimeIndex(values.map(parsed))
+
+
+def parse_months(values):
+    """Datas (1º dia do mês) de rótulos 'Mês/Ano'; NaT quando nenhum formato serve
+
+    Cada valor distinto é convertido uma única vez.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.DatetimeIndex(values).to_period('M').to_timestamp()
+    return _parse_distinct(values, MONTH_FORMATS)
+
+
+def parse_dates(values):
+    """Datas (sem horário) da coluna de data; NaT quando nenhum formato serve"""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.DatetimeIndex(values).normalize()
+    return _parse_distinct(values, DATE_FORMATS).normalize()
+
+
+def _month_labels(series):
+    """Rótulos 'MM-AAAA' padronizados (NaN para meses mal formados)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.to_period('M').astype(str)
+    categories = series.astype('category')
+    parsed = parse_months(categories.cat.categories)
+    labels = dict(zip(categories.cat.categories, parsed.strftime('%m-%Y').where(parsed.notna())))
+    return map_categories(categories, labels.get).astype(object)
+
+
+def _unit_price_column(df):
+    for col in UNIT_PRICE_CANDIDATES:
+        if col in df.columns:
+            return col
+    return None
+
+
+def validate_data(df):
+    """Valida e limpa as solicitações: retorna (DataFrame limpo, QualityReport)"""
+    report = QualityReport(linhas_recebidas=len(df))
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        report.add(', '.join(missing), 'coluna obrigatória ausente',
+                   np.ones(1, dtype=bool), SEVERITY_ERROR)
+        return None, report
+
+    clean = df.copy(deep=False)
+    keep = np.ones(len(df), dtype=bool)
+
+    # Colunas numéricas: falhas de conversão viram 0
+    for col in (COL_TOTAL, COL_QTD):
+        raw = df[col]
+        numeric = pd.to_numeric(raw, errors='coerce')
+        failed = numeric.isna().to_numpy() & raw.notna().to_numpy()
+        report.add(col, 'valor não numérico (convertido para 0)', failed, valores=raw)
+        report.add(col, 'valor vazio (convertido para 0)', raw.isna().to_numpy())
+        clean[col] = numeric.fillna(0).astype('float64')
+
+    total = clean[COL_TOTAL].to_numpy()
+    quantity = clean[COL_QTD].to_numpy()
+    report.add(COL_TOTAL, 'total negativo', total < 0, valores=total)
+    report.add(COL_TOTAL, 'total zerado', total == 0)
+    report.add(COL_QTD, 'quantidade zero ou negativa', quantity <= 0, valores=quantity)
+
+    # Quantidade × preço unitário
+    price_col = _unit_price_column(df)
+    if price_col is not None:
+        unit_price = pd.to_numeric(df[price_col], errors='coerce').to_numpy()
+        expected = quantity * unit_price
+        inconsistent = (np.abs(expected - total) > PRICE_TOLERANCE * np.maximum(np.abs(total), 1))
+        report.add(COL_TOTAL, f'total diferente de quantidade × {price_col}',
+                   inconsistent & ~np.isnan(unit_price), valores=total)
+    else:
+        valid = (quantity > 0) & (total > 0)
+        implied = pd.Series(np.where(valid, total / np.where(valid, quantity, 1), np.nan),
+                            index=df.index)
+        median = implied.groupby(df[COL_PECA].to_numpy()).transform('median').to_numpy()
+        ratio = implied.to_numpy() / median
+        outlier = valid & ((ratio > IMPLIED_PRICE_RATIO) | (ratio < 1 / IMPLIED_PRICE_RATIO))
+        report.add(COL_TOTAL, 'preço unitário implícito fora do padrão da peça', outlier,
+                   valores=implied.round(2))
+
+    # Mês/Ano padronizado como 'MM-AAAA'
+    months = _month_labels(df[COL_MES])
+    malformed = months.isna().to_numpy()
+    report.add(COL_MES, 'mês mal formado (linha removida)', malformed, SEVERITY_ERROR,
+               valores=df[COL_MES])
+    clean[COL_MES] = months
+    keep &= ~malformed
+
+    # Data da requisição (opcional): sem data válida, a linha conta no 1º dia do mês
+    if COL_DATA in df.columns:
+        dates = parse_dates(df[COL_DATA])
+        report.add(COL_DATA, 'data mal formada (usado o 1º dia do Mês/Ano)',
+                   dates.isna() & df[COL_DATA].notna().to_numpy(), valores=df[COL_DATA])
+        clean[COL_DATA] = dates
+
+    # Textos obrigatórios vazios
+    for col in (COL_SOLICITANTE, COL_MAQUINA, COL_PECA):
+        report.add(col, 'valor vazio', df[col].isna().to_numpy())
+
+    # Ids repetidos: mantém a primeira ocorrência
+    id_column = find_id_column(df)
+    if id_column is not None:
+        duplicated = df[id_column].duplicated().to_numpy()
+        report.add(id_column or 'id', 'id repetido (linha removida)', duplicated, SEVERITY_ERROR,
+                   valores=df[id_column])
+        keep &= ~duplicated
+
+    if not keep.all():
+        clean = clean[keep]
+    report.linhas_validas = len(clean)
+    return clean, report
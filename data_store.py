@@ -0,0 +1,259 @@
+"""
+Base local persistente com atualização incremental
+Dashboard de Análise de Peças
+
+Cada exportação mensal (arquivo delta) é adicionada à base local: as linhas
+já conhecidas são descartadas pelo id da requisição, as linhas novas são
+gravadas em um novo arquivo Parquet e os agregados são atualizados somando
+apenas os agregados do delta.
+
+A mesma instância é compartilhada pelas sessões do Streamlit e pela thread de
+pré-carga: as escritas passam por uma trava e cada gravação usa o seu próprio
+arquivo temporário.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from aggregates import compute_aggregates, merge_aggregates, frame_fingerprint
+from columns import COL_UNIDADE, find_id_column
+from ml_predictions import WarmStartForecaster
+
+DEFAULT_STORE_PATH = os.path.join('data', 'store')
+
+# Coluna usada quando o arquivo não possui id da requisição
+ROW_HASH_COLUMN = '_hash_linha'
+
+
+@dataclass
+class AppendResult:
+    """Resumo de uma adição de arquivo delta"""
+    linhas_recebidas: int
+    linhas_novas: int
+    linhas_duplicadas: int
+    meses_afetados: list = field(default_factory=list)
+    maquinas_afetadas: list = field(default_factory=list)
+    pecas_afetadas: list = field(default_factory=list)
+    series_alteradas: list = field(default_factory=list)
+
+
+class DataStore:
+    """Base local de solicitações com agregados incrementais"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.parts_path = os.path.join(path, 'dataset')
+        self.state_file = os.path.join(path, 'state.pkl')
+        self.forecast_file = os.path.join(path, 'forecasts.pkl')
+        self.models_file = os.path.join(path, 'models.pkl')
+        self._state = self._load_pickle(self.state_file) or self._empty_state()
+        # Bases gravadas antes dos ids por unidade continuam com os ids simples
+        self._state.setdefault('ids_por_unidade', False)
+        self._forecasts = self._load_pickle(self.forecast_file) or {}
+        self._forecaster = None
+        # Reentrante: `cached_forecast` grava a previsão e os modelos em sequência
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _empty_state():
+        return {
+            'version': 0,
+            'id_column': None,
+            # Ids prefixados pela unidade (definido na primeira adição)
+            'ids_por_unidade': None,
+            'ids': pd.Index([], dtype=object),
+            'aggregates': {},
+            'series': {},
+            'parts': [],
+        }
+
+    @staticmethod
+    def _load_pickle(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def _dump_pickle(obj, path):
+        # Grava em arquivo temporário próprio e renomeia para não corromper a base
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                        prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @property
+    def version(self):
+        """Versão da base (incrementada a cada adição com linhas novas)"""
+        return self._state['version']
+
+    @property
+    def aggregates(self):
+        return self._state['aggregates']
+
+    @property
+    def n_rows(self):
+        return len(self._state['ids'])
+
+    def has_data(self):
+        return self.n_rows > 0
+
+    def _row_ids(self, df, id_column, per_site):
+        """Ids das linhas como texto (ou hash da linha quando não há coluna de id)
+
+        Com `per_site` e a coluna de unidade, o id vale dentro da unidade: cada
+        uma numera as próprias requisições.
+        """
+        if id_column is None:
+            hashed = pd.util.hash_pandas_object(df, index=False)
+            return hashed.astype(str).values
+        ids = df[id_column].astype(str)
+        if per_site and COL_UNIDADE in df.columns:
+            ids = df[COL_UNIDADE].astype(str) + '/' + ids
+        return ids.values
+
+    @staticmethod
+    def _to_parquet_safe(df, path):
+        """Grava em Parquet convertendo colunas de tipos mistos para texto"""
+        df = df.copy(deep=False)
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        df.columns = [str(col) for col in df.columns]
+        df.to_parquet(path, index=False)
+
+    def append(self, df):
+        """Adiciona um arquivo delta à base, ignorando requisições já conhecidas"""
+        with self._lock:
+            return self._append(df)
+
+    def _append(self, df):
+        received = len(df)
+        id_column = self._state['id_column'] or find_id_column(df)
+        # O formato dos ids é fixado na primeira adição: mudar depois faria as
+        # linhas já gravadas parecerem novas
+        per_site = self._state['ids_por_unidade']
+        if per_site is None:
+            per_site = COL_UNIDADE in df.columns
+
+        ids = pd.Index(self._row_ids(df, id_column, per_site))
+        # Duplicatas dentro do próprio delta e contra a base já gravada
+        is_new = ~ids.duplicated(keep='last') & ~ids.isin(self._state['ids'])
+        delta = df.loc[is_new].copy()
+        new_ids = ids[is_new]
+
+        result = AppendResult(
+            linhas_recebidas=received,
+            linhas_novas=len(delta),
+            linhas_duplicadas=received - len(delta)
+        )
+        if delta.empty:
+            return result
+
+        if id_column is None:
+            delta[ROW_HASH_COLUMN] = new_ids
+
+        # Grava as linhas novas como uma nova partição
+        os.makedirs(self.parts_path, exist_ok=True)
+        part_name = f'part-{len(self._state["parts"]) + 1:05d}.parquet'
+        self._to_parquet_safe(delta, os.path.join(self.parts_path, part_name))
+
+        # Atualiza os agregados somando apenas o delta
+        delta_aggregates = compute_aggregates(delta)
+        aggregates = merge_aggregates(self._state['aggregates'], delta_aggregates)
+
+        # Séries de previsão cuja impressão digital mudou precisam ser reajustadas
+        series = {'mensal': frame_fingerprint(aggregates['mensal'])}
+        changed = [name for name, fp in series.items()
+                   if self._state['series'].get(name) != fp]
+
+        self._state.update({
+            'version': self._state['version'] + 1,
+            'id_column': id_column,
+            'ids_por_unidade': per_site,
+            'ids': self._state['ids'].append(new_ids),
+            'aggregates': aggregates,
+            'series': series,
+            'parts': self._state['parts'] + [part_name],
+        })
+        self._dump_pickle(self._state, self.state_file)
+
+        result.meses_afetados = sorted(delta_aggregates['mensal'].index.astype(str))
+        result.maquinas_afetadas = sorted(delta_aggregates['maquina'].index.astype(str))
+        result.pecas_afetadas = sorted(delta_aggregates['peca'].index.astype(str))
+        result.series_alteradas = changed
+        return result
+
+    def load_dataset(self):
+        """Carrega todas as linhas gravadas na base"""
+        frames = [pd.read_parquet(os.path.join(self.parts_path, part))
+                  for part in self._state['parts']]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        return df.drop(columns=[ROW_HASH_COLUMN], errors='ignore')
+
+    def iter_dataset(self, batch_rows=50_000):
+        """Linhas gravadas na base em blocos (sem carregar tudo na memória)"""
+        import pyarrow.parquet as pq
+        for part in list(self._state['parts']):
+            parquet = pq.ParquetFile(os.path.join(self.parts_path, part))
+            for batch in parquet.iter_batches(batch_size=batch_rows):
+                yield batch.to_pandas().drop(columns=[ROW_HASH_COLUMN], errors='ignore')
+
+    @property
+    def forecaster(self):
+        """Modelos ajustados persistidos, estendidos a cada novo mês (warm start)"""
+        with self._lock:
+            if self._forecaster is None:
+                self._forecaster = self._load_pickle(self.models_file) or WarmStartForecaster()
+            return self._forecaster
+
+    def save_forecaster(self):
+        with self._lock:
+            if self._forecaster is not None:
+                os.makedirs(self.path, exist_ok=True)
+                self._dump_pickle(self._forecaster, self.models_file)
+
+    def get_forecast(self, key, series='mensal'):
+        """Resultado de previsão salvo, se a série não mudou desde o ajuste"""
+        cached = self._forecasts.get(key)
+        if cached is None or cached[0] != self._state['series'].get(series):
+            return None
+        return cached[1]
+
+    def put_forecast(self, key, value, series='mensal'):
+        """Salva o resultado de uma previsão junto com a impressão digital da série"""
+        with self._lock:
+            self._forecasts[key] = (self._state['series'].get(series), value)
+            os.makedirs(self.path, exist_ok=True)
+            self._dump_pickle(dict(self._forecasts), self.forecast_file)
+
+    def cached_forecast(self, key, compute, series='mensal'):
+        """Reaproveita a previsão salva ou reajusta apenas se a série mudou"""
+        value = self.get_forecast(key, series)
+        if value is None:
+            value = compute()
+            self.put_forecast(key, value, series)
+            self.save_forecaster()
+        return value
+
+    def reset(self):
+        """Apaga a base local"""
+        with self._lock:
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            self._state = self._empty_state()
+            self._forecasts = {}
+            self._forecaster = None
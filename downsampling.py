@@ -0,0 +1,108 @@
+"""
+Redução de pontos dos gráficos no servidor
+Dashboard de Análise de Peças
+
+Séries longas (histórico diário, várias séries, dispersões por linha) são
+reduzidas com LTTB (Largest-Triangle-Three-Buckets), que preserva picos e vales
+visuais, antes de virar JSON para o navegador. Acima de `WEBGL_THRESHOLD`
+pontos os traços passam a usar WebGL (`Scattergl`), que desenha muito mais
+rápido que SVG.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+try:
+    # O plotly importa o orjson só na primeira serialização; importado aqui, duas
+    # sessões serializando ao mesmo tempo não veem o módulo pela metade
+    import orjson  # noqa: F401
+except ImportError:
+    pass
+
+# Pontos por traço de linha enviados ao navegador
+MAX_LINE_POINTS = 2000
+# Barras por gráfico (acima disso as barras vizinhas são somadas)
+MAX_BARS = 500
+# A partir de quantos pontos o traço usa WebGL
+WEBGL_THRESHOLD = 1000
+
+
+def _numeric_axis(x):
+    """Eixo x numérico para o cálculo das áreas (datas viram nanossegundos)"""
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype('int64').to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float)
+    # Rótulos (ex: '01-2025'): usa a posição
+    return np.arange(len(x), dtype=float)
+
+
+def lttb_indices(x, y, threshold):
+    """Índices dos pontos escolhidos pelo LTTB (sempre inclui o primeiro e o último)"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _numeric_axis(x)
+    y = np.asarray(y, dtype=float)
+    # Baldes internos de tamanho igual; o primeiro e o último ponto ficam fixos
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Média do balde seguinte (ou o último ponto)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Ponto do balde que forma o maior triângulo com o anterior e a média
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_frame(df, y, x=None, max_points=MAX_LINE_POINTS):
+    """Linhas do DataFrame escolhidas pelo LTTB (x=None usa o índice)"""
+    if len(df) <= max_points:
+        return df
+    x_values = df.index if x is None else df[x]
+    y_values = pd.to_numeric(df[y], errors='coerce').fillna(0)
+    return df.iloc[lttb_indices(x_values, y_values, max_points)]
+
+
+def aggregate_buckets(df, max_bars=MAX_BARS, how='sum'):
+    """Agrupa linhas vizinhas em no máximo `max_bars` baldes (rótulo = primeira linha)"""
+    if len(df) <= max_bars:
+        return df
+    bucket = np.arange(len(df)) * max_bars // len(df)
+    result = df.groupby(bucket).agg(how)
+    result.index = df.index[np.flatnonzero(np.diff(bucket, prepend=-1))]
+    return result
+
+
+def scatter_trace(n_points, **kwargs):
+    """Traço de dispersão/linha: WebGL acima do limite de pontos"""
+    if n_points > WEBGL_THRESHOLD:
+        return go.Scattergl(**kwargs)
+    return go.Scatter(**kwargs)
+
+
+def render_mode(n_points):
+    """`render_mode` para px.line/px.scatter conforme o número de pontos"""
+    return 'webgl' if n_points > WEBGL_THRESHOLD else 'svg'
+
+
+def payload_size(fig):
+    """Tamanho em bytes do JSON do gráfico enviado ao navegador"""
+    return len(fig.to_json())
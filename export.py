@@ -0,0 +1,234 @@
+"""
+Exportação de tabelas e dados em CSV, Excel e Parquet
+Dashboard de Análise de Peças
+
+Os escritores recebem blocos de linhas (DataFrames) e gravam cada bloco assim
+que ele chega, em qualquer destino binário (arquivo, buffer ou a resposta
+HTTP da API), então a memória fica limitada ao bloco:
+
+- CSV: cada bloco é convertido e gravado; o cabeçalho (com BOM, para o Excel
+  reconhecer os acentos) só no primeiro.
+- Parquet: um row group por bloco, com o esquema do primeiro bloco.
+- Excel: planilha em modo write_only do openpyxl, que grava as linhas em
+  disco; acima do limite de linhas de uma planilha o arquivo ganha outra.
+
+`RowFilter` seleciona as linhas brutas exportadas (período, máquinas, trecho
+da descrição da peça), aplicado bloco a bloco.
+"""
+
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from columns import COL_MAQUINA, COL_MES, COL_PECA
+from resampling import DEFAULT_GRANULARITY, period_labels
+from text_ops import map_categories, normalize_text
+
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'text/csv'),
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+DEFAULT_CHUNK_ROWS = 50_000
+# Linhas de dados por planilha do Excel (fora o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_575
+
+_MONTH = re.compile(r'^\s*(\d{1,2})[-/](\d{4})\s*$')
+
+
+class CsvWriter:
+    def __init__(self, target, sheet_name=None):
+        self.target = target
+        self.rows = 0
+
+    def write(self, chunk):
+        header = self.rows == 0
+        text = chunk.to_csv(index=False, header=header)
+        self.target.write((('\ufeff' if header else '') + text).encode('utf-8'))
+        self.rows += len(chunk)
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    def __init__(self, target, sheet_name=None):
+        self.target = target
+        self.rows = 0
+        self.writer = None
+
+    @staticmethod
+    def _arrow_table(chunk):
+        import pyarrow as pa
+        # Texto e categorias viram string: blocos diferentes têm o mesmo tipo
+        chunk = chunk.copy(deep=False)
+        for col in chunk.columns:
+            if chunk[col].dtype == object or isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                values = chunk[col].astype(object)
+                chunk[col] = values.where(values.isna(), values.astype(str)).astype(object)
+        chunk.columns = [str(col) for col in chunk.columns]
+        return pa.Table.from_pandas(chunk, preserve_index=False)
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = self._arrow_table(chunk)
+        if self.writer is None:
+            # Colunas só com vazios no primeiro bloco ficam como texto
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type)
+                                else field for field in table.schema])
+            self.writer = pq.ParquetWriter(self.target, schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.writer is None:
+            self.write(pd.DataFrame())
+        self.writer.close()
+
+
+class ExcelWriter:
+    def __init__(self, target, sheet_name='Dados'):
+        from openpyxl import Workbook
+        self.target = target
+        self.sheet_name = sheet_name
+        # Modo write_only grava as linhas em disco conforme são adicionadas
+        self.workbook = Workbook(write_only=True)
+        self.columns = None
+        self.sheet = None
+        self.sheet_rows = 0
+        self.n_sheets = 0
+        self.rows = 0
+
+    def _new_sheet(self):
+        self.n_sheets += 1
+        title = self.sheet_name if self.n_sheets == 1 else f'{self.sheet_name} {self.n_sheets}'
+        self.sheet = self.workbook.create_sheet(title[:31])
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+
+    def write(self, chunk):
+        if self.columns is None:
+            self.columns = [str(col) for col in chunk.columns]
+            self._new_sheet()
+        # Vazios viram células em branco (NaN não é um valor válido no Excel)
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self.sheet_rows == EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+        self.rows += len(chunk)
+
+    def close(self):
+        if self.sheet is None:
+            self.columns = []
+            self._new_sheet()
+        self.workbook.save(self.target)
+
+
+WRITERS = {'csv': CsvWriter, 'xlsx': ExcelWriter, 'parquet': ParquetWriter}
+
+
+def check_format(fmt):
+    if fmt not in WRITERS:
+        raise ValueError(f"Formato não suportado: {fmt} (use {', '.join(WRITERS)})")
+    return fmt
+
+
+def iter_frame(df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Blocos de linhas de um DataFrame (fatias, sem cópia)"""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_chunks(chunks, fmt, target, sheet_name='Dados'):
+    """Grava os blocos no destino binário; retorna o número de linhas"""
+    writer = WRITERS[check_format(fmt)](target, sheet_name)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    finally:
+        writer.close()
+    return writer.rows
+
+
+def export_bytes(table, fmt, sheet_name='Dados'):
+    """Arquivo de uma tabela pequena (ex: resultado de análise) em memória"""
+    buffer = io.BytesIO()
+    write_chunks(iter_frame(table), fmt, buffer, sheet_name)
+    return buffer.getvalue()
+
+
+def export_file(chunks, fmt, path, sheet_name='Dados'):
+    """Grava os blocos num arquivo (temporário até terminar); retorna o número de linhas"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        rows = write_chunks(chunks, fmt, f, sheet_name)
+    os.replace(tmp_path, path)
+    return rows
+
+
+def month_key(value):
+    """'03-2024' -> número do mês (ano * 12 + mês); None se mal formado"""
+    match = _MONTH.match(str(value))
+    if not match or not 1 <= int(match.group(1)) <= 12:
+        return None
+    return int(match.group(2)) * 12 + int(match.group(1))
+
+
+@dataclass(frozen=True)
+class RowFilter:
+    """Filtro das linhas brutas exportadas (aplicado bloco a bloco)"""
+    # Período 'MM-AAAA' (inclusive)
+    start: Optional[str] = None
+    end: Optional[str] = None
+    machines: tuple = ()
+    # Trecho da descrição da peça (sem diferenciar acentos e maiúsculas)
+    part: str = ''
+
+    def __post_init__(self):
+        for value in (self.start, self.end):
+            if value and month_key(value) is None:
+                raise ValueError(f"Mês inválido: {value} (use MM-AAAA)")
+
+    def apply(self, chunk):
+        mask = np.ones(len(chunk), dtype=bool)
+        if (self.start or self.end) and COL_MES in chunk:
+            months = map_categories(chunk[COL_MES], month_key).astype('float64').to_numpy()
+            if self.start:
+                mask &= months >= month_key(self.start)
+            if self.end:
+                mask &= months <= month_key(self.end)
+        if self.machines and COL_MAQUINA in chunk:
+            mask &= chunk[COL_MAQUINA].isin(self.machines).to_numpy()
+        query = normalize_text(self.part)
+        if query and COL_PECA in chunk:
+            mask &= map_categories(chunk[COL_PECA], lambda v: query in normalize_text(v),
+                                   missing=False).astype(bool).to_numpy()
+        return chunk if mask.all() else chunk[mask]
+
+    def filter_chunks(self, chunks):
+        for chunk in chunks:
+            yield self.apply(chunk)
+
+
+def forecast_table(future_dates, predictions, pred_costs, pred_parts=None,
+                   granularity=DEFAULT_GRANULARITY):
+    """Previsões numéricas por período: solicitações por modelo, custo e peças"""
+    column = 'Mês' if granularity == DEFAULT_GRANULARITY else 'Período'
+    table = pd.DataFrame({column: period_labels(future_dates, granularity)})
+    for name, values in predictions.items():
+        table[f'Solicitações ({name})'] = np.round(values, 1)
+    table['Custo Previsto'] = np.round(pred_costs, 2)
+    if pred_parts is not None:
+        table['Peças Previstas'] = np.round(pred_parts, 1)
+    return table
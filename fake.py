@@ -1,12 +1,32 @@
-import pandas as pd
-import random
-from datetime import datetime, timedelta
+"""
+Gerador de requisições fake (dados sintéticos)
+Dashboard de Análise de Peças
+
+Amostragem vetorizada com NumPy, reproduzível por semente e gravada em blocos
+de tamanho limitado (CSV, Parquet ou Excel), o que permite gerar dezenas de
+milhões de linhas com memória constante.
+
+Exemplos:
+    python fake.py                                  # 100 mil linhas em CSV
+    python fake.py -n 10m --formato parquet --seed 42
+    python fake.py -n 1m --sazonalidade 0.3 --tendencia 0.5 --anomalias 4
+    python fake.py -n 1m --datas                    # com o dia de cada requisição
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
 import numpy as np
+import pandas as pd
 
 # Configurações
 NUM_REQUISICOES = 100000
 DATA_INICIO = datetime(2018, 1, 1)
 DATA_FIM = datetime(2025, 10, 17)
+TAMANHO_BLOCO = 500_000
+LIMITE_LINHAS_EXCEL = 1_048_575  # linhas de dados por planilha (fora o cabeçalho)
 
 # Listas de dados para geração aleatória
 solicitantes = [
@@ -45,100 +65,314 @@ status_entrega = [
     "Sim, {nome}", "Não", "Pendente", "Parcial", "Aguardando", "Em separação"
 ]
 
-def gerar_data_aleatoria():
-    """Gera uma data aleatória entre DATA_INICIO e DATA_FIM"""
-    delta = DATA_FIM - DATA_INICIO
-    random_days = random.randint(0, delta.days)
-    data = DATA_INICIO + timedelta(days=random_days)
-    return data.strftime("%m-%Y")
-
-def gerar_status_entrega(solicitante):
-    """Gera status de entrega, com maior probabilidade de 'Sim'"""
-    status = random.choices(
-        status_entrega,
-        weights=[60, 15, 10, 8, 4, 3],
-        k=1
-    )[0]
-    
-    if "{nome}" in status:
-        nome = solicitante.split()[0]
-        status = status.format(nome=nome)
-    
-    return status
-
-def gerar_quantidade():
-    """Gera quantidade de peças com distribuição realista"""
-    probabilidade = random.random()
-    if probabilidade < 0.5:  # 50% das vezes: 1-5 peças
-        return random.randint(1, 5)
-    elif probabilidade < 0.8:  # 30% das vezes: 6-20 peças
-        return random.randint(6, 20)
-    elif probabilidade < 0.95:  # 15% das vezes: 21-50 peças
-        return random.randint(21, 50)
-    else:  # 5% das vezes: 51-200 peças
-        return random.randint(51, 200)
-
-def gerar_preco_unitario():
-    """Gera preço unitário baseado em distribuição realista"""
-    probabilidade = random.random()
-    if probabilidade < 0.4:  # 40%: peças baratas
-        return round(random.uniform(5, 50), 2)
-    elif probabilidade < 0.75:  # 35%: peças médias
-        return round(random.uniform(50, 200), 2)
-    elif probabilidade < 0.95:  # 20%: peças caras
-        return round(random.uniform(200, 1000), 2)
-    else:  # 5%: peças muito caras
-        return round(random.uniform(1000, 5000), 2)
-
-# Geração dos dados
-print(f"Gerando {NUM_REQUISICOES} requisições fake...")
-
-dados = []
-for i in range(NUM_REQUISICOES):
-    solicitante = random.choice(solicitantes)
-    quantidade = gerar_quantidade()
-    preco_unitario = gerar_preco_unitario()
-    total = round(quantidade * preco_unitario, 2)
-    
-    registro = {
-        "": i,
-        "Mês/Ano": gerar_data_aleatoria(),
-        "Solicitante": solicitante,
-        "2- Máquina de destino:": random.choice(maquinas),
-        "6- Descrição da peça: ": random.choice(pecas),
-        "7- Quantidade de peças.": quantidade,
-        "Total": total,
-        "Entregue?": gerar_status_entrega(solicitante)
-    }
-    
-    dados.append(registro)
-    
-    # Feedback de progresso
-    if (i + 1) % 1000 == 0:
-        print(f"Geradas {i + 1} requisições...")
-
-# Criar DataFrame
-df = pd.DataFrame(dados)
-
-# Salvar em CSV
-nome_arquivo = f"requisicoes_fake_{NUM_REQUISICOES}.csv"
-df.to_csv(nome_arquivo, index=False, encoding='utf-8-sig')
-
-print(f"\n✓ Arquivo '{nome_arquivo}' gerado com sucesso!")
-print(f"\nEstatísticas dos dados gerados:")
-print(f"- Total de requisições: {len(df)}")
-print(f"- Período: {df['Mês/Ano'].min()} até {df['Mês/Ano'].max()}")
-print(f"- Total geral: R$ {df['Total'].sum():,.2f}")
-print(f"- Valor médio por requisição: R$ {df['Total'].mean():,.2f}")
-print(f"- Quantidade total de peças: {df['7- Quantidade de peças.'].sum()}")
-print(f"- Solicitantes únicos: {df['Solicitante'].nunique()}")
-print(f"- Máquinas únicas: {df['2- Máquina de destino:'].nunique()}")
-print(f"- Tipos de peças únicas: {df['6- Descrição da peça: '].nunique()}")
-
-# Mostrar distribuição de status
-print(f"\nDistribuição de status de entrega:")
-print(df['Entregue?'].value_counts())
-
-# Mostrar amostra dos dados
-print(f"\nAmostra dos primeiros 5 registros:")
-print(df.head())
\ No newline at end of file
+# Pesos dos status de entrega (maior probabilidade de 'Sim')
+pesos_status = [60, 15, 10, 8, 4, 3]
+
+# Quantidade de peças: (probabilidade acumulada, mínimo, máximo)
+faixas_quantidade = [
+    (0.50, 1, 5),      # 50% das vezes: 1-5 peças
+    (0.80, 6, 20),     # 30% das vezes: 6-20 peças
+    (0.95, 21, 50),    # 15% das vezes: 21-50 peças
+    (1.00, 51, 200),   # 5% das vezes: 51-200 peças
+]
+
+# Preço unitário: (probabilidade acumulada, mínimo, máximo)
+faixas_preco = [
+    (0.40, 5, 50),        # 40%: peças baratas
+    (0.75, 50, 200),      # 35%: peças médias
+    (0.95, 200, 1000),    # 20%: peças caras
+    (1.00, 1000, 5000),   # 5%: peças muito caras
+]
+
+COLUNAS = ["", "Mês/Ano", "Solicitante", "2- Máquina de destino:",
+           "6- Descrição da peça: ", "7- Quantidade de peças.", "Total", "Entregue?"]
+# Coluna opcional com o dia da requisição (--datas)
+COLUNA_DATA = "Data"
+
+
+def ampliar_catalogo(nomes, total, padrao):
+    """Completa a lista até `total` itens com nomes numerados"""
+    extras = [padrao.format(i) for i in range(len(nomes) + 1, total + 1)]
+    return list(nomes) + extras
+
+
+class GeradorRequisicoes:
+    """Gera requisições fake em blocos, de forma vetorizada e reproduzível
+    
+    A mesma semente e o mesmo tamanho de bloco produzem sempre os mesmos dados.
+    """
+    
+    def __init__(self, seed=None, sazonalidade=0.0, tendencia=0.0, anomalias=0,
+                 fator_anomalia=3.0, num_maquinas=None, num_pecas=None,
+                 data_inicio=DATA_INICIO, data_fim=DATA_FIM, datas=False):
+        self.rng = np.random.default_rng(seed)
+        # Inclui a coluna 'Data' (dia da requisição) além do 'Mês/Ano'
+        self.datas = datas
+        self.colunas = COLUNAS[:2] + [COLUNA_DATA] + COLUNAS[2:] if datas else COLUNAS
+        self.solicitantes = np.array(solicitantes, dtype=object)
+        self.maquinas = ampliar_catalogo(maquinas, num_maquinas or len(maquinas),
+                                         "Máquina {:03d}")
+        self.pecas = ampliar_catalogo(pecas, num_pecas or len(pecas),
+                                      "Peça Catálogo {:05d}")
+        self.proximo_id = 0
+        
+        # Status: 'Sim, {nome}' depende do solicitante; os demais são fixos
+        primeiros_nomes = [nome.split()[0] for nome in solicitantes]
+        nomes_unicos = list(dict.fromkeys(primeiros_nomes))
+        self.status_fixos = status_entrega[1:]
+        self.categorias_status = self.status_fixos + [f"Sim, {nome}" for nome in nomes_unicos]
+        # Código do status 'Sim, {nome}' de cada solicitante
+        self.codigo_sim = len(self.status_fixos) + np.array(
+            [nomes_unicos.index(nome) for nome in primeiros_nomes]
+        )
+        pesos = np.array(pesos_status, dtype=float)
+        self.prob_status = pesos / pesos.sum()
+        
+        self._preparar_datas(data_inicio, data_fim, sazonalidade, tendencia,
+                             anomalias, fator_anomalia)
+    
+    def _preparar_datas(self, data_inicio, data_fim, sazonalidade, tendencia,
+                        anomalias, fator_anomalia):
+        """Pesos diários das datas (uniforme por padrão, como no gerador original)"""
+        dias = np.arange(np.datetime64(data_inicio.date()), np.datetime64(data_fim.date()) + 1)
+        self.dias = dias
+        meses = dias.astype('datetime64[M]').astype(np.int64)
+        
+        # Rótulos 'MM-AAAA' calculados uma única vez por mês
+        meses_unicos, self.codigo_mes_dia = np.unique(meses, return_inverse=True)
+        self.rotulos_meses = [f"{m % 12 + 1:02d}-{1970 + m // 12}" for m in meses_unicos]
+        
+        pesos = np.ones(len(dias))
+        if sazonalidade:
+            # Pico no meio do ano, vale na virada do ano
+            mes_do_ano = meses % 12
+            pesos *= 1 - sazonalidade * np.cos(2 * np.pi * mes_do_ano / 12)
+        if tendencia:
+            pesos *= 1 + tendencia * np.linspace(0, 1, len(dias))
+        if anomalias:
+            escolhidos = self.rng.choice(len(meses_unicos), size=min(anomalias, len(meses_unicos)),
+                                         replace=False)
+            pesos[np.isin(self.codigo_mes_dia, escolhidos)] *= fator_anomalia
+            self.meses_anomalos = sorted(self.rotulos_meses[i] for i in escolhidos)
+        else:
+            self.meses_anomalos = []
+        
+        pesos = np.clip(pesos, 0, None)
+        uniforme = not (sazonalidade or tendencia or anomalias)
+        self.prob_dias = None if uniforme else pesos / pesos.sum()
+        self.num_dias = len(dias)
+    
+    def _faixas(self, faixas, n, inteiro):
+        """Amostra valores por faixas de probabilidade (mínimo e máximo de cada faixa)"""
+        limites = np.array([f[0] for f in faixas[:-1]])
+        minimos = np.array([f[1] for f in faixas], dtype=float)
+        maximos = np.array([f[2] for f in faixas], dtype=float)
+        faixa = np.searchsorted(limites, self.rng.random(n), side='right')
+        if inteiro:
+            return self.rng.integers(minimos[faixa], maximos[faixa] + 1).astype(np.int64)
+        return np.round(self.rng.uniform(minimos[faixa], maximos[faixa]), 2)
+    
+    def gerar_bloco(self, n):
+        """Gera um DataFrame com n requisições"""
+        rng = self.rng
+        
+        if self.prob_dias is None:
+            dias = rng.integers(0, self.num_dias, n)
+        else:
+            dias = rng.choice(self.num_dias, size=n, p=self.prob_dias)
+        codigo_mes = self.codigo_mes_dia[dias]
+        
+        solicitante = rng.integers(0, len(self.solicitantes), n)
+        maquina = rng.integers(0, len(self.maquinas), n)
+        peca = rng.integers(0, len(self.pecas), n)
+        
+        quantidade = self._faixas(faixas_quantidade, n, inteiro=True)
+        preco_unitario = self._faixas(faixas_preco, n, inteiro=False)
+        total = np.round(quantidade * preco_unitario, 2)
+        
+        # Status 0 ('Sim, {nome}') usa o primeiro nome do solicitante
+        status = rng.choice(len(status_entrega), size=n, p=self.prob_status)
+        codigo_status = np.where(status == 0, self.codigo_sim[solicitante], status - 1)
+        
+        ids = np.arange(self.proximo_id, self.proximo_id + n)
+        self.proximo_id += n
+        
+        # Colunas de texto como categorias: cada rótulo existe uma única vez na memória
+        return pd.DataFrame({
+            "": ids,
+            "Mês/Ano": pd.Categorical.from_codes(codigo_mes, self.rotulos_meses),
+            COLUNA_DATA: self.dias[dias] if self.datas else None,
+            "Solicitante": pd.Categorical.from_codes(solicitante, solicitantes),
+            "2- Máquina de destino:": pd.Categorical.from_codes(maquina, self.maquinas),
+            "6- Descrição da peça: ": pd.Categorical.from_codes(peca, self.pecas),
+            "7- Quantidade de peças.": quantidade,
+            "Total": total,
+            "Entregue?": pd.Categorical.from_codes(codigo_status, self.categorias_status),
+        }, columns=self.colunas)
+    
+    def blocos(self, num_requisicoes, tamanho_bloco=TAMANHO_BLOCO):
+        """Gera as requisições em blocos de no máximo `tamanho_bloco` linhas"""
+        restantes = num_requisicoes
+        while restantes > 0:
+            n = min(tamanho_bloco, restantes)
+            yield self.gerar_bloco(n)
+            restantes -= n
+
+
+def gerar_requisicoes(num_requisicoes=NUM_REQUISICOES, seed=None, **opcoes):
+    """Gera um DataFrame com requisições fake (tudo em memória)"""
+    return GeradorRequisicoes(seed=seed, **opcoes).gerar_bloco(num_requisicoes)
+
+
+class _EscritorCSV:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.primeiro = True
+    
+    def escrever(self, bloco):
+        bloco.to_csv(self.caminho, mode='w' if self.primeiro else 'a', header=self.primeiro,
+                     index=False, encoding='utf-8-sig' if self.primeiro else 'utf-8')
+        self.primeiro = False
+    
+    def fechar(self):
+        pass
+
+
+class _EscritorParquet:
+    def __init__(self, caminho):
+        import pyarrow.parquet as pq
+        self._pq = pq
+        self.caminho = caminho
+        self.writer = None
+    
+    def escrever(self, bloco):
+        import pyarrow as pa
+        # Categorias viram texto: os dicionários de cada bloco podem diferir
+        tabela = pa.Table.from_pandas(bloco.astype({c: str for c in bloco.columns
+                                                    if isinstance(bloco[c].dtype, pd.CategoricalDtype)}),
+                                      preserve_index=False)
+        if self.writer is None:
+            self.writer = self._pq.ParquetWriter(self.caminho, tabela.schema)
+        self.writer.write_table(tabela)
+    
+    def fechar(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _EscritorExcel:
+    def __init__(self, caminho):
+        from openpyxl import Workbook
+        # Modo write_only grava as linhas em disco conforme são adicionadas
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Requisições')
+        self.caminho = caminho
+        self.primeiro = True
+    
+    def escrever(self, bloco):
+        if self.primeiro:
+            self.sheet.append(list(bloco.columns))
+            self.primeiro = False
+        for linha in bloco.itertuples(index=False):
+            self.sheet.append(list(linha))
+    
+    def fechar(self):
+        self.workbook.save(self.caminho)
+
+
+ESCRITORES = {'csv': _EscritorCSV, 'parquet': _EscritorParquet, 'xlsx': _EscritorExcel}
+
+
+def escrever_requisicoes(caminho, num_requisicoes=NUM_REQUISICOES, formato=None,
+                         tamanho_bloco=TAMANHO_BLOCO, seed=None, **opcoes):
+    """Gera e grava as requisições bloco a bloco; retorna estatísticas resumidas"""
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower() or 'csv'
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato não suportado: {formato} (use csv, parquet ou xlsx)")
+    if formato == 'xlsx' and num_requisicoes > LIMITE_LINHAS_EXCEL:
+        raise ValueError(f"Excel suporta no máximo {LIMITE_LINHAS_EXCEL:,} linhas por planilha")
+    
+    gerador = GeradorRequisicoes(seed=seed, **opcoes)
+    escritor = ESCRITORES[formato](caminho)
+    estatisticas = {'linhas': 0, 'total': 0.0, 'pecas': 0, 'meses': set(),
+                    'meses_anomalos': gerador.meses_anomalos}
+    try:
+        for bloco in gerador.blocos(num_requisicoes, tamanho_bloco):
+            escritor.escrever(bloco)
+            estatisticas['linhas'] += len(bloco)
+            estatisticas['total'] += float(bloco['Total'].sum())
+            estatisticas['pecas'] += int(bloco['7- Quantidade de peças.'].sum())
+            estatisticas['meses'].update(bloco['Mês/Ano'].unique())
+    finally:
+        escritor.fechar()
+    
+    meses_ordenados = sorted(estatisticas.pop('meses'), key=lambda m: (m[3:], m[:2]))
+    estatisticas['periodo'] = (meses_ordenados[0], meses_ordenados[-1]) if meses_ordenados else None
+    return estatisticas
+
+
+def parse_quantidade(texto):
+    """'10m' -> 10000000, '100k' -> 100000"""
+    texto = str(texto).strip().lower()
+    multiplicador = {'k': 1_000, 'm': 1_000_000}.get(texto[-1:], 1)
+    numero = texto[:-1] if texto[-1:] in 'km' else texto
+    return int(float(numero) * multiplicador)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera requisições fake para testes")
+    parser.add_argument('-n', '--num', type=parse_quantidade, default=NUM_REQUISICOES,
+                        help="Número de requisições (aceita 100k, 10m...)")
+    parser.add_argument('-o', '--saida', help="Arquivo de saída (padrão: requisicoes_fake_N.<formato>)")
+    parser.add_argument('--formato', choices=sorted(ESCRITORES), default=None,
+                        help="csv, parquet ou xlsx (padrão: pela extensão da saída, ou csv)")
+    parser.add_argument('--seed', type=int, default=None, help="Semente para dados reproduzíveis")
+    parser.add_argument('--bloco', type=parse_quantidade, default=TAMANHO_BLOCO,
+                        help="Linhas geradas e gravadas por bloco")
+    parser.add_argument('--sazonalidade', type=float, default=0.0,
+                        help="Amplitude da sazonalidade anual (0 a 1)")
+    parser.add_argument('--tendencia', type=float, default=0.0,
+                        help="Crescimento relativo do volume ao longo do período (ex: 0.5 = +50%%)")
+    parser.add_argument('--anomalias', type=int, default=0,
+                        help="Número de meses com pico anômalo de solicitações")
+    parser.add_argument('--fator-anomalia', type=float, default=3.0,
+                        help="Multiplicador do volume nos meses anômalos")
+    parser.add_argument('--maquinas', type=int, default=None,
+                        help="Tamanho do catálogo de máquinas (amplia a lista padrão)")
+    parser.add_argument('--pecas', type=int, default=None,
+                        help="Tamanho do catálogo de peças (amplia a lista padrão)")
+    parser.add_argument('--datas', action='store_true',
+                        help="Inclui a coluna 'Data' com o dia da requisição (séries diárias e semanais)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    formato = args.formato or (os.path.splitext(args.saida)[1].lstrip('.').lower()
+                               if args.saida else 'csv')
+    nome_arquivo = args.saida or f"requisicoes_fake_{args.num}.{formato}"
+    
+    print(f"Gerando {args.num:,} requisições fake...")
+    estatisticas = escrever_requisicoes(
+        nome_arquivo, args.num, formato=formato, tamanho_bloco=args.bloco, seed=args.seed,
+        sazonalidade=args.sazonalidade, tendencia=args.tendencia, anomalias=args.anomalias,
+        fator_anomalia=args.fator_anomalia, num_maquinas=args.maquinas, num_pecas=args.pecas,
+        datas=args.datas
+    )
+    
+    print(f"\n✓ Arquivo '{nome_arquivo}' gerado com sucesso!")
+    print(f"\nEstatísticas dos dados gerados:")
+    print(f"- Total de requisições: {estatisticas['linhas']:,}")
+    if estatisticas['periodo']:
+        print(f"- Período: {estatisticas['periodo'][0]} até {estatisticas['periodo'][1]}")
+    print(f"- Total geral: R$ {estatisticas['total']:,.2f}")
+    if estatisticas['linhas']:
+        print(f"- Valor médio por requisição: R$ {estatisticas['total'] / estatisticas['linhas']:,.2f}")
+    print(f"- Quantidade total de peças: {estatisticas['pecas']:,}")
+    if estatisticas['meses_anomalos']:
+        print(f"- Meses com anomalia injetada: {', '.join(estatisticas['meses_anomalos'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
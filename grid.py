@@ -0,0 +1,118 @@
+"""
+Tabelas paginadas no servidor
+Dashboard de Análise de Peças
+
+Tabelas de agregados com dezenas de milhares de linhas (peças, solicitantes)
+são navegadas página a página: a busca, a ordenação e o corte da página são
+feitos aqui e só as linhas visíveis vão para o navegador.
+
+- Busca: trecho de texto procurado nos rótulos normalizados (sem acentos e
+  maiúsculas), calculados uma única vez por tabela.
+- Ordenação: nas primeiras páginas, `argpartition` separa só as linhas até o
+  fim da página e ordena apenas essas; páginas mais fundas usam a ordenação
+  completa, guardada por coluna e sentido.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from text_ops import normalize_text
+
+PAGE_SIZE = 50
+# Até esta fração da tabela a página é obtida com argpartition
+PARTIAL_SORT_FRACTION = 0.125
+
+
+class PagedTable:
+    """Busca, ordenação e paginação sobre uma tabela pré-calculada"""
+
+    def __init__(self, table, label=None):
+        # Rótulo pesquisável: o índice (ex: nome da peça) vira a primeira coluna
+        self.label = label or table.index.name or 'Nome'
+        self.table = table.rename_axis(self.label).reset_index()
+        self._keys = pd.Index([normalize_text(v) for v in self.table[self.label]])
+        self._sort_keys = {}
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self):
+        return list(self.table.columns)
+
+    def __len__(self):
+        return len(self.table)
+
+    def search(self, query):
+        """Posições das linhas cujo rótulo contém o trecho (None = todas)"""
+        query = normalize_text(query)
+        if not query:
+            return None
+        return np.flatnonzero(self._keys.str.contains(query, regex=False))
+
+    def _sort_values(self, column, ascending):
+        """Chave numérica em que a ordem crescente é a ordem pedida (calculada uma vez)"""
+        key = (column, ascending)
+        with self._lock:
+            if key not in self._sort_keys:
+                self._sort_keys[key] = self._compute_sort_values(column, ascending)
+            return self._sort_keys[key]
+
+    def _compute_sort_values(self, column, ascending):
+        values = self.table[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            # Texto: posição na ordem alfabética dos rótulos normalizados
+            values = pd.Series(self._keys if column == self.label
+                               else [normalize_text(v) for v in values])
+            values = values.rank(method='dense')
+        keys = values.to_numpy(dtype='float64', na_value=np.nan)
+        keys = keys if ascending else -keys
+        # Valores ausentes sempre no fim
+        return np.where(np.isnan(keys), np.inf, keys)
+
+    def _full_order(self, column, ascending):
+        key = (column, ascending)
+        if key not in self._orders:
+            order = np.argsort(self._sort_values(column, ascending), kind='stable')
+            with self._lock:
+                self._orders.setdefault(key, order)
+        return self._orders[key]
+
+    def page_rows(self, rows, column, ascending, page, page_size=PAGE_SIZE):
+        """Posições das linhas da página `page` (começando em 0)"""
+        n = len(self) if rows is None else len(rows)
+        start = page * page_size
+        end = min(start + page_size, n)
+        if start >= end:
+            return np.array([], dtype=int)
+
+        if rows is None and end > PARTIAL_SORT_FRACTION * n:
+            return self._full_order(column, ascending)[start:end]
+        if rows is not None and (column, ascending) in self._orders:
+            # Ordenação completa já calculada: filtra mantendo a ordem
+            order = self._full_order(column, ascending)
+            return order[np.isin(order, rows, assume_unique=True)][start:end]
+
+        keys = self._sort_values(column, ascending)
+        candidates = np.arange(len(self)) if rows is None else rows
+        subset = keys[candidates]
+        if end < len(subset):
+            # Só as linhas até o fim da página (e os empates com a última) são ordenadas
+            kth = subset[np.argpartition(subset, end - 1)[end - 1]]
+            top = np.flatnonzero(subset <= kth)
+        else:
+            top = np.arange(len(subset))
+        # Empates na ordem original das linhas, como na ordenação completa
+        top = top[np.lexsort((candidates[top], subset[top]))]
+        return candidates[top[start:end]]
+
+    def page(self, query='', column=None, ascending=False, page=0, page_size=PAGE_SIZE):
+        """(linhas da página, total de linhas encontradas, número de páginas)"""
+        column = column or self.label
+        rows = self.search(query)
+        n_matches = len(self) if rows is None else len(rows)
+        n_pages = max(-(-n_matches // page_size), 1)
+        page = min(max(page, 0), n_pages - 1)
+        positions = self.page_rows(rows, column, ascending, page, page_size)
+        return self.table.iloc[positions], n_matches, n_pages
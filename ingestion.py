@@ -0,0 +1,254 @@
+"""
+Leitura de arquivos de solicitações (Excel/CSV)
+Dashboard de Análise de Peças
+
+Cada unidade envia a sua exportação, com cabeçalhos às vezes diferentes. Os
+cabeçalhos são padronizados na leitura (`unify_columns`) e, ao consolidar
+vários arquivos, cada linha recebe a coluna 'Unidade' com o nome do arquivo de
+origem. A consolidação é map-reduce: cada arquivo é lido e agregado em um
+worker e os agregados parciais são somados no fim.
+"""
+
+import codecs
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+import pandas as pd
+
+from aggregates import compute_aggregates, merge_aggregates
+from columns import COL_UNIDADE, REQUIRED_COLUMNS, unify_columns
+from data_quality import merge_reports, validate_data
+
+CSV_ENCODINGS = ['utf-8', 'latin-1', 'iso-8859-1']
+DATA_EXTENSIONS = ('csv', 'xlsx', 'xls')
+
+# Leitura em streaming
+DEFAULT_CHUNKSIZE = 200_000
+# CSVs maiores que isso são divididos em faixas de bytes lidas em paralelo
+SPLIT_MIN_BYTES = 64 * 1024 * 1024
+
+
+def file_extension(name):
+    """Extensão do arquivo em minúsculas, sem o ponto"""
+    return os.path.splitext(str(name))[1].lstrip('.').lower()
+
+
+def site_name(name):
+    """Nome da unidade a partir do nome do arquivo ('dados/planta_sul.csv' -> 'planta_sul')"""
+    return os.path.splitext(os.path.basename(str(name)))[0]
+
+
+def read_data_file(source, name=None):
+    """Lê um arquivo Excel ou CSV a partir de um caminho ou buffer (upload)"""
+    name = name or getattr(source, 'name', source)
+
+    if file_extension(name) == 'csv':
+        # Tenta diferentes encodings para CSV
+        for i, encoding in enumerate(CSV_ENCODINGS):
+            if hasattr(source, 'seek'):
+                source.seek(0)  # Volta ao início do arquivo
+            try:
+                return unify_columns(pd.read_csv(source, encoding=encoding))
+            except UnicodeDecodeError:
+                if i == len(CSV_ENCODINGS) - 1:
+                    raise
+
+    return unify_columns(pd.read_excel(source))
+
+
+def list_data_files(path):
+    """Arquivos de dados de um diretório (ou o próprio arquivo)"""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if file_extension(name) in DATA_EXTENSIONS
+    )
+
+
+def detect_csv_encoding(path, sample_size=1024 * 1024):
+    """Primeiro encoding da lista que decodifica o início do arquivo"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    for encoding in CSV_ENCODINGS:
+        try:
+            # Decodificador incremental: tolera caractere cortado no fim da amostra
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return CSV_ENCODINGS[-1]
+
+
+class _RangeReader(io.RawIOBase):
+    """Arquivo binário restrito ao intervalo de bytes [start, end)"""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._file.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def csv_byte_ranges(path, n_parts):
+    """Divide um CSV em faixas de bytes alinhadas ao início das linhas
+
+    Retorna o cabeçalho e as faixas (início, fim). Campos entre aspas com
+    quebra de linha não são suportados nesse modo.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, n_parts):
+            f.seek(max(data_start + size * i // n_parts, bounds[-1]))
+            f.readline()  # Avança até o início da próxima linha
+            bounds.append(min(f.tell(), size))
+        bounds.append(size)
+    ranges = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    return header, ranges
+
+
+def iter_data_chunks(path, chunksize=DEFAULT_CHUNKSIZE, byte_range=None):
+    """Lê um arquivo em blocos de linhas (CSV em streaming; Excel de uma vez)"""
+    if file_extension(path) != 'csv':
+        yield unify_columns(pd.read_excel(path))
+        return
+
+    encoding = detect_csv_encoding(path)
+    if byte_range is None:
+        for chunk in pd.read_csv(path, encoding=encoding, chunksize=chunksize):
+            yield unify_columns(chunk)
+        return
+
+    # Faixa de bytes: lê o cabeçalho à parte e usa-o como nomes de coluna
+    columns = unify_columns(pd.read_csv(path, encoding=encoding, nrows=0)).columns
+    stream = io.TextIOWrapper(io.BufferedReader(_RangeReader(path, *byte_range)),
+                              encoding=encoding)
+    with stream:
+        yield from pd.read_csv(stream, header=None, names=columns, chunksize=chunksize)
+
+
+class MissingColumnsError(ValueError):
+    """Arquivo sem alguma coluna obrigatória"""
+
+    def __init__(self, source, missing, columns):
+        super().__init__(f"{source}: colunas obrigatórias ausentes: {', '.join(missing)}")
+        self.source = source
+        self.missing = missing
+        self.columns = list(columns)
+
+
+def check_columns(df, source):
+    """Erro descritivo quando faltam colunas obrigatórias"""
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise MissingColumnsError(source, missing, df.columns)
+
+
+def tag_site(df, site):
+    """Acrescenta a coluna 'Unidade' (se o arquivo ainda não tiver uma)"""
+    if site is None or COL_UNIDADE in df.columns:
+        return df
+    return df.assign(**{COL_UNIDADE: site})
+
+
+def aggregate_file(path, chunksize=DEFAULT_CHUNKSIZE, byte_range=None, site=None):
+    """Agregados de um arquivo lido em streaming (memória limitada ao bloco)"""
+    aggregates = {}
+    n_rows = 0
+    for chunk in iter_data_chunks(path, chunksize, byte_range):
+        check_columns(chunk, path)
+        chunk = tag_site(chunk, site)
+        aggregates = merge_aggregates(aggregates, compute_aggregates(chunk))
+        n_rows += len(chunk)
+    return aggregates, n_rows
+
+
+def _aggregate_task(task, chunksize):
+    path, byte_range, site = task
+    return aggregate_file(path, chunksize, byte_range, site)
+
+
+def _merge_results(results):
+    aggregates = {}
+    n_rows = 0
+    for partial, rows in results:
+        aggregates = merge_aggregates(aggregates, partial)
+        n_rows += rows
+    return aggregates, n_rows
+
+
+def aggregate_files(paths, workers=None, chunksize=DEFAULT_CHUNKSIZE, split=True):
+    """Agregados de vários arquivos em paralelo (map-reduce em processos)
+
+    CSVs grandes são divididos em faixas de bytes para que um único arquivo
+    também use todos os núcleos. Com mais de um arquivo, as linhas de cada um
+    são marcadas com a unidade (nome do arquivo).
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    for path in paths:
+        site = site_name(path) if len(paths) > 1 else None
+        if split and file_extension(path) == 'csv' and os.path.getsize(path) >= SPLIT_MIN_BYTES:
+            _, ranges = csv_byte_ranges(path, workers)
+            tasks.extend((path, byte_range, site) for byte_range in ranges)
+        else:
+            tasks.append((path, None, site))
+
+    if workers == 1 or len(tasks) == 1:
+        return _merge_results(map(_aggregate_task, tasks, repeat(chunksize)))
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return _merge_results(executor.map(_aggregate_task, tasks, repeat(chunksize)))
+
+
+def load_data_file(source, name=None, site=None):
+    """Lê, valida e agrega um arquivo: retorna (DataFrame limpo, agregados, relatório)"""
+    name = name or getattr(source, 'name', source)
+    df = read_data_file(source, name)
+    check_columns(df, name)
+    df, report = validate_data(tag_site(df, site))
+    return df, compute_aggregates(df), report
+
+
+def consolidate_files(sources, workers=None):
+    """Consolida vários arquivos (uploads ou caminhos) lidos em paralelo
+
+    Cada arquivo é lido, validado e agregado em uma thread (o leitor de CSV do
+    pandas libera o GIL); os agregados parciais são somados e as linhas
+    concatenadas. Ids repetidos só são descartados dentro do mesmo arquivo,
+    pois cada unidade numera as próprias requisições. Retorna
+    (DataFrame, agregados, relatório de qualidade).
+    """
+    names = [getattr(source, 'name', source) for source in sources]
+    sites = [site_name(name) for name in names] if len(sources) > 1 else [None] * len(sources)
+    workers = min(workers or os.cpu_count() or 1, len(sources)) or 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(load_data_file, sources, names, sites))
+
+    aggregates = {}
+    for _, partial, _ in results:
+        aggregates = merge_aggregates(aggregates, partial)
+    frames = [df for df, _, _ in results]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return df, aggregates, merge_reports([report for _, _, report in results])
@@ -0,0 +1,220 @@
+"""
+Instrumentação de desempenho por etapa
+Dashboard de Análise de Peças
+
+Mede tempo de parede, tempo de CPU (da thread) e pico de memória alocada
+(tracemalloc) de cada etapa. O profiler ativo fica em uma ContextVar, então
+cada sessão do Streamlit (cada thread) tem o seu; com a instrumentação
+desligada, `stage()` devolve um contexto nulo reaproveitado e o custo é
+desprezível.
+
+O tracemalloc é global ao processo: ele fica ligado enquanto houver algum
+profiler medindo memória (contagem de referências) e o pico é lido e zerado
+sob uma trava comum, repassando-o antes a todas as etapas abertas de todas as
+sessões. Assim uma sessão não apaga o pico de outra; o pico de cada etapa é o
+do processo durante ela (inclui as alocações concorrentes).
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+DEFAULT_LOG_PATH = os.path.join('logs', 'instrumentacao.jsonl')
+
+_NULL_CONTEXT = nullcontext()
+_current = contextvars.ContextVar('profiler', default=None)
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+# Etapas abertas (de qualquer profiler) que acompanham o pico de memória
+_open_frames = {}
+
+
+def _acquire_tracing():
+    """Liga o tracemalloc para mais um profiler (se ainda não estiver ligado)"""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    """Desliga o tracemalloc quando o último profiler que o ligou termina"""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def _sample_memory():
+    """Memória atual; repassa o pico às etapas abertas antes de zerá-lo (com a trava)"""
+    current, peak = tracemalloc.get_traced_memory()
+    for frame in _open_frames.values():
+        frame['peak'] = max(frame['peak'], peak)
+    tracemalloc.reset_peak()
+    return current
+
+
+class Profiler:
+    """Coleta registros de tempo/memória de etapas aninhadas"""
+
+    def __init__(self, enabled=True, track_memory=True):
+        self.enabled = enabled
+        self.track_memory = enabled and track_memory
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._local = threading.local()
+        self._release = None
+        if self.track_memory:
+            _acquire_tracing()
+            # Libera também se `close()` não chegar a rodar (ex: st.stop())
+            self._release = weakref.finalize(self, _release_tracing)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def stage(self, name):
+        """Contexto que mede a etapa (nulo quando desligado)
+
+        O contexto entrega um dicionário cujos campos são acrescentados ao
+        registro da etapa (ex: tamanho do gráfico enviado); desligado, entrega None.
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        stack = self._stack()
+        frame = {'peak': 0}
+        track_memory = self.track_memory
+        if track_memory:
+            with _tracing_lock:
+                frame['start_memory'] = _sample_memory()
+                _open_frames[id(frame)] = frame
+        stack.append(frame)
+
+        extra = {}
+        started = time.time()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield extra
+        finally:
+            record = {
+                'etapa': name,
+                'nivel': len(stack) - 1,
+                'inicio': started,
+                'tempo_s': time.perf_counter() - wall,
+                'cpu_s': time.thread_time() - cpu,
+            }
+            stack.pop()
+            if track_memory:
+                with _tracing_lock:
+                    _sample_memory()
+                    del _open_frames[id(frame)]
+                record['pico_memoria_mb'] = max(frame['peak'] - frame['start_memory'], 0) / (1024 * 1024)
+            record.update(extra)
+            self.records.append(record)
+
+    def timed(self, name, func):
+        """Versão da função que registra o próprio tempo"""
+        def run():
+            with self.stage(name):
+                return func()
+        return run
+
+    @contextmanager
+    def activate(self):
+        """Torna este o profiler atual (usado por `stage()` e `@instrumented`)"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def to_frame(self):
+        """Registros em ordem de início, com a etapa indentada pelo nível"""
+        frame = pd.DataFrame(self.records)
+        if frame.empty:
+            return frame
+        frame = frame.sort_values('inicio').reset_index(drop=True)
+        frame['etapa'] = ['  ' * n + e for n, e in zip(frame['nivel'], frame['etapa'])]
+        return frame.drop(columns=['inicio', 'nivel'])
+
+    def summary(self):
+        """Tabela de texto com o tempo de cada etapa"""
+        lines = [f"{'Etapa':<44}{'Tempo (s)':>12}{'CPU (s)':>10}"]
+        for record in sorted(self.records, key=lambda r: r['inicio']):
+            name = '  ' * record['nivel'] + record['etapa']
+            lines.append(f"{name:<44}{record['tempo_s']:>12.3f}{record['cpu_s']:>10.3f}")
+        return '\n'.join(lines)
+
+    def write_log(self, path=DEFAULT_LOG_PATH, **extra):
+        """Acrescenta os registros ao log JSON Lines (um registro por linha)"""
+        if not self.records:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.records:
+                entry = {'execucao': self.run_id, 'data': timestamp, **extra, **record}
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def close(self):
+        """Deixa de medir memória (o tracemalloc desliga com o último profiler)"""
+        self.track_memory = False
+        if self._release is not None:
+            self._release()
+
+
+_DISABLED = Profiler(enabled=False)
+
+
+def current_profiler():
+    """Profiler da sessão/thread atual (desligado se nenhum foi ativado)"""
+    return _current.get() or _DISABLED
+
+
+def set_current_profiler(profiler):
+    """Define o profiler da thread atual (ex: no início de cada execução do Streamlit)"""
+    _current.set(profiler)
+
+
+def stage(name):
+    """Mede uma etapa com o profiler atual"""
+    return current_profiler().stage(name)
+
+
+def instrumented(name=None):
+    """Decorador que mede a função com o profiler atual"""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _current.get()
+            if profiler is None or not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
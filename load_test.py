@@ -0,0 +1,459 @@
+"""
+Teste de carga com várias sessões simultâneas
+Dashboard de Análise de Peças
+
+Sobe o app.py num servidor Streamlit local (sem navegador) e abre N sessões
+pelo mesmo protocolo do navegador (WebSocket com mensagens protobuf). Cada
+sessão envia o arquivo de dados pelo endpoint de upload, muda opções da barra
+lateral e interage com as abas, medindo a latência de cada reexecução: do
+pedido até a mensagem de fim do script. O processo do servidor é amostrado
+durante o cenário para o pico de memória (RSS) e o uso de CPU.
+
+A troca de aba não aparece como etapa: o Streamlit envia todas as abas em
+cada execução e a troca acontece só no navegador. As interações dentro das
+abas (previsão conjunta, modelos, busca e página das tabelas) geram
+reexecuções e são medidas.
+
+Cenários:
+- mesmo_arquivo: todas as sessões enviam o mesmo arquivo (cache compartilhado)
+- arquivos_distintos: cada sessão envia um arquivo diferente (ajustes independentes)
+
+Cada cenário roda num servidor novo, com diretório de trabalho temporário
+(as bases e mapeamentos de nomes em data/ não são tocados). Só Linux: a
+memória e a CPU são lidas de /proc.
+
+Exemplos:
+    python load_test.py --sessions 20 --sizes 100k
+    python load_test.py --sessions 5 --scenarios mesmo_arquivo --output carga/atual.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.request import urlopen
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import FileURLs, UploadedFileInfo
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.websocket import websocket_connect
+
+from benchmark import DEFAULT_DATA_DIR, DEFAULT_SEED, dataset_path, environment_info, parse_size
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+SCENARIOS = ('mesmo_arquivo', 'arquivos_distintos')
+DEFAULT_SESSIONS = 20
+DEFAULT_SIZES = '100k'
+DEFAULT_PORT = 8599
+# Pausa máxima entre interações e intervalo para abrir todas as sessões (segundos)
+DEFAULT_THINK_S = 1.0
+DEFAULT_RAMP_S = 2.0
+STARTUP_TIMEOUT_S = 60
+RERUN_TIMEOUT_S = 900
+SAMPLE_INTERVAL_S = 0.1
+PERCENTILES = (50, 95, 99)
+MAX_MESSAGE_BYTES = 1024 * 1024 * 1024
+
+LABEL_UPLOAD = "Carregar arquivos Excel ou CSV"
+
+
+def session_steps(rng):
+    """Interações de uma sessão depois do envio: (etapa, ('label'|'key', nome), valor)"""
+    return [
+        ('meses', ('label', "Meses para previsão"), rng.choice([3, 9, 12])),
+        ('conjunta', ('label', "Previsão conjunta (solicitações, custo e peças)"), False),
+        ('modelos', ('label', "Modelos de previsão"),
+         ['Linear Regression', 'Random Forest', 'Gradient Boosting', 'Média Móvel (3)']),
+        ('busca', ('key', 'solicitantes_busca'), rng.choice(['a', 'e', 'o'])),
+        ('pagina', ('key', 'pecas_pagina'), 2),
+    ]
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype='float64')
+    if len(values) == 0:
+        return {f'p{p}_s': None for p in PERCENTILES}
+    return {f'p{p}_s': round(float(np.percentile(values, p)), 4) for p in PERCENTILES}
+
+
+class ProcessMonitor:
+    """Amostra RSS e tempo de CPU de um processo (via /proc) em uma thread"""
+
+    def __init__(self, pid, interval=SAMPLE_INTERVAL_S):
+        self.pid = pid
+        self.interval = interval
+        self.rss_mb = []
+        self.cpu_percent = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._ticks = os.sysconf('SC_CLK_TCK')
+
+    def _read_rss_mb(self, field='VmRSS'):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def _read_cpu_s(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            # Campos após o nome do processo (que pode conter espaços)
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def current_rss_mb(self):
+        return self._read_rss_mb()
+
+    def peak_rss_mb(self):
+        """Pico de RSS desde o início do processo (VmHWM)"""
+        return self._read_rss_mb('VmHWM')
+
+    def _run(self):
+        last_cpu, last_wall = self._read_cpu_s(), time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                cpu, wall = self._read_cpu_s(), time.monotonic()
+                self.rss_mb.append(self._read_rss_mb())
+            except FileNotFoundError:
+                break
+            self.cpu_percent.append(100 * (cpu - last_cpu) / max(wall - last_wall, 1e-9))
+            last_cpu, last_wall = cpu, wall
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class StreamlitServer:
+    """Servidor do app.py num processo separado, com diretório de trabalho temporário"""
+
+    def __init__(self, port=DEFAULT_PORT):
+        self.port = port
+        self.url = f'http://127.0.0.1:{port}'
+        self.workdir = None
+        self.process = None
+        self._log = None
+
+    def start(self):
+        self.workdir = tempfile.mkdtemp(prefix='carga_')
+        # Sem base pré-carregada: as sessões enviam os próprios arquivos
+        env = {k: v for k, v in os.environ.items() if k != 'DASHBOARD_DATASET'}
+        self._log = open(os.path.join(self.workdir, 'servidor.log'), 'wb')
+        self.process = subprocess.Popen([
+            sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+            '--server.headless', 'true',
+            '--server.port', str(self.port),
+            '--server.fileWatcherType', 'none',
+            '--server.enableXsrfProtection', 'false',
+            '--server.maxUploadSize', '4096',
+            '--browser.gatherUsageStats', 'false',
+        ], cwd=self.workdir, env=env, stdout=self._log, stderr=subprocess.STDOUT)
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT_S
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Servidor encerrou ao iniciar (ver {self._log.name})")
+            try:
+                with urlopen(f'{self.url}/_stcore/health', timeout=1) as response:
+                    if response.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise TimeoutError(f"Servidor não respondeu em {STARTUP_TIMEOUT_S} s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._log is not None:
+            self._log.close()
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class Session:
+    """Sessão simulada: fala com o servidor como o navegador"""
+
+    def __init__(self, url):
+        self.url = url
+        self.session_id = None
+        self.widgets = {}
+        self.widget_states = {}
+        self.exceptions = []
+        self._ws = None
+
+    async def connect(self):
+        ws_url = self.url.replace('http://', 'ws://') + '/_stcore/stream'
+        self._ws = await websocket_connect(
+            HTTPRequest(ws_url), subprotocols=['streamlit'],
+            max_message_size=MAX_MESSAGE_BYTES
+        )
+
+    def close(self):
+        if self._ws is not None:
+            self._ws.close()
+
+    async def _receive(self):
+        payload = await asyncio.wait_for(self._ws.read_message(), RERUN_TIMEOUT_S)
+        if payload is None:
+            raise ConnectionError("Conexão encerrada pelo servidor")
+        msg = ForwardMsg()
+        msg.ParseFromString(payload)
+        return msg
+
+    def _track(self, msg):
+        """Guarda os widgets e exceções enviados na execução"""
+        kind = msg.WhichOneof('type')
+        if kind == 'new_session':
+            self.session_id = msg.new_session.initialize.session_id
+        elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            element = msg.delta.new_element
+            element_type = element.WhichOneof('type')
+            proto = getattr(element, element_type)
+            if element_type == 'exception':
+                self.exceptions.append(proto.message)
+            elif getattr(proto, 'id', ''):
+                self.widgets[proto.id] = (element_type, proto)
+
+    async def rerun(self):
+        """Pede uma reexecução com os valores atuais e espera o fim do script (segundos)"""
+        self.widgets = {}
+        msg = BackMsg()
+        msg.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+        start = time.perf_counter()
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            received = await self._receive()
+            self._track(received)
+            if received.WhichOneof('type') == 'script_finished':
+                elapsed = time.perf_counter() - start
+                # Estados de widgets que sumiram da tela não são reenviados
+                self.widget_states = {k: v for k, v in self.widget_states.items()
+                                      if k in self.widgets}
+                return elapsed
+
+    def find_widget(self, selector):
+        by, name = selector
+        for widget_id, (element_type, proto) in self.widgets.items():
+            if (by == 'label' and getattr(proto, 'label', None) == name) or \
+                    (by == 'key' and widget_id.endswith(f'-{name}')):
+                return widget_id, element_type, proto
+        raise LookupError(f"Widget não encontrado: {name}")
+
+    def set_widget(self, selector, value):
+        widget_id, element_type, proto = self.find_widget(selector)
+        state = WidgetState(id=widget_id)
+        if element_type == 'slider':
+            state.double_array_value.data.extend([float(value)])
+        elif element_type == 'checkbox':
+            state.bool_value = bool(value)
+        elif element_type == 'multiselect':
+            state.string_array_value.data.extend(value)
+        elif element_type in ('text_input', 'selectbox'):
+            state.string_value = str(value)
+        elif element_type == 'number_input':
+            if proto.data_type == NumberInput.INT:
+                state.int_value = int(value)
+            else:
+                state.double_value = float(value)
+        elif element_type == 'radio':
+            state.int_value = list(proto.options).index(value)
+        else:
+            raise ValueError(f"Widget sem suporte: {element_type}")
+        self.widget_states[widget_id] = state
+
+    async def upload(self, path):
+        """Envia o arquivo pelo endpoint de upload e reexecuta (segundos, incluindo o envio)"""
+        start = time.perf_counter()
+        name = os.path.basename(path)
+        msg = BackMsg()
+        msg.file_urls_request.request_id = uuid.uuid4().hex
+        msg.file_urls_request.file_names.append(name)
+        msg.file_urls_request.session_id = self.session_id
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            received = await self._receive()
+            if received.WhichOneof('type') == 'file_urls_response':
+                urls = received.file_urls_response.file_urls[0]
+                break
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        boundary = uuid.uuid4().hex
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="{name}"\r\nContent-Type: application/octet-stream\r\n\r\n').encode() \
+            + data + f'\r\n--{boundary}--\r\n'.encode()
+        await AsyncHTTPClient().fetch(HTTPRequest(
+            self.url + urls.upload_url, method='PUT', body=body,
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+            request_timeout=RERUN_TIMEOUT_S
+        ))
+
+        widget_id, _, _ = self.find_widget(('label', LABEL_UPLOAD))
+        state = WidgetState(id=widget_id)
+        state.file_uploader_state_value.uploaded_file_info.append(UploadedFileInfo(
+            file_id=urls.file_id, name=name, size=len(data),
+            file_urls=FileURLs(file_id=urls.file_id, upload_url=urls.upload_url,
+                               delete_url=urls.delete_url)
+        ))
+        self.widget_states[widget_id] = state
+        await self.rerun()
+        return time.perf_counter() - start
+
+
+async def run_session(index, url, path, think, ramp, seed, records):
+    """Roteiro de uma sessão: abre, envia o arquivo e interage"""
+    rng = random.Random(seed + index)
+    await asyncio.sleep(ramp * rng.random())
+    session = Session(url)
+    try:
+        await session.connect()
+        records.append({'sessao': index, 'etapa': 'abertura', 'tempo_s': await session.rerun()})
+        records.append({'sessao': index, 'etapa': 'envio', 'tempo_s': await session.upload(path),
+                        'excecoes': session.exceptions})
+        for step, selector, value in session_steps(rng):
+            await asyncio.sleep(rng.uniform(0, think))
+            session.exceptions = []
+            session.set_widget(selector, value)
+            records.append({'sessao': index, 'etapa': step, 'tempo_s': await session.rerun(),
+                            'excecoes': session.exceptions})
+    except Exception as e:
+        records.append({'sessao': index, 'etapa': 'falha', 'erro': f'{type(e).__name__}: {e}'})
+    finally:
+        session.close()
+
+
+def run_scenario(scenario, paths, sessions, port=DEFAULT_PORT, think=DEFAULT_THINK_S,
+                 ramp=DEFAULT_RAMP_S, seed=DEFAULT_SEED):
+    """Executa um cenário num servidor novo e resume latências, memória e CPU"""
+    server = StreamlitServer(port).start()
+    try:
+        monitor = ProcessMonitor(server.process.pid).start()
+        idle_rss = monitor.current_rss_mb()
+        records = []
+
+        async def run_all():
+            await asyncio.gather(*(run_session(i, server.url, paths[i % len(paths)], think, ramp,
+                                               seed, records)
+                                   for i in range(sessions)))
+
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        duration = time.perf_counter() - start
+        monitor.stop()
+        peak_rss = monitor.peak_rss_mb()
+    finally:
+        server.stop()
+
+    latencies = [r['tempo_s'] for r in records if 'tempo_s' in r]
+    steps = {}
+    for record in records:
+        if 'tempo_s' in record:
+            steps.setdefault(record['etapa'], []).append(record['tempo_s'])
+    failures = [r['erro'] for r in records if 'erro' in r]
+    exceptions = [e for r in records for e in r.get('excecoes', [])]
+    return {
+        'cenario': scenario,
+        'sessoes': sessions,
+        'reexecucoes': len(latencies),
+        'falhas': len(failures),
+        'exemplos_falhas': failures[:5],
+        'excecoes_app': len(exceptions),
+        'exemplos_excecoes': sorted(set(exceptions))[:5],
+        **percentiles(latencies),
+        'max_s': round(max(latencies), 4) if latencies else None,
+        'por_etapa': {step: percentiles(values) for step, values in steps.items()},
+        'rss_inicial_mb': round(idle_rss, 1),
+        'rss_pico_mb': round(peak_rss, 1),
+        'rss_por_sessao_mb': round((peak_rss - idle_rss) / sessions, 1),
+        'cpu_medio_pct': round(float(np.mean(monitor.cpu_percent)), 1) if monitor.cpu_percent else None,
+        'cpu_max_pct': round(float(np.max(monitor.cpu_percent)), 1) if monitor.cpu_percent else None,
+        'duracao_s': round(duration, 2),
+    }
+
+
+def scenario_paths(scenario, data_dir, n_rows, sessions, seed):
+    if scenario == 'mesmo_arquivo':
+        return [dataset_path(data_dir, n_rows, seed)]
+    return [dataset_path(data_dir, n_rows, seed + i) for i in range(sessions)]
+
+
+def print_result(result):
+    print(f"  {result['cenario']:<20}{result['reexecucoes']:>6} reexec."
+          f"  p50 {result['p50_s']:.2f}s  p95 {result['p95_s']:.2f}s  p99 {result['p99_s']:.2f}s"
+          f"  pico RSS {result['rss_pico_mb']:,.0f} MB ({result['rss_por_sessao_mb']:,.1f} MB/sessão)"
+          f"  CPU máx {result['cpu_max_pct']:.0f}%"
+          + (f"  falhas {result['falhas']}" if result['falhas'] else ''))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com sessões simultâneas")
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS,
+                        help=f"Sessões simultâneas (padrão: {DEFAULT_SESSIONS})")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f"Tamanhos dos dados (padrão: {DEFAULT_SIZES})")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Cenários separados por vírgula: {','.join(SCENARIOS)}")
+    parser.add_argument('--think', type=float, default=DEFAULT_THINK_S,
+                        help="Pausa máxima entre interações de uma sessão (segundos)")
+    parser.add_argument('--ramp', type=float, default=DEFAULT_RAMP_S,
+                        help="Intervalo em que as sessões são abertas (segundos)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Porta do servidor de teste")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="Diretório dos dados sintéticos gerados")
+    parser.add_argument('--output', default='carga_resultados.json', help="Arquivo JSON de saída")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help="Semente dos dados e das interações")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    invalid = [s for s in scenarios if s not in SCENARIOS]
+    if invalid:
+        print(f"Cenário(s) inválido(s): {', '.join(invalid)}", file=sys.stderr)
+        return 2
+
+    results = []
+    for n_rows in [parse_size(size) for size in args.sizes.split(',') if size.strip()]:
+        print(f"\n{n_rows:,} linhas, {args.sessions} sessões")
+        for scenario in scenarios:
+            paths = scenario_paths(scenario, args.data_dir, n_rows, args.sessions, args.seed)
+            result = {'linhas': n_rows, **run_scenario(scenario, paths, args.sessions, args.port,
+                                                       args.think, args.ramp, args.seed)}
+            print_result(result)
+            results.append(result)
+
+    report = {'ambiente': environment_info(), 'resultados': results}
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em {args.output}")
+    return 1 if any(r['falhas'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
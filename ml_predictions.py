@@ -3,6 +3,9 @@ Módulo de Machine Learning para Previsões
 Dashboard de Análise de Peças
 """
 
+import copy
+import threading
+
 import pandas as pd
 import numpy as np
 
@@ -16,83 +19,389 @@ if not hasattr(np, 'int_'):
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
+from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 from prophet import Prophet
 import plotly.graph_objects as go
 import plotly.express as px
-from datetime import datetime, timedelta
+from aggregates import coerce_numeric_columns, compute_aggregates, frame_fingerprint
+from criticality import criticality_scores
+from downsampling import (
+    WEBGL_THRESHOLD,
+    aggregate_buckets,
+    downsample_frame,
+    render_mode,
+    scatter_trace
+)
+from instrumentation import instrumented, stage
+from resampling import (
+    DEFAULT_GRANULARITY,
+    FREQUENCIES,
+    PERIOD_NAMES,
+    TimeIndex,
+    check_granularity,
+    future_dates as next_period_dates
+)
+from model_registry import default_model_names, get_model, model_colors, run_models
+from tuning import build_model
 import warnings
 warnings.filterwarnings('ignore')
 
+# Atualização incremental (warm start) dos ensembles
+WARM_START_TREES = 10        # árvores novas por atualização do Random Forest
+MAX_FOREST_TREES = 200       # árvores mais antigas são descartadas acima disso
+WARM_START_STAGES = 10       # estágios novos por atualização do Gradient Boosting
+MAX_BOOSTING_STAGES = 300    # acima disso o Gradient Boosting é reajustado do zero
+DRIFT_THRESHOLD = 3.0        # resíduo máximo (em desvios da variação mensal) sem deriva
+HISTORY_TOLERANCE = 0.05     # variação relativa aceita nos meses já ajustados
+
+# Séries previstas juntas na previsão conjunta
+JOINT_TARGETS = ['Quantidade', 'Total', 'Qtd_Pecas']
+
+
+class WarmStartForecaster:
+    """Mantém os modelos ajustados de cada série e os estende quando chegam novos meses
+    
+    Quando a série apenas ganha meses novos no final e os valores novos são
+    coerentes com o modelo atual, o Random Forest ganha algumas árvores e o
+    Gradient Boosting alguns estágios (warm start), reaproveitando o que já foi
+    ajustado. Mudanças no histórico ou deriva forçam um reajuste completo.
+    
+    O ajuste (`prepare`) trabalha sobre uma cópia do modelo guardado e só
+    `commit` altera o estado, sob um lock que também protege a gravação: um
+    ajuste que estourou o orçamento pode terminar em segundo plano sem mexer
+    nos modelos salvos.
+    """
+    
+    def __init__(self):
+        self.states = {}
+        self.last_updates = {}
+        # Escala fixa das séries padronizadas (ex: previsão conjunta) por chave
+        self.target_scales = {}
+        self._lock = threading.Lock()
+    
+    def __getstate__(self):
+        # Cópia consistente dos estados (cada estado é substituído, nunca alterado)
+        with self._lock:
+            return {'states': dict(self.states), 'last_updates': dict(self.last_updates),
+                    'target_scales': dict(self.target_scales)}
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('target_scales', {})
+        self._lock = threading.Lock()
+    
+    def target_scale(self, key, scale):
+        """Escala guardada para a chave (a primeira calculada)
+
+        Padronizar cada atualização com o desvio recalculado mudaria os valores
+        já ajustados e forçaria reajustes por 'histórico alterado'.
+        """
+        with self._lock:
+            stored = self.target_scales.get(key)
+            if stored is None or len(stored) != len(scale):
+                stored = self.target_scales[key] = np.asarray(scale, dtype=float).copy()
+            return stored
+    
+    @staticmethod
+    def _variation_scale(y):
+        """Escala típica da variação mês a mês (uma por série quando `y` tem várias colunas)"""
+        y = np.asarray(y, dtype=float)
+        scale = np.std(np.diff(y, axis=0), axis=0) if len(y) > 2 else np.std(y, axis=0)
+        return np.maximum(scale, 1e-9)
+    
+    @staticmethod
+    def _model_params(model):
+        """Hiperparâmetros do modelo, exceto os alterados pelo warm start"""
+        # Parâmetros de estimadores internos (ex: MultiOutputRegressor) entram como 'estimator__...'
+        return {name: value for name, value in model.get_params().items()
+                if not hasattr(value, 'get_params')
+                and name.rsplit('__', 1)[-1] not in ('warm_start', 'n_estimators')}
+    
+    def _refit_reason(self, state, X, y, index, model):
+        """Motivo para reajustar do zero (None se a atualização incremental é segura)"""
+        if state is None:
+            return 'inicial'
+        
+        if state.get('params', self._model_params(model)) != self._model_params(model):
+            return 'parâmetros alterados'
+        
+        n_old = len(state['y'])
+        if len(y) < n_old or list(index[:n_old]) != state['index']:
+            return 'histórico alterado'
+        
+        old_y = state['y']
+        change = np.abs(y[:n_old] - old_y).max() / max(np.abs(old_y).mean(), 1e-9)
+        if change > HISTORY_TOLERANCE:
+            return 'histórico alterado'
+        
+        if len(y) > n_old:
+            residuals = y[n_old:] - state['model'].predict(X[n_old:])
+            if (np.abs(residuals) > DRIFT_THRESHOLD * state['scale']).any():
+                return 'deriva detectada'
+        
+        return None
+    
+    def _extend(self, model, X, y):
+        """Acrescenta árvores/estágios ao modelo já ajustado
+
+        Retorna o status da atualização: 'incremental', 'reajustado' (modelo sem
+        warm start, ajustado de novo) ou None se não for possível estender.
+        """
+        if isinstance(model, MultiOutputRegressor):
+            # Um ensemble por série: cada um é estendido com a sua coluna
+            y = np.asarray(y)
+            extensible = all(not isinstance(estimator, GradientBoostingRegressor)
+                             or estimator.n_estimators_ + WARM_START_STAGES <= MAX_BOOSTING_STAGES
+                             for estimator in model.estimators_)
+            if not extensible:
+                return None
+            statuses = {self._extend(estimator, X, y[:, i])
+                        for i, estimator in enumerate(model.estimators_)}
+            return 'incremental' if statuses == {'incremental'} else 'reajustado'
+        
+        if isinstance(model, RandomForestRegressor):
+            model.set_params(warm_start=True,
+                             n_estimators=len(model.estimators_) + WARM_START_TREES)
+            model.fit(X, y)
+            # Mantém o custo constante descartando as árvores mais antigas
+            if len(model.estimators_) > MAX_FOREST_TREES:
+                model.estimators_ = model.estimators_[-MAX_FOREST_TREES:]
+                model.n_estimators = MAX_FOREST_TREES
+            return 'incremental'
+        
+        if isinstance(model, GradientBoostingRegressor):
+            n_stages = model.n_estimators_ + WARM_START_STAGES
+            if n_stages > MAX_BOOSTING_STAGES:
+                return None
+            model.set_params(warm_start=True, n_estimators=n_stages)
+            model.fit(X, y)
+            return 'incremental'
+        
+        # Modelos baratos (ex: regressão linear) são simplesmente reajustados
+        model.fit(X, y)
+        return 'reajustado'
+
+    
+    def prepare(self, key, model, X, y, index):
+        """Ajusta o modelo da série `key` sem alterar o estado
+
+        Reaproveita (uma cópia do) ajuste anterior quando possível. Retorna
+        (modelo ajustado, atualização para `commit`).
+        """
+        with self._lock:
+            state = self.states.get(key)
+        reason = self._refit_reason(state, X, y, index, model)
+        
+        if reason is None:
+            fitted = state['model']
+            if len(y) == len(state['y']):
+                status = 'reaproveitado'
+            else:
+                # O modelo guardado só é substituído no commit
+                fitted = copy.deepcopy(fitted)
+                status = self._extend(fitted, X, y)
+                if status is None:
+                    model.fit(X, y)
+                    fitted, status = model, 'limite de estágios'
+        else:
+            model.fit(X, y)
+            fitted, status = model, reason
+        
+        new_state = {
+            'model': fitted,
+            'params': self._model_params(model),
+            'y': np.asarray(y, dtype=float).copy(),
+            'index': list(index),
+            'scale': self._variation_scale(y)
+        }
+        return fitted, (key, new_state, status)
+    
+    def commit(self, update):
+        """Guarda o ajuste aceito como estado da série"""
+        key, state, status = update
+        with self._lock:
+            self.states[key] = state
+            self.last_updates[key] = status
+    
+    def fit(self, key, model, X, y, index):
+        """Ajusta o modelo da série `key` e guarda o resultado"""
+        fitted, update = self.prepare(key, model, X, y, index)
+        self.commit(update)
+        return fitted
+
 
 class MLPredictor:
     """Classe para previsões com Machine Learning"""
     
-    def __init__(self, df):
+    def __init__(self, df=None, aggregates=None, forecaster=None, granularity=DEFAULT_GRANULARITY):
         # Cria uma cópia do dataframe para não modificar o original
-        self.df = df.copy()
+        self.df = df.copy() if df is not None else None
         self.models = {}
         self.predictions = {}
         
+        # Agregados pré-calculados (ex: base incremental) evitam reagrupar as linhas
+        self._aggregates = aggregates
+        
+        # Modelos persistidos entre atualizações (warm start), opcional
+        self.forecaster = forecaster
+        
+        # Resolução das séries temporais ('dia', 'semana' ou 'mes'); ver resampling
+        self.granularity = check_granularity(granularity)
+        self._time_index = None
+        
+        # Hiperparâmetros ajustados por (série, modelo); ver tuning.tune_predictor
+        self.tuned_params = {}
+        self.tuning = None
+        
+        # Modelos executados na última previsão de cada série (status e tempo)
+        self.model_runs = {}
+        
         # Garante que colunas numéricas estejam no tipo correto
-        self._prepare_numeric_columns()
+        if self.df is not None:
+            self._prepare_numeric_columns()
+    
+    @classmethod
+    def from_aggregates(cls, aggregates):
+        """Cria um preditor apenas a partir de agregados já calculados"""
+        return cls(df=None, aggregates=aggregates)
     
     def _prepare_numeric_columns(self):
         """Converte colunas numéricas para o tipo correto"""
-        # Lista de colunas que devem ser numéricas
-        numeric_columns = ['Total', '7- Quantidade de peças.']
-        
-        for col in numeric_columns:
-            if col in self.df.columns:
-                self.df[col] = pd.to_numeric(self.df[col], errors='coerce').fillna(0)
+        coerce_numeric_columns(self.df)
+    
+    @property
+    def aggregates(self):
+        """Agregados aditivos (calculados uma única vez)"""
+        if self._aggregates is None:
+            with stage('MLPredictor.agregados'):
+                self._aggregates = compute_aggregates(self.df)
+        return self._aggregates
+    
+    @property
+    def time_index(self):
+        """Índice de tempo ordenado com as séries de cada resolução (calculado uma vez)"""
+        if self._time_index is None:
+            self._time_index = TimeIndex.from_aggregates(self.aggregates)
+        return self._time_index
+    
+    @property
+    def granularities(self):
+        """Resoluções disponíveis para os dados (diária e semanal exigem a coluna de data)"""
+        return self.time_index.granularities
+    
+    def with_granularity(self, granularity):
+        """Preditor na resolução pedida, com os mesmos agregados e índice de tempo
+
+        Os hiperparâmetros ajustados não são copiados: valem para a série em que
+        a busca rodou (ver tuning.tune_predictor).
+        """
+        if granularity == self.granularity:
+            return self
+        predictor = MLPredictor(aggregates=self.aggregates, forecaster=self.forecaster,
+                                granularity=granularity)
+        predictor._time_index = self.time_index
+        return predictor
+    
+    @property
+    def period_name(self):
+        """Nome do período da resolução ('mês', 'semana', 'dia')"""
+        return PERIOD_NAMES[self.granularity][0]
         
+    @instrumented()
     def prepare_temporal_data(self):
-        """Prepara dados temporais para previsão"""
-        # Agrupa por mês
-        df_month = self.df.groupby('Mês/Ano').agg({
-            'Mês/Ano': 'count',
-            'Total': 'sum'
-        }).rename(columns={'Mês/Ano': 'Quantidade'})
-        
-        # Converte para datetime de forma robusta
-        # Tenta diferentes formatos comuns
-        try:
-            df_month['Data'] = pd.to_datetime(df_month.index, format='%m-%Y')
-        except:
-            try:
-                df_month['Data'] = pd.to_datetime(df_month.index, format='%m/%Y')
-            except:
-                # Formato inferido automaticamente
-                df_month['Data'] = pd.to_datetime(df_month.index, infer_datetime_format=True)
-        
-        # Ordena cronologicamente (do mais antigo para o mais novo)
-        df_month = df_month.sort_values('Data')
+        """Prepara dados temporais para previsão
+        
+        Uma linha por período da resolução do preditor, em ordem cronológica;
+        'Mes_Num' é a posição do período na série (o nome vem da série mensal).
+        """
+        df_month = self.time_index.series(self.granularity).copy()
         df_month['Mes_Num'] = range(len(df_month))
         
         return df_month
     
-    def predict_next_months(self, months=6):
-        """Prevê quantidade de solicitações para os próximos meses"""
+    def _future_dates(self, df_month, periods):
+        return next_period_dates(df_month['Data'].max(), periods, self.granularity)
+    
+    def series_fingerprint(self):
+        """Impressão digital da série na resolução do preditor (muda apenas quando a série muda)"""
+        if self.granularity == DEFAULT_GRANULARITY:
+            return frame_fingerprint(self.aggregates['mensal'])
+        return frame_fingerprint(self.prepare_temporal_data().select_dtypes('number'))
+    
+    def _make_model(self, target, name):
+        """Ensemble com os parâmetros ajustados para a série (ou os padrão)"""
+        return build_model(name, self.tuned_params.get((target, name)))
+    
+    def _prepare_fit(self, key, model, X, y, df_month):
+        """(modelo ajustado, atualização do forecaster ou None), sem guardar o ajuste"""
+        if self.forecaster is None:
+            model.fit(X, y)
+            return model, None
+        if self.granularity != DEFAULT_GRANULARITY:
+            # Cada resolução mantém seus próprios modelos
+            key = (self.granularity, key)
+        return self.forecaster.prepare(key, model, X, y, df_month.index)
+    
+    def _fit_model(self, key, model, X, y, df_month):
+        """Ajusta o modelo do zero ou, com um forecaster, de forma incremental"""
+        fitted, update = self._prepare_fit(key, model, X, y, df_month)
+        if update is not None:
+            self.forecaster.commit(update)
+        return fitted
+    
+    def _run_models(self, key, models, X, y, df_month, multi_output=False):
+        """Ajusta os modelos do registro escolhidos (padrão: os marcados como default)"""
+        specs = [get_model(name) for name in (models or default_model_names())]
+        instances = []
+        for spec in specs:
+            # A série conjunta não tem parâmetros ajustados: usa os padrão
+            model = spec.factory(self, key, df_month)
+            if multi_output and not spec.multi_output:
+                model = MultiOutputRegressor(model)
+            instances.append((spec, model))
+        
+        results, report = run_models(
+            instances,
+            lambda name, model: self._prepare_fit((key, name), model, X, y, df_month),
+            n_points=len(df_month),
+            n_outputs=y.shape[1] if np.ndim(y) > 1 else 1
+        )
+        # Só os ajustes aceitos (no prazo) atualizam os modelos guardados
+        fitted = {}
+        for name, (model, update) in results.items():
+            if update is not None:
+                self.forecaster.commit(update)
+            fitted[name] = model
+        if not fitted:
+            # Nenhum modelo concluiu: a regressão linear garante alguma previsão
+            fitted['Linear Regression'] = self._fit_model((key, 'Linear Regression'),
+                                                          LinearRegression(), X, y, df_month)
+            report.append({'modelo': 'Linear Regression', 'status': 'substituto',
+                           'segundos': None, 'custo': get_model('Linear Regression').cost})
+        self.model_runs[key] = report
+        return fitted
+    
+    @instrumented()
+    def predict_next_months(self, months=6, models=None):
+        """Prevê quantidade de solicitações para os próximos meses
+        
+        `months` é o número de períodos na resolução do preditor (meses por
+        padrão). `models` lista os nomes do registro de modelos (model_registry).
+        """
         df_month = self.prepare_temporal_data()
         
         # Features
         X = df_month[['Mes_Num']].values
         y = df_month['Quantidade'].values
         
-        # Treina múltiplos modelos
-        models = {
-            'Linear Regression': LinearRegression(),
-            'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=42)
-        }
+        # Treina os modelos em paralelo (cada um com seu orçamento de tempo)
+        fitted = self._run_models('Quantidade', models, X, y, df_month)
         
         predictions = {}
         scores = {}
         
-        for name, model in models.items():
-            # Treina
-            model.fit(X, y)
-            
+        for name, model in fitted.items():
             # Score no conjunto de treino
             scores[name] = model.score(X, y)
             
@@ -104,11 +413,11 @@ class MLPredictor:
             self.models[name] = model
         
         # Gera datas futuras
-        last_date = df_month['Data'].max()
-        future_dates = [last_date + timedelta(days=30*i) for i in range(1, months+1)]
+        future_dates = self._future_dates(df_month, months)
         
         return df_month, predictions, future_dates, scores
     
+    @instrumented()
     def predict_costs(self, months=6):
         """Prevê custos para os próximos meses"""
         df_month = self.prepare_temporal_data()
@@ -117,18 +426,62 @@ class MLPredictor:
         y = df_month['Total'].values
         
         # Modelo de previsão de custos
-        model = GradientBoostingRegressor(n_estimators=100, random_state=42)
-        model.fit(X, y)
+        model = self._make_model('Total', 'Gradient Boosting')
+        model = self._fit_model(('Total', 'Gradient Boosting'), model, X, y, df_month)
         
         # Prevê
         future_months = np.arange(len(df_month), len(df_month) + months).reshape(-1, 1)
         pred_costs = model.predict(future_months)
         
-        last_date = df_month['Data'].max()
-        future_dates = [last_date + timedelta(days=30*i) for i in range(1, months+1)]
+        future_dates = self._future_dates(df_month, months)
         
         return df_month, pred_costs, future_dates, model.score(X, y)
     
+    @instrumented()
+    def predict_joint(self, months=6, models=None):
+        """Prevê solicitações, custo e quantidade de peças juntos
+        
+        Uma única matriz de features e um ajuste por família de modelo: a
+        regressão linear e o Random Forest são multi-saída nativos (as mesmas
+        árvores preveem as três séries, o que mantém as previsões coerentes
+        entre si). Modelos do registro sem saída múltipla (ex: Gradient
+        Boosting) são ajustados por série. As séries são padronizadas antes do ajuste para que
+        o custo, em reais, não domine as divisões das árvores.
+        
+        Retorna (df_month, previsões por modelo em DataFrame, datas futuras,
+        R² de cada série por modelo).
+        """
+        df_month = self.prepare_temporal_data()
+        targets = [col for col in JOINT_TARGETS if col in df_month]
+        
+        X = df_month[['Mes_Num']].values
+        Y = df_month[targets].to_numpy(dtype=float)
+        scale = Y.std(axis=0)
+        scale[scale == 0] = 1.0
+        if self.forecaster is not None:
+            # Mesma escala a cada atualização: os meses já ajustados não mudam
+            scale_key = 'Conjunta' if self.granularity == DEFAULT_GRANULARITY \
+                else (self.granularity, 'Conjunta')
+            scale = self.forecaster.target_scale((scale_key, tuple(targets)), scale)
+        
+        fitted = self._run_models('Conjunta', models, X, Y / scale, df_month, multi_output=True)
+        
+        future_months = np.arange(len(df_month), len(df_month) + months).reshape(-1, 1)
+        future_dates = self._future_dates(df_month, months)
+        
+        predictions = {}
+        scores = {}
+        for name, model in fitted.items():
+            in_sample = model.predict(X) * scale
+            scores[name] = {target: r2_score(Y[:, i], in_sample[:, i])
+                            for i, target in enumerate(targets)}
+            predictions[name] = pd.DataFrame(model.predict(future_months) * scale,
+                                             index=future_dates, columns=targets)
+            self.models[name] = model
+        
+        return df_month, predictions, future_dates, scores
+    
+    @instrumented()
     def prophet_forecast(self, periods=6):
         """Previsão usando Prophet (Facebook)"""
         df_month = self.prepare_temporal_data()
@@ -142,18 +495,19 @@ class MLPredictor:
         # Treina modelo
         model = Prophet(
             yearly_seasonality=True,
-            weekly_seasonality=False,
+            weekly_seasonality=self.granularity == 'dia',
             daily_seasonality=False,
             changepoint_prior_scale=0.05
         )
         model.fit(df_prophet)
         
         # Faz previsão
-        future = model.make_future_dataframe(periods=periods, freq='M')
+        future = model.make_future_dataframe(periods=periods, freq=FREQUENCIES[self.granularity])
         forecast = model.predict(future)
         
         return forecast, model
     
+    @instrumented()
     def identify_anomalies(self):
         """Identifica anomalias nos dados"""
         df_month = self.prepare_temporal_data()
@@ -170,19 +524,29 @@ class MLPredictor:
         
         return df_month, anomalies
     
+    @instrumented()
     def predict_maintenance_demand(self):
-        """Prevê demanda de manutenção por máquina"""
+        """Prevê demanda de manutenção por máquina
+
+        A criticidade vem da pontuação com decaimento no tempo (frequência,
+        custo, tendência e diversidade de peças); agregados antigos, sem o
+        estado com decaimento, usam o número total de solicitações.
+        """
         # Análise por máquina
-        df_machine = self.df.groupby('2- Máquina de destino:').agg({
-            '2- Máquina de destino:': 'count',
-            'Total': ['sum', 'mean']
-        })
-        df_machine.columns = ['Solicitacoes', 'Custo_Total', 'Custo_Medio']
-        df_machine = df_machine.sort_values('Solicitacoes', ascending=False)
+        df_machine = self.aggregates['maquina'][['Solicitacoes', 'Custo_Total']].copy()
+        df_machine['Custo_Medio'] = df_machine['Custo_Total'] / df_machine['Solicitacoes']
+        
+        if 'criticidade' in self.aggregates:
+            df_machine = df_machine.join(criticality_scores(self.aggregates), how='left')
+            ranking = df_machine['Pontuacao'].fillna(0)
+        else:
+            ranking = df_machine['Solicitacoes']
+        df_machine = df_machine.loc[ranking.sort_values(ascending=False, kind='stable').index]
+        ranking = ranking.loc[df_machine.index]
         
         # Classifica criticidade
-        q75 = df_machine['Solicitacoes'].quantile(0.75)
-        q50 = df_machine['Solicitacoes'].quantile(0.50)
+        q75 = ranking.quantile(0.75)
+        q50 = ranking.quantile(0.50)
         
         def classify_criticality(value):
             if value >= q75:
@@ -192,28 +556,26 @@ class MLPredictor:
             else:
                 return 'Baixa'
         
-        df_machine['Criticidade'] = df_machine['Solicitacoes'].apply(classify_criticality)
+        df_machine['Criticidade'] = ranking.apply(classify_criticality)
         
         return df_machine
     
+    @instrumented()
     def predict_part_demand(self):
         """Prevê demanda futura de peças"""
         # Análise de peças
-        df_parts = self.df.groupby('6- Descrição da peça: ').agg({
-            '7- Quantidade de peças.': 'sum',
-            '6- Descrição da peça: ': 'count'
-        })
-        df_parts.columns = ['Qtd_Total', 'Freq_Solicitacao']
+        df_parts = self.aggregates['peca'][['Qtd_Total', 'Freq_Solicitacao']].copy()
         df_parts = df_parts.sort_values('Qtd_Total', ascending=False)
         
         # Calcula taxa de consumo médio mensal
-        num_months = len(self.df['Mês/Ano'].unique())
+        num_months = len(self.aggregates['mensal'])
         df_parts['Taxa_Mensal'] = df_parts['Qtd_Total'] / num_months
         df_parts['Previsao_3_Meses'] = df_parts['Taxa_Mensal'] * 3
         df_parts['Previsao_6_Meses'] = df_parts['Taxa_Mensal'] * 6
         
         return df_parts
     
+    @instrumented()
     def calculate_trend(self):
         """Calcula tendência geral"""
         df_month = self.prepare_temporal_data()
@@ -229,10 +591,10 @@ class MLPredictor:
         
         if slope > 0:
             trend = "Crescente"
-            interpretation = f"Aumento médio de {abs(slope):.1f} solicitações por mês"
+            interpretation = f"Aumento médio de {abs(slope):.1f} solicitações por {self.period_name}"
         elif slope < 0:
             trend = "Decrescente"
-            interpretation = f"Redução média de {abs(slope):.1f} solicitações por mês"
+            interpretation = f"Redução média de {abs(slope):.1f} solicitações por {self.period_name}"
         else:
             trend = "Estável"
             interpretation = "Sem variação significativa"
@@ -240,25 +602,59 @@ class MLPredictor:
         return trend, interpretation, slope
 
 
-def create_prediction_charts(df_month, predictions, future_dates, scores):
+def forecast_name(kind, months, models=None, granularity=DEFAULT_GRANULARITY):
+    """Nome de uma previsão no cache (tipo, horizonte, resolução e modelos escolhidos)"""
+    parts = [kind, str(months)]
+    if granularity != DEFAULT_GRANULARITY:
+        parts.append(granularity)
+    return '_'.join(parts + (['_'.join(models)] if models else []))
+
+
+def cost_model_name(predictions, scores):
+    """Modelo das previsões de custo e peças: o Gradient Boosting ou, sem ele, o de maior R²"""
+    return 'Gradient Boosting' if 'Gradient Boosting' in predictions else max(scores, key=scores.get)
+
+
+def split_joint_forecast(result):
+    """Separa a previsão conjunta nas séries exibidas
+
+    Retorna (df_month, previsões de solicitações por modelo, datas, R² por
+    modelo, custos previstos, peças previstas ou None).
+    """
+    df_month, joint_predictions, future_dates, joint_scores = result
+    predictions = {name: pred['Quantidade'].to_numpy() for name, pred in joint_predictions.items()}
+    scores = {name: score['Quantidade'] for name, score in joint_scores.items()}
+    cost_model = joint_predictions[cost_model_name(joint_predictions, scores)]
+    pred_parts = cost_model['Qtd_Pecas'].to_numpy() if 'Qtd_Pecas' in cost_model else None
+    return df_month, predictions, future_dates, scores, cost_model['Total'].to_numpy(), pred_parts
+
+
+def _horizon_label(future_dates, granularity):
+    """'6 Meses', '26 Semanas'..."""
+    return f"{len(future_dates)} {PERIOD_NAMES[granularity][1].title()}"
+
+
+def create_prediction_charts(df_month, predictions, future_dates, scores,
+                             granularity=DEFAULT_GRANULARITY):
     """Cria gráficos de previsões"""
     
     # Gráfico principal com múltiplas previsões
     fig = go.Figure()
     
-    # Dados históricos
-    fig.add_trace(go.Scatter(
-        x=df_month['Data'],
-        y=df_month['Quantidade'],
-        mode='lines+markers',
+    # Dados históricos (reduzidos com LTTB quando a série é longa)
+    history = downsample_frame(df_month, 'Quantidade', x='Data')
+    fig.add_trace(scatter_trace(
+        len(history),
+        x=history['Data'],
+        y=history['Quantidade'],
+        mode='lines+markers' if len(history) <= WEBGL_THRESHOLD else 'lines',
         name='Histórico',
         line=dict(color='#667eea', width=3),
         marker=dict(size=8)
     ))
     
     # Previsões de cada modelo
-    colors = {'Linear Regression': '#ff6b6b', 'Random Forest': '#4ecdc4', 
-              'Gradient Boosting': '#f7b731'}
+    colors = model_colors(predictions)
     
     for name, pred in predictions.items():
         fig.add_trace(go.Scatter(
@@ -271,7 +667,7 @@ def create_prediction_charts(df_month, predictions, future_dates, scores):
         ))
     
     fig.update_layout(
-        title='Previsão de Solicitações - Próximos 6 Meses',
+        title=f'Previsão de Solicitações - Próximos {_horizon_label(future_dates, granularity)}',
         xaxis_title='Data',
         yaxis_title='Quantidade de Solicitações',
         hovermode='x unified',
@@ -282,14 +678,15 @@ def create_prediction_charts(df_month, predictions, future_dates, scores):
     return fig
 
 
-def create_cost_prediction_chart(df_month, pred_costs, future_dates):
+def create_cost_prediction_chart(df_month, pred_costs, future_dates, granularity=DEFAULT_GRANULARITY):
     """Cria gráfico de previsão de custos"""
     fig = go.Figure()
     
-    # Histórico
+    # Histórico (períodos vizinhos somados quando há barras demais)
+    history = aggregate_buckets(df_month.set_index('Data')[['Total']]).reset_index()
     fig.add_trace(go.Bar(
-        x=df_month['Data'],
-        y=df_month['Total'],
+        x=history['Data'],
+        y=history['Total'],
         name='Custo Histórico',
         marker_color='#667eea'
     ))
@@ -304,7 +701,7 @@ def create_cost_prediction_chart(df_month, pred_costs, future_dates):
     ))
     
     fig.update_layout(
-        title='Previsão de Custos - Próximos 6 Meses',
+        title=f'Previsão de Custos - Próximos {_horizon_label(future_dates, granularity)}',
         xaxis_title='Data',
         yaxis_title='Custo Total (R$)',
         height=500,
@@ -318,12 +715,13 @@ def create_anomaly_chart(df_month, anomalies):
     """Cria gráfico de detecção de anomalias"""
     fig = go.Figure()
     
-    # Dados normais
-    normal_data = df_month[~df_month['Is_Anomaly']]
-    fig.add_trace(go.Scatter(
+    # Dados normais (as anomalias sempre aparecem no traço próprio)
+    normal_data = downsample_frame(df_month[~df_month['Is_Anomaly']], 'Quantidade', x='Data')
+    fig.add_trace(scatter_trace(
+        len(normal_data),
         x=normal_data['Data'],
         y=normal_data['Quantidade'],
-        mode='lines+markers',
+        mode='lines+markers' if len(normal_data) <= WEBGL_THRESHOLD else 'lines',
         name='Normal',
         line=dict(color='#4ecdc4', width=2),
         marker=dict(size=8)
@@ -331,7 +729,8 @@ def create_anomaly_chart(df_month, anomalies):
     
     # Anomalias
     if len(anomalies) > 0:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter_trace(
+            len(anomalies),
             x=anomalies['Data'],
             y=anomalies['Quantidade'],
             mode='markers',
@@ -353,18 +752,27 @@ def create_criticality_chart(df_machine):
     """Cria gráfico de criticidade de máquinas"""
     criticality_colors = {'Alta': '#ff6b6b', 'Média': '#f7b731', 'Baixa': '#4ecdc4'}
     
+    top_machines = df_machine.reset_index().head(30)
+    if 'Pontuacao' in top_machines:
+        # Critérios com decaimento: pesos maiores para os meses recentes
+        axes = dict(x='Freq_Mensal', y='Custo_Mensal', size='Pontuacao',
+                    hover_data=['2- Máquina de destino:', 'Tendencia', 'Diversidade_Pecas'],
+                    labels={'Freq_Mensal': 'Solicitações por Mês (recentes pesam mais)',
+                            'Custo_Mensal': 'Custo por Mês (R$)',
+                            'Pontuacao': 'Pontuação'})
+    else:
+        axes = dict(x='Solicitacoes', y='Custo_Total', size='Custo_Medio',
+                    hover_data=['2- Máquina de destino:'],
+                    labels={'Solicitacoes': 'Número de Solicitações',
+                            'Custo_Total': 'Custo Total (R$)'})
     fig = px.scatter(
-        df_machine.reset_index().head(30),
-        x='Solicitacoes',
-        y='Custo_Total',
-        size='Custo_Medio',
+        top_machines,
         color='Criticidade',
-        hover_data=['2- Máquina de destino:'],
         title='Análise de Criticidade das Máquinas',
-        labels={'Solicitacoes': 'Número de Solicitações', 
-                'Custo_Total': 'Custo Total (R$)'},
         color_discrete_map=criticality_colors,
-        height=500
+        render_mode=render_mode(len(top_machines)),
+        height=500,
+        **axes
     )
     
     return fig
\ No newline at end of file
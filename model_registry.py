@@ -0,0 +1,325 @@
+"""
+Registro dos modelos de previsão
+Dashboard de Análise de Peças
+
+Cada modelo é registrado com uma fábrica, uma cor para os gráficos e
+metadados de custo: orçamento de tempo do ajuste, tamanho máximo de série e,
+para os ensembles, o custo estimado de cada árvore/estágio. Acima do tamanho
+máximo o modelo é reduzido (ex: menos árvores) ou, se não houver versão
+reduzida, ignorado. O executor ajusta os modelos em paralelo e informa o que
+rodou e quanto tempo levou.
+
+O orçamento é garantido antes do ajuste: o número de árvores/estágios é
+limitado ao que cabe no orçamento pelo custo estimado (corrigido pelos tempos
+observados neste processo). Um ajuste em thread não pode ser interrompido;
+se mesmo assim estourar, ele é descartado e termina em segundo plano, e o
+modelo é ignorado nas execuções seguintes até esse ajuste terminar, para que
+ajustes atrasados não se acumulem.
+
+Para acrescentar um modelo basta chamar `register_model` com uma fábrica que
+devolva um regressor no padrão scikit-learn (fit/predict).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import cycle
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.linear_model import LinearRegression
+from sklearn.multioutput import MultiOutputRegressor
+
+from resampling import DEFAULT_GRANULARITY, SEASON_LENGTHS, period_offset
+
+COST_LOW = 'baixo'
+COST_MEDIUM = 'médio'
+COST_HIGH = 'alto'
+
+STATUS_OK = 'ok'
+STATUS_DOWNSCALED = 'reduzido'
+STATUS_SKIPPED = 'ignorado'
+STATUS_TIMEOUT = 'tempo esgotado'
+STATUS_BUSY = 'ajuste anterior em andamento'
+STATUS_ERROR = 'erro'
+
+# Fração do orçamento usada no limite de árvores/estágios (folga para a concorrência)
+BUDGET_SAFETY = 0.5
+MIN_CAPPED_ESTIMATORS = 10
+# Peso de cada novo tempo observado na correção das estimativas de custo
+SLOWDOWN_SMOOTHING = 0.3
+
+# Cores dos modelos sem cor registrada
+FALLBACK_COLORS = ['#a55eea', '#fd9644', '#26de81', '#2d98da', '#eb3b5a', '#778ca3']
+
+
+@dataclass
+class ForecastModel:
+    """Modelo registrado e seus metadados de custo"""
+    name: str
+    # fabrica(preditor, série, df_month) -> regressor com fit(X, y) e predict(X)
+    factory: Callable
+    color: Optional[str] = None
+    cost: str = COST_LOW
+    # Orçamento de tempo do ajuste (segundos)
+    budget: float = 30.0
+    # Pontos da série acima dos quais o modelo é reduzido ou ignorado
+    max_points: Optional[int] = None
+    # Recebe o regressor e devolve uma versão mais barata (None = ignorar)
+    downscale: Optional[Callable] = None
+    # Segundos por árvore/estágio: (fixo, por ponto da série); limita o ensemble ao orçamento
+    estimator_cost: Optional[tuple] = None
+    # Prevê várias séries num único ajuste
+    multi_output: bool = False
+    # Usado quando nenhuma lista de modelos é informada
+    default: bool = True
+
+
+_REGISTRY = {}
+
+
+def register_model(name, factory, **metadata):
+    """Registra (ou substitui) um modelo de previsão"""
+    _REGISTRY[name] = ForecastModel(name, factory, **metadata)
+    return _REGISTRY[name]
+
+
+def registered_models():
+    return list(_REGISTRY.values())
+
+
+def default_model_names():
+    return [model.name for model in _REGISTRY.values() if model.default]
+
+
+def get_model(name):
+    return _REGISTRY[name]
+
+
+def model_colors(names):
+    """Cor de cada modelo (as não registradas vêm de uma paleta fixa)"""
+    fallback = cycle(FALLBACK_COLORS)
+    return {name: (_REGISTRY[name].color if name in _REGISTRY and _REGISTRY[name].color
+                   else next(fallback))
+            for name in names}
+
+
+class MovingAverageRegressor(BaseEstimator, RegressorMixin):
+    """Referência: média dos últimos `window` pontos, repetida no futuro"""
+
+    def __init__(self, window=3):
+        self.window = window
+
+    def fit(self, X, y):
+        y = np.asarray(y, dtype=float)
+        self.level_ = y[-self.window:].mean(axis=0)
+        self.fitted_ = pd.DataFrame(y).rolling(self.window, min_periods=1).mean() \
+            .shift(1).bfill().to_numpy().reshape(y.shape)
+        self.n_train_ = len(y)
+        return self
+
+    def predict(self, X):
+        # Pontos do treino recebem a média móvel anterior; os futuros, o último nível
+        X = np.asarray(X).ravel()
+        inside = X < self.n_train_
+        result = np.empty((len(X),) + np.shape(self.level_))
+        result[inside] = self.fitted_[X[inside].astype(int)]
+        result[~inside] = self.level_
+        return result
+
+
+class SeasonalNaiveRegressor(BaseEstimator, RegressorMixin):
+    """Referência: valor do mesmo período `season` pontos antes"""
+
+    def __init__(self, season=12):
+        self.season = season
+
+    def fit(self, X, y):
+        self.y_ = np.asarray(y, dtype=float)
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X).ravel().astype(int)
+        n = len(self.y_)
+        season = min(self.season, n)
+        # Futuro: repete o último ciclo; treino: ponto um ciclo antes (ou o primeiro)
+        source = np.where(X < n, np.maximum(X - season, 0), n - season + (X - n) % season)
+        return self.y_[source]
+
+
+class ProphetRegressor(BaseEstimator, RegressorMixin):
+    """Adaptador do Prophet para a interface fit/predict (X = número do período)"""
+
+    def __init__(self, start=None, changepoint_prior_scale=0.05, granularity=DEFAULT_GRANULARITY):
+        self.start = start
+        self.changepoint_prior_scale = changepoint_prior_scale
+        self.granularity = granularity
+
+    def _dates(self, X):
+        periods = np.asarray(X).ravel().astype(int)
+        return pd.DatetimeIndex([pd.Timestamp(self.start) + period_offset(int(n), self.granularity)
+                                 for n in periods])
+
+    def fit(self, X, y):
+        from prophet import Prophet
+        self.model_ = Prophet(yearly_seasonality=True,
+                              weekly_seasonality=self.granularity == 'dia',
+                              daily_seasonality=False,
+                              changepoint_prior_scale=self.changepoint_prior_scale)
+        self.model_.fit(pd.DataFrame({'ds': self._dates(X), 'y': np.asarray(y, dtype=float)}))
+        return self
+
+    def predict(self, X):
+        forecast = self.model_.predict(pd.DataFrame({'ds': self._dates(X)}))
+        return forecast['yhat'].to_numpy()
+
+
+def _estimators_param(model):
+    """Parâmetro com o número de árvores/estágios (None se não for um ensemble)"""
+    params = model.get_params()
+    for key in ('estimator__n_estimators', 'n_estimators'):
+        if key in params:
+            return key
+    return None
+
+
+def _fewer_estimators(model, n_estimators=30):
+    """Versão reduzida de um ensemble (ou do ensemble dentro de um MultiOutputRegressor)"""
+    key = _estimators_param(model)
+    return model.set_params(**{key: min(model.get_params()[key], n_estimators)})
+
+
+register_model('Linear Regression', lambda predictor, target, df_month: LinearRegression(),
+               color='#ff6b6b', cost=COST_LOW, budget=10.0, multi_output=True)
+register_model('Random Forest',
+               lambda predictor, target, df_month: predictor._make_model(target, 'Random Forest'),
+               color='#4ecdc4', cost=COST_MEDIUM, budget=30.0, max_points=2000,
+               downscale=_fewer_estimators, estimator_cost=(1.2e-3, 4e-6), multi_output=True)
+register_model('Gradient Boosting',
+               lambda predictor, target, df_month: predictor._make_model(target, 'Gradient Boosting'),
+               color='#f7b731', cost=COST_MEDIUM, budget=30.0, max_points=2000,
+               downscale=_fewer_estimators, estimator_cost=(5e-4, 1.2e-6))
+register_model('Média Móvel (3)', lambda predictor, target, df_month: MovingAverageRegressor(3),
+               color='#a5b1c2', cost=COST_LOW, budget=5.0, multi_output=True, default=False)
+register_model('Sazonal Ingênuo',
+               lambda predictor, target, df_month:
+               SeasonalNaiveRegressor(SEASON_LENGTHS[predictor.granularity]),
+               color='#8854d0', cost=COST_LOW, budget=5.0, multi_output=True, default=False)
+register_model('Prophet',
+               lambda predictor, target, df_month: ProphetRegressor(
+                   start=df_month['Data'].min(), granularity=predictor.granularity),
+               color='#0668e1', cost=COST_HIGH, budget=60.0, max_points=1000, default=False)
+
+
+# Ajustes que estouraram o orçamento e ainda rodam, por modelo
+_overrunning = {}
+# Tempo observado / estimado de cada modelo neste processo
+_slowdown = {}
+_runs_lock = threading.Lock()
+
+
+def _timed(fit, name, model):
+    start = time.monotonic()
+    fitted = fit(name, model)
+    return fitted, time.monotonic() - start
+
+
+def _base_seconds(spec, model, n_points, n_outputs):
+    """Tempo do ajuste pelo custo registrado por árvore/estágio (None sem estimativa)"""
+    key = _estimators_param(model)
+    if spec.estimator_cost is None or key is None:
+        return None
+    fixed, per_point = spec.estimator_cost
+    # MultiOutputRegressor ajusta um ensemble por série
+    n_series = n_outputs if isinstance(model, MultiOutputRegressor) else 1
+    return model.get_params()[key] * (fixed + per_point * n_points) * n_series
+
+
+def _fit_budget(spec, model, n_points, n_outputs):
+    """Limita as árvores/estágios ao orçamento: (regressor, reduzido?)"""
+    estimate = _base_seconds(spec, model, n_points, n_outputs)
+    if estimate is None:
+        return model, False
+    with _runs_lock:
+        # Só corrige para cima: ajustes incrementais (warm start) saem mais baratos
+        estimate *= max(_slowdown.get(spec.name, 1.0), 1.0)
+    if estimate <= BUDGET_SAFETY * spec.budget:
+        return model, False
+    n_estimators = model.get_params()[_estimators_param(model)]
+    allowed = int(n_estimators * BUDGET_SAFETY * spec.budget / estimate)
+    return _fewer_estimators(model, max(allowed, MIN_CAPPED_ESTIMATORS)), True
+
+
+def _observe(spec, model, n_points, n_outputs, seconds):
+    """Corrige a estimativa de custo do modelo pelo tempo observado"""
+    estimate = _base_seconds(spec, model, n_points, n_outputs)
+    if not estimate:
+        return
+    with _runs_lock:
+        _slowdown[spec.name] = ((1 - SLOWDOWN_SMOOTHING) * _slowdown.get(spec.name, 1.0)
+                                + SLOWDOWN_SMOOTHING * seconds / estimate)
+
+
+def run_models(models, fit, n_points, n_outputs=1):
+    """Ajusta os modelos em paralelo respeitando o orçamento de cada um
+
+    `models` é uma lista de (ForecastModel, regressor) e `fit(nome, regressor)`
+    ajusta e devolve o regressor; `n_outputs` é o número de séries ajustadas
+    juntas. Ensembles com custo registrado são reduzidos
+    antes do ajuste ao número de árvores/estágios que cabe no orçamento; um
+    ajuste que ainda assim estoura é descartado (e continua em segundo plano
+    até terminar). Retorna (ajustados por nome, relatório).
+    """
+    fitted = {}
+    report = []
+    tasks = {}
+    executor = ThreadPoolExecutor(max_workers=max(len(models), 1))
+    try:
+        for spec, model in models:
+            status = STATUS_OK
+            with _runs_lock:
+                previous = _overrunning.get(spec.name)
+                if previous is not None and previous.done():
+                    del _overrunning[spec.name]
+                    previous = None
+            if previous is not None:
+                report.append({'modelo': spec.name, 'status': STATUS_BUSY,
+                               'segundos': 0.0, 'custo': spec.cost})
+                continue
+            if spec.max_points is not None and n_points > spec.max_points:
+                if spec.downscale is None:
+                    report.append({'modelo': spec.name, 'status': STATUS_SKIPPED,
+                                   'segundos': 0.0, 'custo': spec.cost})
+                    continue
+                model, status = spec.downscale(model), STATUS_DOWNSCALED
+            model, capped = _fit_budget(spec, model, n_points, n_outputs)
+            if capped:
+                status = STATUS_DOWNSCALED
+            tasks[spec.name] = (spec, model, status, time.monotonic(),
+                                executor.submit(_timed, fit, spec.name, model))
+
+        for name, (spec, model, status, start, future) in tasks.items():
+            remaining = spec.budget - (time.monotonic() - start)
+            wait([future], timeout=max(remaining, 0))
+            seconds = time.monotonic() - start
+            if not future.done():
+                status = STATUS_TIMEOUT
+                with _runs_lock:
+                    _overrunning[name] = future
+            elif future.exception() is not None:
+                status = f'{STATUS_ERROR}: {future.exception()}'
+            else:
+                fitted[name], seconds = future.result()
+                _observe(spec, model, n_points, n_outputs, seconds)
+            report.append({'modelo': name, 'status': status,
+                           'segundos': round(seconds, 3), 'custo': spec.cost})
+    finally:
+        # Ajustes que estouraram o orçamento terminam em segundo plano e são descartados
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    order = [spec.name for spec, _ in models]
+    report.sort(key=lambda row: order.index(row['modelo']))
+    return fitted, report
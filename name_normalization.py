@@ -0,0 +1,305 @@
+"""
+Unificação de variações de nomes de peças e máquinas
+Dashboard de Análise de Peças
+
+Descrições digitadas à mão geram várias chaves para o mesmo item
+("Rolamento 6205", "ROLAMENTO SKF 6205 ", "Rolamento 6205-2RS"), o que divide
+a demanda entre elas. O `NameNormalizer` agrupa as variações:
+
+1. Textos iguais depois de `normalize_text` (maiúsculas, acentos, espaços) são
+   a mesma chave.
+2. Os demais são separados em blocos pela primeira palavra e comparados só
+   dentro do bloco, por similaridade de cosseno de n-gramas de caracteres
+   (TF-IDF), evitando comparar todos com todos.
+3. Dois nomes só se juntam se os códigos (números e letras isoladas: 6205,
+   12 de M12, A) forem compatíveis, para não unir "Rolamento 6205" e
+   "Rolamento 6206" ou "Máquina A" e "Máquina B".
+
+O mapeamento aprendido é salvo em JSON e só cresce: nomes já vistos mantêm o
+nome canônico, e um novo arquivo só compara os nomes inéditos. Ajustes manuais
+(`ajustes`) têm prioridade sobre o mapeamento aprendido.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from columns import COL_MAQUINA, COL_PECA
+from text_ops import map_categories, normalize_text
+
+DEFAULT_NAMES_DIR = os.path.join('data', 'nomes')
+DEFAULT_THRESHOLD = 0.65
+# Células (nomes novos x membros do bloco) da matriz de similaridade calculadas
+# por vez: blocos grandes usam menos linhas por parte (~50 MB por parte)
+SIMILARITY_CELLS = 4_000_000
+
+_TOKENS = re.compile(r'[a-z0-9]+')
+_NUMBERS = re.compile(r'\d+')
+
+# Tabelas de agregados indexadas por cada coluna
+AGGREGATE_TABLES = {COL_PECA: ['peca', 'peca_mensal', 'maquina_peca'],
+                    COL_MAQUINA: ['maquina', 'quantis_maquina', 'criticidade', 'maquina_peca']}
+
+
+def _codes(key):
+    """Códigos do nome: números e letras isoladas ('M12x40' -> 12, 40; 'Máquina A' -> a)"""
+    tokens = _TOKENS.findall(key)
+    return frozenset(_NUMBERS.findall(key)) | frozenset(t for t in tokens if len(t) == 1 and t.isalpha())
+
+
+def _compatible(codes_a, codes_b):
+    """Códigos iguais, ou um conjunto contido no outro (6205 ⊂ 6205 2rs)"""
+    if not codes_a and not codes_b:
+        return True
+    if not codes_a or not codes_b:
+        return False
+    return codes_a <= codes_b or codes_b <= codes_a
+
+
+def _block(key):
+    tokens = _TOKENS.findall(key)
+    return tokens[0] if tokens else ''
+
+
+def _display_name(value):
+    """Nome canônico exibido: o texto original sem espaços extras"""
+    return ' '.join(str(value).split())
+
+
+class NameNormalizer:
+    """Mapeamento incremental de variações para um nome canônico"""
+
+    def __init__(self, path=None, threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.mapping = {}
+        self.overrides = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, threshold=DEFAULT_THRESHOLD):
+        """Carrega o mapeamento salvo (ou começa vazio)"""
+        normalizer = cls(path, threshold)
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            normalizer.threshold = saved.get('limiar', threshold)
+            normalizer.mapping = saved.get('mapeamento', {})
+            normalizer.overrides = saved.get('ajustes', {})
+        return normalizer
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            saved = {'limiar': self.threshold, 'mapeamento': self.mapping,
+                     'ajustes': self.overrides}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def revision(self):
+        """Identifica o estado dos ajustes manuais (para chaves de cache)"""
+        return hash(frozenset(self.overrides.items()))
+
+    def lookup(self, value):
+        """Nome canônico de um valor (ele mesmo se for desconhecido)"""
+        if value in self.overrides:
+            return self.overrides[value]
+        return self.mapping.get(value, value)
+
+    def set_override(self, original, canonical):
+        """Ajuste manual: `original` passa a ser `canonical` (vazio remove o ajuste)"""
+        with self._lock:
+            if canonical:
+                self.overrides[original] = canonical
+            else:
+                self.overrides.pop(original, None)
+
+    def fit(self, counts):
+        """Aprende o nome canônico dos valores ainda não vistos
+
+        `counts` é uma Series com a contagem de cada valor (ex: value_counts);
+        os mais frequentes viram o nome canônico do grupo. Retorna quantos
+        valores novos foram mapeados.
+        """
+        with self._lock:
+            new = counts[~counts.index.isin(list(self.mapping))]
+            new = new[new.index.notna()].sort_values(ascending=False, kind='stable')
+            if new.empty:
+                return 0
+            self.mapping.update(self._cluster(list(new.index)))
+            return len(new)
+
+    def _cluster(self, values):
+        """Mapeamento dos valores novos (já ordenados por frequência)"""
+        keys = [normalize_text(v) for v in values]
+
+        # Nomes canônicos existentes, um por chave normalizada
+        leaders = {}
+        for canonical in set(self.mapping.values()):
+            leaders.setdefault(normalize_text(canonical), canonical)
+
+        result = {}
+        pending = []
+        first_of_key = {}
+        for value, key in zip(values, keys):
+            if key in leaders:
+                result[value] = leaders[key]
+            else:
+                # Variações da mesma chave nova seguem a mais frequente
+                first_of_key.setdefault(key, value)
+                pending.append((value, key))
+
+        new_keys = list(first_of_key)
+        old_keys = list(leaders)
+        canonical_of = dict(leaders)
+        if new_keys:
+            canonical_of.update(self._match(new_keys, old_keys, canonical_of, first_of_key))
+
+        for value, key in pending:
+            result[value] = canonical_of[key]
+        return result
+
+    def _match(self, new_keys, old_keys, canonical_of, first_of_key):
+        """Compara as chaves novas com os líderes do mesmo bloco"""
+        all_keys = old_keys + new_keys
+        vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 3))
+        vectors = vectorizer.fit_transform(all_keys)
+        codes = [_codes(k) for k in all_keys]
+
+        blocks = defaultdict(list)
+        for i, key in enumerate(all_keys):
+            blocks[_block(key)].append(i)
+
+        n_old = len(old_keys)
+        matched = {}
+        for members in blocks.values():
+            new_members = [i for i in members if i >= n_old]
+            if not new_members:
+                continue
+            # Líderes do bloco: os existentes e os novos que não se juntaram a ninguém
+            is_leader = np.array([i < n_old for i in members])
+            position = {i: p for p, i in enumerate(members)}
+            member_vectors = vectors[members].T.tocsc()
+            chunk_size = max(1, SIMILARITY_CELLS // len(members))
+            for start in range(0, len(new_members), chunk_size):
+                chunk = new_members[start:start + chunk_size]
+                # Matriz esparsa; só os pares acima do limiar são percorridos
+                similarity = (vectors[chunk] @ member_vectors).tocsr()
+                similarity.data[similarity.data < self.threshold] = 0
+                similarity.eliminate_zeros()
+                similarity.sort_indices()
+                for row, i in enumerate(chunk):
+                    row_slice = slice(similarity.indptr[row], similarity.indptr[row + 1])
+                    positions = similarity.indices[row_slice]
+                    scores = similarity.data[row_slice]
+                    leaders = is_leader[positions]
+                    positions, scores = positions[leaders], scores[leaders]
+                    best = None
+                    # O líder mais parecido com códigos compatíveis
+                    for p in positions[np.argsort(-scores, kind='stable')]:
+                        if _compatible(codes[i], codes[members[p]]):
+                            best = members[p]
+                            break
+                    key = all_keys[i]
+                    if best is None:
+                        is_leader[position[i]] = True
+                        matched[key] = _display_name(first_of_key[key])
+                    else:
+                        best_key = all_keys[best]
+                        matched[key] = canonical_of[best_key] if best < n_old else matched[best_key]
+        return matched
+
+    def transform(self, series):
+        """Coluna com os nomes canônicos (uma consulta por valor distinto)"""
+        return map_categories(series, self.lookup)
+
+    def transform_index(self, index):
+        return pd.Index([self.lookup(v) for v in index], name=index.name)
+
+    def variants(self):
+        """Tabela dos nomes canônicos com mais de uma variação"""
+        groups = defaultdict(list)
+        for value in self.mapping:
+            groups[self.lookup(value)].append(value)
+        for value, canonical in self.overrides.items():
+            if value not in self.mapping:
+                groups[canonical].append(value)
+        rows = [{'Nome canônico': canonical, 'Variações': len(values),
+                 'Exemplos': ' | '.join(sorted(values)[:5])}
+                for canonical, values in groups.items() if len(values) > 1]
+        table = pd.DataFrame(rows, columns=['Nome canônico', 'Variações', 'Exemplos'])
+        return table.sort_values('Variações', ascending=False).reset_index(drop=True)
+
+
+def load_normalizers(directory=DEFAULT_NAMES_DIR):
+    """Normalizadores de peças e máquinas salvos no diretório"""
+    return {
+        COL_PECA: NameNormalizer.load(os.path.join(directory, 'pecas.json')),
+        COL_MAQUINA: NameNormalizer.load(os.path.join(directory, 'maquinas.json')),
+    }
+
+
+_shared_normalizers = None
+_shared_lock = threading.Lock()
+
+
+def shared_normalizers():
+    """Normalizadores únicos do processo (sessões e pré-carga aprendem no mesmo mapeamento)"""
+    global _shared_normalizers
+    with _shared_lock:
+        if _shared_normalizers is None:
+            _shared_normalizers = load_normalizers()
+        return _shared_normalizers
+
+
+def canonicalize_aggregates(aggregates, normalizers):
+    """Agregados com as linhas das variações somadas no nome canônico"""
+    result = dict(aggregates)
+    for column, normalizer in normalizers.items():
+        for name in AGGREGATE_TABLES.get(column, []):
+            if name not in result:
+                continue
+            table = result[name]
+            if isinstance(table.index, pd.MultiIndex):
+                # Ex: quantis por (máquina, balde), peças por (máquina, peça): troca só
+                # o nível da coluna (o primeiro, se os níveis não tiverem nome)
+                names = list(table.index.names)
+                level = names.index(column) if column in names else 0
+                keys = [normalizer.transform_index(table.index.get_level_values(i)) if i == level
+                        else table.index.get_level_values(i) for i in range(len(names))]
+            else:
+                keys = normalizer.transform_index(table.index)
+            result[name] = table.groupby(keys).sum()
+    return result
+
+
+def normalize_names(df, normalizers, aggregates=None):
+    """Aprende as variações novas e devolve (df, agregados) com os nomes canônicos
+
+    O DataFrame original não é alterado: as colunas normalizadas entram numa
+    cópia rasa.
+    """
+    columns = {}
+    for column, normalizer in normalizers.items():
+        if column not in df.columns:
+            continue
+        if normalizer.fit(df[column].value_counts()):
+            normalizer.save()
+        columns[column] = normalizer.transform(df[column])
+    df = df.assign(**columns)
+    if aggregates is not None:
+        aggregates = canonicalize_aggregates(aggregates, normalizers)
+    return df, aggregates
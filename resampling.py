@@ -0,0 +1,197 @@
+"""
+Séries temporais por dia, semana ou mês
+Dashboard de Análise de Peças
+
+Com a coluna de data, os agregados guardam a tabela 'diario' (totais por
+dia, indexada pelo número do dia desde 1970-01-01). `TimeIndex` ordena esses
+números uma única vez e monta qualquer resolução a partir deles, sem voltar
+às linhas: cada semana ou mês é um trecho contíguo do índice ordenado, então
+`np.add.reduceat` soma todos os trechos de uma vez. Sem a coluna de data, o
+índice é o próprio 'Mês/Ano' (número do mês) e só a série mensal existe.
+
+Linhas sem data válida entram no 1º dia do seu 'Mês/Ano', então a série
+mensal montada pelos dias tem os mesmos totais que a do 'Mês/Ano'.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from columns import COL_DATA, COL_MES, COL_QTD, COL_TOTAL
+from data_quality import parse_dates, parse_months
+
+GRANULARITIES = {'dia': 'Diária', 'semana': 'Semanal', 'mes': 'Mensal'}
+DEFAULT_GRANULARITY = 'mes'
+# Nome de um período (singular, plural) nos textos
+PERIOD_NAMES = {'dia': ('dia', 'dias'), 'semana': ('semana', 'semanas'), 'mes': ('mês', 'meses')}
+# Períodos por ciclo sazonal (semana, ano, ano)
+SEASON_LENGTHS = {'dia': 7, 'semana': 52, 'mes': 12}
+# Períodos por mês, para converter o horizonte de previsão (dado em meses)
+PERIODS_PER_MONTH = {'dia': 365.25 / 12, 'semana': 365.25 / 12 / 7, 'mes': 1}
+# Nome do índice das séries (a mensal mantém o nome da coluna 'Mês/Ano')
+INDEX_NAMES = {'dia': 'Dia', 'semana': 'Semana', 'mes': COL_MES}
+# Frequência do pandas de cada resolução (Prophet)
+FREQUENCIES = {'dia': 'D', 'semana': 'W-MON', 'mes': 'M'}
+# 1970-01-05 (dia 4) foi uma segunda-feira: as semanas começam na segunda
+_FIRST_MONDAY = 4
+
+SERIES_COLUMNS = ['Quantidade', 'Total', 'Qtd_Pecas']
+
+
+def day_numbers(dates):
+    """Número do dia desde 1970-01-01 de cada data (datas válidas)"""
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64)
+
+
+def daily_table(df):
+    """Totais por dia (agregado aditivo 'diario'); índice = número do dia"""
+    dates = parse_dates(df[COL_DATA])
+    missing = dates.isna()
+    if missing.any():
+        dates = dates.where(~missing, parse_months(df[COL_MES]))
+    valid = ~dates.isna()
+    rows = df[valid] if not valid.all() else df
+    days = day_numbers(dates[valid])
+    return rows.groupby(days).agg(
+        Quantidade=(COL_TOTAL, 'size'),
+        Total=(COL_TOTAL, 'sum'),
+        Qtd_Pecas=(COL_QTD, 'sum')
+    ).rename_axis('Dia')
+
+
+def with_daily(aggregates):
+    """Agregados com 'diario'; sem a coluna de data, cada mês entra pelo 1º dia"""
+    if 'diario' in aggregates:
+        return aggregates
+    mensal = aggregates['mensal']
+    dates = parse_months(mensal.index)
+    valid = ~dates.isna()
+    daily = mensal.loc[valid, [col for col in SERIES_COLUMNS if col in mensal]]
+    daily = daily.groupby(day_numbers(dates[valid])).sum().rename_axis('Dia')
+    return {**aggregates, 'diario': daily}
+
+
+def period_labels(dates, granularity=DEFAULT_GRANULARITY):
+    """Rótulos dos períodos ('03-2024', 'Sem 04/03/2024', '05/03/2024')"""
+    dates = pd.DatetimeIndex(dates)
+    if granularity == 'mes':
+        return dates.strftime('%m-%Y')
+    if granularity == 'semana':
+        return dates.strftime('Sem %d/%m/%Y')
+    return dates.strftime('%d/%m/%Y')
+
+
+def period_offset(n, granularity=DEFAULT_GRANULARITY):
+    """Deslocamento de `n` períodos da resolução"""
+    if granularity == 'mes':
+        return pd.DateOffset(months=n)
+    return pd.Timedelta(days=n * (7 if granularity == 'semana' else 1))
+
+
+def future_dates(last_date, periods, granularity=DEFAULT_GRANULARITY):
+    """Início dos `periods` períodos seguintes a `last_date`"""
+    return [pd.Timestamp(last_date) + period_offset(i, granularity)
+            for i in range(1, periods + 1)]
+
+
+def horizon_periods(months, granularity=DEFAULT_GRANULARITY):
+    """Número de períodos que cobre `months` meses"""
+    return max(int(round(months * PERIODS_PER_MONTH[granularity])), 1)
+
+
+def check_granularity(granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Resolução não suportada: {granularity} (use {', '.join(GRANULARITIES)})")
+    return granularity
+
+
+class TimeIndex:
+    """Totais por período num índice de tempo inteiro e ordenado
+
+    A unidade é o dia (dias desde 1970-01-01) quando há a tabela 'diario', ou
+    o mês (ano * 12 + mês - 1) só com 'Mês/Ano'. As séries de cada resolução
+    são calculadas uma vez e reaproveitadas.
+    """
+
+    def __init__(self, codes, values, columns, unit):
+        order = np.argsort(codes, kind='stable')
+        self.codes = np.asarray(codes, dtype=np.int64)[order]
+        self.values = np.asarray(values, dtype='float64').reshape(len(order), -1)[order]
+        self.columns = list(columns)
+        self.unit = unit
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_aggregates(cls, aggregates):
+        daily = aggregates.get('diario')
+        if daily is not None and len(daily):
+            columns = [col for col in SERIES_COLUMNS if col in daily]
+            return cls(daily.index.to_numpy(), daily[columns].to_numpy(), columns, 'dia')
+
+        mensal = aggregates['mensal']
+        columns = [col for col in SERIES_COLUMNS if col in mensal]
+        # Meses inválidos são ignorados
+        dates = parse_months(mensal.index)
+        valid = ~dates.isna()
+        codes = dates.year[valid] * 12 + dates.month[valid] - 1
+        return cls(codes, mensal[columns].to_numpy()[valid], columns, 'mes')
+
+    @property
+    def granularities(self):
+        """Resoluções disponíveis (diária e semanal só com a coluna de data)"""
+        return list(GRANULARITIES) if self.unit == 'dia' else [DEFAULT_GRANULARITY]
+
+    def _buckets(self, granularity):
+        """Número do período de cada posição do índice (não decrescente)"""
+        if self.unit == 'mes' or granularity == 'dia':
+            return self.codes
+        if granularity == 'semana':
+            return (self.codes - _FIRST_MONDAY) // 7
+        return self.codes.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+    def _start_dates(self, granularity, buckets):
+        """Data de início de cada período"""
+        if self.unit == 'mes' or granularity == 'mes':
+            days = buckets.astype('datetime64[M]').astype('datetime64[D]')
+        elif granularity == 'semana':
+            days = (buckets * 7 + _FIRST_MONDAY).astype('datetime64[D]')
+        else:
+            days = buckets.astype('datetime64[D]')
+        return pd.DatetimeIndex(days.astype('datetime64[ns]'))
+
+    def _compute_series(self, granularity):
+        buckets = self._buckets(granularity)
+        if len(buckets) == 0:
+            keys, sums = buckets, self.values
+        else:
+            # Índice ordenado: cada período começa onde o número do período muda
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            sums = np.add.reduceat(self.values, starts, axis=0)
+            keys = buckets[starts]
+            if self.unit == 'dia':
+                # Períodos sem solicitações entram com zero
+                full = np.arange(keys[0], keys[-1] + 1)
+                filled = np.zeros((len(full), sums.shape[1]))
+                filled[keys - keys[0]] = sums
+                keys, sums = full, filled
+
+        dates = self._start_dates(granularity, keys)
+        series = pd.DataFrame(sums, columns=self.columns,
+                              index=pd.Index(period_labels(dates, granularity),
+                                             name=INDEX_NAMES[granularity]))
+        if 'Quantidade' in series:
+            series['Quantidade'] = series['Quantidade'].round().astype('int64')
+        series['Data'] = dates
+        return series
+
+    def series(self, granularity=DEFAULT_GRANULARITY):
+        """Totais por período em ordem cronológica (índice = rótulo, 'Data' = início)"""
+        if check_granularity(granularity) not in self.granularities:
+            raise ValueError(f"Resolução {GRANULARITIES[granularity].lower()} "
+                             "requer a coluna de data")
+        with self._lock:
+            if granularity not in self._series:
+                self._series[granularity] = self._compute_series(granularity)
+            return self._series[granularity]
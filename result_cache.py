@@ -0,0 +1,199 @@
+"""
+Cache de resultados compartilhado entre threads
+Dashboard de Análise de Peças
+
+Os resultados são indexados por uma chave que inclui a versão do conjunto de
+dados. Pedidos simultâneos para a mesma chave são agrupados (single-flight):
+apenas o primeiro calcula o resultado e os demais esperam por ele, evitando
+ajustes de modelo duplicados.
+
+Opcionalmente o cache respeita um orçamento de memória (`max_bytes`): o tamanho
+de cada entrada é estimado na inserção e as menos usadas recentemente são
+descartadas até o total caber no orçamento.
+
+O cache compartilhado do processo (`shared_cache`) é único: as sessões do
+Streamlit e a pré-carga em segundo plano (`warm_boot`) usam as mesmas entradas.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Orçamento de memória do cache compartilhado entre sessões (MB)
+SHARED_CACHE_MB = int(os.environ.get('DASHBOARD_CACHE_MB', '1024'))
+SHARED_CACHE_ENTRIES = 512
+
+
+def content_hash(data):
+    """Chave de conteúdo para bytes (ex: arquivo enviado): o mesmo arquivo gera a mesma chave"""
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def estimate_size(value, _seen=None):
+    """Estimativa do tamanho em bytes de um resultado (tabelas, arrays, objetos)"""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v, seen) for v in value)
+    if hasattr(value, '__dict__'):
+        # Objetos (ex: MLPredictor, modelos ajustados): soma dos atributos
+        return sys.getsizeof(value) + estimate_size(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+class _Flight:
+    """Cálculo em andamento para uma chave"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """Cache LRU thread-safe com agrupamento de cálculos simultâneos"""
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return default
+
+    def put(self, key, value, size=None):
+        if size is None and self.max_bytes is not None:
+            size = estimate_size(value)
+        size = size or 0
+        with self._lock:
+            self._discard(key)
+            # Um resultado maior que o orçamento inteiro não é guardado
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self.total_bytes -= self._sizes.pop(key)
+
+    def get_or_compute(self, key, compute, size=None):
+        """Retorna o valor da chave, calculando-o uma única vez mesmo sob concorrência"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self.put(key, flight.value, size)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def invalidate(self, match):
+        """Remove as entradas cuja chave satisfaz `match` (ex: versão antiga dos dados)"""
+        with self._lock:
+            for key in [k for k in self._entries if match(k)]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entries),
+                'acertos': self.hits,
+                'calculos': self.misses,
+                'agrupados': self.coalesced,
+                'descartes': self.evictions,
+                'memoria_mb': round(self.total_bytes / (1024 * 1024), 2),
+            }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """Cache único do processo, criado no primeiro uso"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache(max_entries=SHARED_CACHE_ENTRIES,
+                                        max_bytes=SHARED_CACHE_MB * 1024 * 1024)
+        return _shared_cache
+
+
+def result_key(dataset_key, name):
+    """Chave de um resultado de análise do conjunto de dados"""
+    return ('resultado', dataset_key, name)
+
+
+def chart_key(dataset_key, name, options=()):
+    """Chave de um gráfico pronto (dados + opções que o alteram)"""
+    return ('grafico', dataset_key, name, options)
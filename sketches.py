@@ -0,0 +1,74 @@
+"""
+Resumos aproximados e combináveis (sketches)
+Dashboard de Análise de Peças
+
+Quantis por grupo no estilo DDSketch, com memória limitada e que podem ser
+calculados por arquivo ou por bloco e depois combinados: cada valor cai em um
+balde logarítmico (erro relativo de `QUANTILE_ACCURACY`) e o resumo guarda
+apenas a contagem de cada (grupo, balde). Combinar = somar as contagens, como
+os demais agregados aditivos.
+
+Contagens de distintos não precisam de resumo: as tabelas 'maquina', 'peca' e
+'solicitante' já têm uma linha por valor, e o tamanho delas é exato.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Erro relativo dos quantis (1%)
+QUANTILE_ACCURACY = 0.01
+_GAMMA = (1 + QUANTILE_ACCURACY) / (1 - QUANTILE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+# Balde dos valores zero ou negativos (tratados como 0)
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def quantile_buckets(values):
+    """Balde logarítmico de cada valor"""
+    values = np.asarray(values, dtype='float64')
+    positive = values > 0
+    buckets = np.full(len(values), ZERO_BUCKET, dtype='int64')
+    buckets[positive] = np.ceil(np.log(values[positive]) / _LOG_GAMMA).astype('int64')
+    return buckets
+
+
+def _bucket_value(buckets):
+    """Valor representativo do balde (erro relativo máximo = QUANTILE_ACCURACY)"""
+    buckets = np.asarray(buckets)
+    values = 2 * np.power(_GAMMA, buckets.astype('float64')) / (_GAMMA + 1)
+    return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+
+def quantile_sketch(groups, values):
+    """Contagens por (grupo, balde): tabela aditiva com a coluna 'Contagem'"""
+    frame = pd.DataFrame({'grupo': np.asarray(groups), 'balde': quantile_buckets(values)})
+    return frame.groupby(['grupo', 'balde']).size().to_frame('Contagem')
+
+
+def sketch_quantiles(sketch, quantiles=DEFAULT_QUANTILES):
+    """Quantis aproximados de cada grupo a partir das contagens por balde"""
+    counts = sketch['Contagem'].sort_index()
+    groups = counts.index.get_level_values(0)
+    cumulative = counts.groupby(level=0).cumsum().to_numpy()
+    totals = counts.groupby(level=0).transform('sum').to_numpy()
+    buckets = counts.index.get_level_values(1).to_numpy()
+
+    result = {}
+    for q in quantiles:
+        # Primeiro balde cuja contagem acumulada passa da posição do quantil
+        reached = cumulative > q * (totals - 1)
+        position = pd.Series(np.where(reached, np.arange(len(counts)), len(counts)),
+                             index=groups).groupby(level=0).min()
+        result[f'P{int(round(q * 100))}'] = pd.Series(_bucket_value(buckets[position.to_numpy()]),
+                                                      index=position.index)
+    return pd.DataFrame(result).rename_axis(sketch.index.names[0])
+
+
+def overall_sketch(sketch):
+    """Resumo único somando todos os grupos"""
+    overall = sketch['Contagem'].groupby(level=1).sum()
+    overall.index = pd.MultiIndex.from_product([['Total'], overall.index],
+                                               names=sketch.index.names)
+    return overall.to_frame('Contagem')
@@ -0,0 +1,109 @@
+"""
+Operações de texto por valor distinto
+Dashboard de Análise de Peças
+
+As exportações têm milhões de linhas, mas poucas centenas de status, peças e
+máquinas diferentes. Em vez de aplicar `.str` linha a linha, as funções daqui
+processam cada valor distinto uma única vez e repassam o resultado às linhas
+pelos códigos de uma coluna categórica.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Classes de status de entrega (na ordem de exibição)
+STATUS_ENTREGUE = 'Entregue'
+STATUS_PARCIAL = 'Parcial'
+STATUS_SEPARACAO = 'Em separação'
+STATUS_AGUARDANDO = 'Aguardando'
+STATUS_PENDENTE = 'Pendente'
+STATUS_NAO_ENTREGUE = 'Não entregue'
+STATUS_SEM_INFORMACAO = 'Sem informação'
+STATUS_OUTRO = 'Outro'
+
+DELIVERY_STATUSES = [STATUS_ENTREGUE, STATUS_PARCIAL, STATUS_SEPARACAO, STATUS_AGUARDANDO,
+                     STATUS_PENDENTE, STATUS_NAO_ENTREGUE, STATUS_SEM_INFORMACAO, STATUS_OUTRO]
+
+# Trechos do texto normalizado que identificam cada classe, testados em ordem
+# ('Sim, parcial' é Parcial; 'Não entregue' não é Entregue)
+_STATUS_RULES = [
+    (STATUS_PARCIAL, re.compile(r'parcial')),
+    (STATUS_SEPARACAO, re.compile(r'separa')),
+    (STATUS_AGUARDANDO, re.compile(r'aguard')),
+    (STATUS_PENDENTE, re.compile(r'pendente')),
+    (STATUS_NAO_ENTREGUE, re.compile(r'^(nao|n)\b|nao entreg|cancel')),
+    (STATUS_ENTREGUE, re.compile(r'^(sim|s|ok)\b|^entregue')),
+]
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """Texto sem espaços extras, sem acentos e em minúsculas (para comparação)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _SPACES.sub(' ', text).strip().casefold()
+
+
+def map_categories(series, func, missing=None, categories=None):
+    """Aplica `func` a cada valor distinto e devolve uma coluna categórica
+
+    Valores ausentes recebem `missing`. Com `categories`, o resultado usa essa
+    lista de categorias (na ordem dada), mesmo para classes sem ocorrências.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    mapped = [func(value) for value in series.cat.categories] + [missing]
+    # Valores distintos do resultado e, para cada categoria original, o seu código
+    category_codes, uniques = pd.factorize(pd.Series(mapped, dtype=object))
+    if categories is not None:
+        category_codes = np.where(category_codes >= 0,
+                                  pd.Index(categories).get_indexer(uniques)[category_codes], -1)
+        uniques = categories
+    codes = series.cat.codes.to_numpy()
+    # Código -1 (ausente) aponta para a última posição, a de `missing`
+    row_codes = category_codes[np.where(codes >= 0, codes, len(mapped) - 1)]
+    return pd.Series(pd.Categorical.from_codes(row_codes, categories=uniques),
+                     index=series.index, name=series.name)
+
+
+def truncate_labels(series, width):
+    """Rótulos cortados em `width` caracteres (uma vez por valor distinto)"""
+    return map_categories(series, lambda value: str(value)[:width])
+
+
+def classify_delivery_status(value):
+    """Classe do status de entrega ('Sim, João' -> 'Entregue')"""
+    text = normalize_text(value)
+    if not text:
+        return STATUS_SEM_INFORMACAO
+    for status, pattern in _STATUS_RULES:
+        if pattern.search(text):
+            return status
+    return STATUS_OUTRO
+
+
+def delivery_status(series):
+    """Classe de entrega de cada linha, como coluna categórica"""
+    return map_categories(series, classify_delivery_status, missing=STATUS_SEM_INFORMACAO,
+                          categories=DELIVERY_STATUSES)
+
+
+def delivery_summary(counts, n_rows=None):
+    """Quantidade por classe a partir da contagem por status original
+
+    `counts` é a tabela de agregados 'entrega' (índice = status original). As
+    linhas sem status (não contadas) entram como 'Sem informação' se `n_rows`
+    for informado.
+    """
+    classes = [classify_delivery_status(value) for value in counts.index]
+    summary = counts['Quantidade'].groupby(classes).sum()
+    summary = summary.reindex(DELIVERY_STATUSES, fill_value=0)
+    if n_rows is not None:
+        summary[STATUS_SEM_INFORMACAO] += max(int(n_rows) - int(counts['Quantidade'].sum()), 0)
+    return summary.astype('int64')
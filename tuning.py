@@ -0,0 +1,234 @@
+"""
+Busca de hiperparâmetros dos ensembles de previsão
+Dashboard de Análise de Peças
+
+Successive halving: candidatos sorteados do espaço de busca são avaliados com
+poucas árvores/estágios; a cada rodada só o melhor terço continua, com o triplo
+de árvores. As avaliações de cada rodada rodam em paralelo em processos (o
+laço do Gradient Boosting é em Python e não escalaria em threads) e o erro é
+medido em janelas temporais (treina no passado, testa nos meses seguintes).
+
+O orçamento de tempo é rígido: no prazo os processos são encerrados, mesmo no
+meio de um ajuste, e vale o melhor candidato da última rodada completa (ou os
+parâmetros padrão). A inicialização dos processos conta no orçamento.
+
+O resultado é salvo por impressão digital da série mensal em `data/ajustes/`,
+então a busca roda uma única vez por conjunto de dados.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import ParameterSampler, TimeSeriesSplit
+
+from resampling import DEFAULT_GRANULARITY
+
+DEFAULT_TUNING_DIR = os.path.join('data', 'ajustes')
+DEFAULT_BUDGET = 60.0
+
+MODEL_CLASSES = {
+    'Random Forest': RandomForestRegressor,
+    'Gradient Boosting': GradientBoostingRegressor,
+}
+
+# Configuração usada sem ajuste
+DEFAULT_PARAMS = {
+    'Random Forest': {'n_estimators': 100, 'random_state': 42},
+    'Gradient Boosting': {'n_estimators': 100, 'random_state': 42},
+}
+
+SEARCH_SPACES = {
+    'Random Forest': {
+        'max_depth': [None, 2, 3, 5, 8],
+        'min_samples_leaf': [1, 2, 3, 5],
+        'bootstrap': [True, False],
+    },
+    'Gradient Boosting': {
+        'learning_rate': [0.01, 0.03, 0.1, 0.3],
+        'max_depth': [1, 2, 3, 4],
+        'subsample': [0.6, 0.8, 1.0],
+        'min_samples_leaf': [1, 2, 3],
+    },
+}
+
+# Modelos ajustados de cada série prevista
+TUNED_SERIES = {
+    'Quantidade': ['Random Forest', 'Gradient Boosting'],
+    'Total': ['Gradient Boosting'],
+}
+
+N_CANDIDATES = 27
+HALVING_FACTOR = 3
+MIN_ESTIMATORS = 25
+MAX_ESTIMATORS = 400
+# Janelas de validação e meses testados em cada uma
+MAX_FOLDS = 4
+TEST_MONTHS = 3
+# Séries mais curtas usam os parâmetros padrão (TimeSeriesSplit exige 2 janelas)
+MIN_FOLDS = 2
+MIN_MONTHS = (MIN_FOLDS + 1) * TEST_MONTHS
+
+
+def build_model(name, params=None):
+    """Modelo com os parâmetros padrão atualizados pelos ajustados"""
+    return MODEL_CLASSES[name](**{**DEFAULT_PARAMS[name], **(params or {})})
+
+
+def _folds(n_months):
+    """Janelas de validação (None se a série não tem meses para `MIN_FOLDS` janelas)"""
+    n_splits = min(MAX_FOLDS, (n_months - TEST_MONTHS) // TEST_MONTHS)
+    if n_splits < MIN_FOLDS:
+        return None
+    return TimeSeriesSplit(n_splits=n_splits, test_size=TEST_MONTHS)
+
+
+def _terminate(executor):
+    """Encerra os processos do executor, inclusive os que estão no meio de um ajuste"""
+    # O executor não expõe os processos antes do Python 3.14 (terminate_workers)
+    if hasattr(executor, 'terminate_workers'):
+        executor.terminate_workers()
+        return
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _evaluate(name, params, X, y, folds, deadline):
+    """Erro médio absoluto nas janelas temporais (None se o prazo acabou)
+
+    Roda em um processo separado; o relógio monotônico é o mesmo do processo
+    principal, então o prazo evita começar janelas que seriam interrompidas.
+    """
+    errors = []
+    for train, test in folds.split(X):
+        if time.monotonic() > deadline:
+            return None
+        model = build_model(name, params)
+        model.fit(X[train], y[train])
+        errors.append(mean_absolute_error(y[test], model.predict(X[test])))
+    return float(np.mean(errors))
+
+
+def successive_halving(name, X, y, budget=DEFAULT_BUDGET, workers=None, seed=42):
+    """Melhores parâmetros de `name` para a série (X, y) dentro do orçamento em segundos"""
+    start = time.monotonic()
+    deadline = start + budget
+    result = {'parametros': {}, 'erro': None, 'erro_padrao': None, 'avaliacoes': 0,
+              'rodadas': 0, 'completo': False}
+    folds = _folds(len(y)) if len(y) >= MIN_MONTHS else None
+    if folds is None:
+        result['completo'] = True
+        return result
+
+    # A configuração padrão sempre concorre (e serve de referência)
+    candidates = [{}] + list(ParameterSampler(SEARCH_SPACES[name], N_CANDIDATES - 1,
+                                              random_state=seed))
+    n_estimators = MIN_ESTIMATORS
+    workers = workers or os.cpu_count() or 1
+    # 'spawn': não copia as threads do servidor (fork não é seguro com elas)
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context('spawn'))
+    # Erro da configuração padrão completa: o vencedor precisa superá-lo
+    baseline = executor.submit(_evaluate, name, {}, X, y, folds, deadline)
+    try:
+        while True:
+            params = [{**c, 'n_estimators': n_estimators} for c in candidates]
+            futures = {executor.submit(_evaluate, name, p, X, y, folds, deadline): i
+                       for i, p in enumerate(params)}
+            errors = [None] * len(params)
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    errors[futures[future]] = future.result()
+            result['avaliacoes'] += sum(e is not None for e in errors)
+            if pending or any(e is None for e in errors):
+                break  # orçamento esgotado no meio da rodada
+
+            ranking = np.argsort(errors, kind='stable')
+            result.update(parametros=params[ranking[0]], erro=errors[ranking[0]])
+            result['rodadas'] += 1
+
+            keep = len(candidates) // HALVING_FACTOR
+            next_estimators = min(n_estimators * HALVING_FACTOR, MAX_ESTIMATORS)
+            if keep < 1 or next_estimators == n_estimators:
+                result['completo'] = True
+                break
+            candidates = [candidates[i] for i in ranking[:keep]]
+            n_estimators = next_estimators
+        if baseline.done() or wait([baseline], max(deadline - time.monotonic(), 0)).done:
+            result['erro_padrao'] = baseline.result()
+    finally:
+        # Avaliações na fila ou em andamento são descartadas
+        _terminate(executor)
+
+    if result['erro'] is not None and result['erro_padrao'] is not None \
+            and result['erro'] >= result['erro_padrao']:
+        result.update(parametros={}, erro=result['erro_padrao'])
+
+    result['segundos'] = round(time.monotonic() - start, 2)
+    return result
+
+
+def tuning_path(fingerprint, directory=DEFAULT_TUNING_DIR):
+    return os.path.join(directory, f'{fingerprint}.json')
+
+
+def load_tuning(fingerprint, directory=DEFAULT_TUNING_DIR):
+    """Resultado salvo da busca para a série (ou None)"""
+    path = tuning_path(fingerprint, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_tuning(fingerprint, tuning, directory=DEFAULT_TUNING_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = tuning_path(fingerprint, directory)
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(tuning, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def tune_predictor(predictor, budget=DEFAULT_BUDGET, workers=None, directory=DEFAULT_TUNING_DIR):
+    """Aplica ao preditor os parâmetros ajustados da sua série
+
+    Carrega o resultado salvo para a resolução e a impressão digital da série
+    do preditor; se não houver, executa a busca nessa série (o orçamento é
+    dividido entre os modelos) e salva. Retorna o resultado da busca.
+    """
+    fingerprint = predictor.series_fingerprint()
+    if predictor.granularity != DEFAULT_GRANULARITY:
+        # A série mensal mantém o nome dos resultados já salvos
+        fingerprint = f'{predictor.granularity}-{fingerprint}'
+    tuning = load_tuning(fingerprint, directory)
+    if tuning is None:
+        df_month = predictor.prepare_temporal_data()
+        X = df_month[['Mes_Num']].values
+        n_searches = sum(len(names) for names in TUNED_SERIES.values())
+        tuning = {target: {name: successive_halving(name, X, df_month[target].values,
+                                                    budget / n_searches, workers)
+                           for name in names}
+                  for target, names in TUNED_SERIES.items()}
+        save_tuning(fingerprint, tuning, directory)
+
+    predictor.tuning = tuning
+    predictor.tuned_params = {(target, name): result['parametros']
+                              for target, results in tuning.items()
+                              for name, result in results.items()}
+    return tuning
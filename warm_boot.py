@@ -0,0 +1,310 @@
+"""
+Pré-carga do conjunto de dados na inicialização do servidor
+Dashboard de Análise de Peças
+
+Em produção o dashboard mostra sempre a mesma exportação noturna. Com
+`DASHBOARD_DATASET` apontando para o arquivo (ou para um diretório com um
+arquivo por unidade), uma thread em segundo plano:
+
+1. Adiciona os arquivos a uma base local própria (`data/pre_carga/`): só as
+   requisições novas são gravadas e os agregados são somados (ver DataStore).
+2. Pré-calcula no cache compartilhado do processo o que a primeira sessão
+   calcularia com as opções padrão: qualidade, nomes unificados, preditor,
+   previsão conjunta, tendência, anomalias, criticidade, demanda de peças e os
+   gráficos correspondentes.
+3. Verifica a data de modificação dos arquivos a cada `DASHBOARD_DATASET_POLL`
+   segundos (padrão 60) e repete os passos quando a exportação muda. Os modelos
+   são estendidos por warm start e as previsões salvas são reaproveitadas
+   enquanto a série mensal não muda.
+
+Para a pré-carga começar antes do primeiro acesso, inicie o servidor por aqui:
+    python warm_boot.py dados/exportacao.xlsx --serve --port 8501
+Com `streamlit run app.py` e a variável definida, ela começa na primeira sessão.
+Sem `--serve`, sincroniza e pré-calcula uma vez (ex: cron após a exportação),
+deixando a base, os modelos e as previsões salvos em disco.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from charts import create_part_demand_chart
+from data_quality import QualityReport, merge_reports, validate_data
+from data_store import DataStore
+from ingestion import check_columns, list_data_files, read_data_file, site_name, tag_site
+from model_registry import default_model_names
+from name_normalization import normalize_names, shared_normalizers
+from result_cache import chart_key, result_key, shared_cache
+from ml_predictions import (
+    MLPredictor,
+    forecast_name,
+    split_joint_forecast,
+    create_prediction_charts,
+    create_cost_prediction_chart,
+    create_anomaly_chart,
+    create_criticality_chart
+)
+
+DATASET_ENV = 'DASHBOARD_DATASET'
+POLL_ENV = 'DASHBOARD_DATASET_POLL'
+DEFAULT_POLL_SECONDS = 60.0
+DEFAULT_WARM_STORE = os.path.join('data', 'pre_carga')
+SIGNATURES_FILE = 'arquivos.json'
+# Arquivos modificados há menos que isso ainda podem estar sendo gravados
+SETTLE_SECONDS = 5.0
+# Horizonte padrão da barra lateral (a previsão pré-calculada é a da primeira visita)
+WARM_MONTHS = 6
+# Prefixo das chaves do cache (separado de 'base', usado pela base incremental)
+KEY_PREFIX = 'pre'
+
+
+def file_signature(path):
+    """Data de modificação (ns) e tamanho: mudam a cada nova exportação"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class WarmDataset:
+    """Conjunto de dados pré-carregado e mantido atualizado em segundo plano"""
+
+    def __init__(self, source, store_path=DEFAULT_WARM_STORE, interval=DEFAULT_POLL_SECONDS):
+        self.source = source
+        self.interval = interval
+        self.store = DataStore(store_path)
+        self.signatures_file = os.path.join(store_path, SIGNATURES_FILE)
+        # Primeira sincronização concluída (com ou sem erro)
+        self.ready = threading.Event()
+        self.last_sync = None
+        self.last_error = None
+        self.warmed_version = None
+        self.warmup_seconds = None
+        self._snapshot = None
+        # Relatório de qualidade de cada arquivo adicionado por este processo
+        self._reports = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _load_signatures(self):
+        if not os.path.exists(self.signatures_file):
+            return {}
+        with open(self.signatures_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_signatures(self, signatures):
+        os.makedirs(self.store.path, exist_ok=True)
+        tmp_path = self.signatures_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(signatures, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.signatures_file)
+
+    def sync(self):
+        """Adiciona à base os arquivos novos ou alterados: {arquivo: AppendResult}"""
+        paths = list_data_files(self.source)
+        signatures = self._load_signatures()
+        results = {}
+        for path in paths:
+            signature = file_signature(path)
+            if signatures.get(path) == signature or \
+                    time.time() - signature[0] / 1e9 < SETTLE_SECONDS:
+                continue
+            df = read_data_file(path)
+            check_columns(df, path)
+            # Com um arquivo por unidade, as linhas são marcadas com a unidade
+            df, self._reports[path] = validate_data(
+                tag_site(df, site_name(path) if len(paths) > 1 else None))
+            results[path] = self.store.append(df)
+            signatures[path] = signature
+            self._save_signatures(signatures)
+        return results
+
+    def snapshot(self):
+        """(versão, linhas, agregados, relatório) da última sincronização, coerentes entre si
+
+        As linhas da base já foram validadas ao serem adicionadas; o relatório
+        reúne os problemas dos arquivos lidos por este processo.
+        """
+        return self._snapshot
+
+    def _quality_report(self, df):
+        if not self._reports:
+            return QualityReport(linhas_recebidas=len(df), linhas_validas=len(df))
+        return merge_reports(list(self._reports.values()))
+
+    def dataset_key(self, version):
+        return (KEY_PREFIX, version)
+
+    def warm_up(self, months=WARM_MONTHS, models=None):
+        """Pré-calcula no cache compartilhado as mesmas chaves que o app consulta"""
+        # As linhas da base já foram validadas na sincronização
+        version, df, aggregates, _ = self._snapshot
+        cache = shared_cache()
+        key = self.dataset_key(version)
+
+        normalizers = shared_normalizers()
+        revision = tuple(n.revision for n in normalizers.values())
+        df, aggregates = cache.get_or_compute(
+            ('nomes', key, revision), lambda: normalize_names(df, normalizers, aggregates)
+        )
+        key = key + ('nomes', revision)
+
+        def build_predictor():
+            predictor = MLPredictor(df, aggregates=aggregates, forecaster=self.store.forecaster)
+            predictor.aggregates
+            return predictor
+
+        predictor = cache.get_or_compute(('preditor', key), build_predictor)
+
+        def result(name, compute):
+            return cache.get_or_compute(result_key(key, name), compute)
+
+        def chart(name, build, options=()):
+            cache.get_or_compute(chart_key(key, name, options), build)
+
+        models = models or default_model_names()
+        name = forecast_name('conjunta', months, models)
+        df_month, predictions, future_dates, scores, pred_costs, _ = split_joint_forecast(result(
+            name, lambda: self.store.cached_forecast(
+                name, lambda: predictor.predict_joint(months=months, models=models))
+        ))
+        options = (months, True, '_'.join(models))
+        chart('previsao_solicitacoes',
+              lambda: create_prediction_charts(df_month, predictions, future_dates, scores), options)
+        chart('previsao_custos',
+              lambda: create_cost_prediction_chart(df_month, pred_costs, future_dates), options)
+
+        result('tendencia', predictor.calculate_trend)
+        df_month_anom, anomalies = result('anomalias', predictor.identify_anomalies)
+        chart('anomalias', lambda: create_anomaly_chart(df_month_anom, anomalies))
+        df_machine_crit = result('criticidade', predictor.predict_maintenance_demand)
+        chart('criticidade', lambda: create_criticality_chart(df_machine_crit))
+        df_parts_pred = result('demanda_pecas', predictor.predict_part_demand)
+        chart('demanda_pecas', lambda: create_part_demand_chart(df_parts_pred))
+
+    def refresh(self):
+        """Sincroniza os arquivos e, se a base mudou, pré-calcula a nova versão"""
+        with self._lock:
+            changes = {}
+            self.last_error = None
+            try:
+                changes = self.sync()
+            except Exception as e:
+                # Arquivo ausente ou inválido: continua servindo a última versão da base
+                self.last_error = e
+                traceback.print_exc()
+            # Antes de liberar as sessões, que mostram o horário da verificação
+            self.last_sync = datetime.now()
+            try:
+                version = self.store.version
+                if self._snapshot is None or self._snapshot[0] != version:
+                    df = self.store.load_dataset()
+                    self._snapshot = (version, df, self.store.aggregates, self._quality_report(df))
+                # As sessões já podem usar os dados; o que ainda estiver sendo
+                # calculado abaixo é aguardado por elas no cache (single-flight)
+                self.ready.set()
+                if self.store.has_data() and self.warmed_version != version:
+                    start = time.monotonic()
+                    self.warm_up()
+                    self.warmup_seconds = time.monotonic() - start
+                    self.warmed_version = version
+                    # Resultados das versões anteriores não serão mais consultados
+                    shared_cache().invalidate(
+                        lambda k: isinstance(k[1], tuple) and k[1][:1] == (KEY_PREFIX,)
+                        and k[1][1] != version
+                    )
+            except Exception as e:
+                self.last_error = e
+                traceback.print_exc()
+            finally:
+                self.ready.set()
+            return changes
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Inicia a thread de pré-carga e monitoramento (uma única vez)"""
+        with _warm_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='pre-carga', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+_warm_dataset = None
+_warm_lock = threading.Lock()
+
+
+def get_warm_dataset():
+    """Conjunto pré-carregado do processo (None sem `DASHBOARD_DATASET`)"""
+    global _warm_dataset
+    with _warm_lock:
+        if _warm_dataset is None and os.environ.get(DATASET_ENV):
+            _warm_dataset = WarmDataset(
+                os.environ[DATASET_ENV],
+                interval=float(os.environ.get(POLL_ENV, DEFAULT_POLL_SECONDS))
+            )
+        return _warm_dataset
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pré-carrega o conjunto de dados do dashboard (e opcionalmente inicia o servidor)"
+    )
+    parser.add_argument('source', nargs='?', default=os.environ.get(DATASET_ENV),
+                        help=f"Arquivo Excel/CSV ou diretório (padrão: ${DATASET_ENV})")
+    parser.add_argument('--serve', action='store_true',
+                        help="Inicia o dashboard neste processo com a pré-carga em segundo plano")
+    parser.add_argument('--port', type=int, default=None, help="Porta do servidor")
+    parser.add_argument('--interval', type=float, default=None,
+                        help=f"Segundos entre verificações dos arquivos (padrão: {DEFAULT_POLL_SECONDS:.0f})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.source:
+        print(f"Informe o arquivo de dados ou defina {DATASET_ENV}", file=sys.stderr)
+        return 2
+    os.environ[DATASET_ENV] = args.source
+    if args.interval is not None:
+        os.environ[POLL_ENV] = str(args.interval)
+
+    # O app importa este arquivo como `warm_boot`: usa a instância desse módulo
+    # (e não a de __main__) para as sessões encontrarem a pré-carga
+    import warm_boot
+    warm = warm_boot.get_warm_dataset()
+
+    if not args.serve:
+        changes = warm.refresh()
+        if warm.last_error is not None:
+            return 1
+        for path, result in changes.items():
+            print(f"{path}: {result.linhas_novas:,} novas solicitações "
+                  f"({result.linhas_duplicadas:,} repetidas ignoradas)")
+        print(f"Base versão {warm.store.version}: {warm.store.n_rows:,} solicitações")
+        if warm.warmup_seconds is not None:
+            print(f"Pré-cálculo em {warm.warmup_seconds:.1f} s")
+        return 0
+
+    from streamlit.web import bootstrap
+    warm.start()
+    flag_options = {'server_port': args.port}
+    bootstrap.load_config_options(flag_options=flag_options)
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    bootstrap.run(app_path, False, [], flag_options)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())